@@ -0,0 +1,41 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse
+from sqlalchemy.orm import Session
+from typing import Optional
+from app.api.usage import usage_series
+from app.database import get_db
+from app.dependencies.auth import get_current_active_superuser
+from app.models.user import User
+from app.schemas.usage import UsageSeries
+from app.services.profiler import profile_store
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+@router.get("/profiles")
+async def list_profiles(current_user: User = Depends(get_current_active_superuser)):
+    """List stored request profiles, newest first"""
+    return {"profiles": profile_store.list()}
+
+@router.get("/profiles/{name}")
+async def get_profile(
+    name: str,
+    current_user: User = Depends(get_current_active_superuser)
+):
+    """Download a profile in collapsed-stack format (open with speedscope)"""
+    filepath = profile_store.path(name)
+    if not filepath:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    
+    return FileResponse(filepath, media_type="text/plain", filename=name)
+
+@router.get("/usage", response_model=UsageSeries)
+async def get_usage(
+    days: int = Query(30, ge=1, le=366),
+    user_id: Optional[int] = None,
+    model_id: Optional[str] = None,
+    generation_type: Optional[str] = None,
+    current_user: User = Depends(get_current_active_superuser),
+    db: Session = Depends(get_db)
+):
+    """Service-wide daily usage, or one user's usage when user_id is given"""
+    return usage_series(db, days, user_id, model_id, generation_type)
\ No newline at end of file
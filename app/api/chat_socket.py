@@ -0,0 +1,207 @@
+import asyncio
+from typing import Any, Dict, Optional, Tuple, Union
+import orjson
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from pydantic import ValidationError
+from app.api.chats import chat_writes, generate_reply, save_user_message
+from app.config import settings
+from app.database import SessionLocal
+from app.models.chat import Chat, Message
+from app.models.user import User
+from app.schemas.chat import ChatSocketFrame, Message as MessageSchema
+from app.services.admission import admission_controller
+from app.services.archive import rehydrate_chat
+from app.services.auth import auth_service
+from app.services.metrics import metrics
+from app.services.openrouter import ClientDisconnected
+from app.services.persistence import persistence_queue
+from app.utils.outbox import Outbox
+from app.utils.responses import ORJSON_OPTIONS
+
+router = APIRouter(prefix="/chats", tags=["chats"])
+
+socket_connections = metrics.gauge("chat_socket_connections", "Open authenticated chat WebSockets")
+
+# Close code for failed authentication ("policy violation")
+WS_POLICY_VIOLATION = 1008
+
+def authenticate(token: str) -> Optional[int]:
+    """
+    Id of the active user the token belongs to; looked up once per connection
+    """
+    payload = auth_service.decode_token(token)
+    if not payload or not payload.get("sub"):
+        return None
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.username == payload["sub"]).first()
+        return user.id if user is not None and user.is_active else None
+    finally:
+        db.close()
+
+def message_frame(message: Union[Message, Dict[str, Any]]) -> Dict[str, Any]:
+    message = MessageSchema.model_validate(message)
+    return {"type": "message", "chat_id": message.chat_id, "message": message.model_dump(mode="json")}
+
+def error_frame(status: int, detail: Any, chat_id: Optional[int] = None, **extra) -> Dict[str, Any]:
+    return {"type": "error", "chat_id": chat_id, "status": status, "detail": detail, **extra}
+
+class ChatConnection:
+    """
+    One authenticated socket: reads client frames, runs one reply per chat
+    at a time and sends everything through a bounded outbox
+    """
+    def __init__(self, websocket: WebSocket, user_id: int):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.outbox = Outbox(settings.WS_MAX_QUEUED_FRAMES, settings.WS_MAX_PENDING_CHARS)
+        # chat_id -> (reply task, its cancel event)
+        self.turns: Dict[int, Tuple[asyncio.Task, asyncio.Event]] = {}
+
+    async def serve(self):
+        writer = asyncio.create_task(self._write())
+        try:
+            while True:
+                text = await self.websocket.receive_text()
+                try:
+                    frame = ChatSocketFrame.model_validate_json(text)
+                except ValidationError as e:
+                    await self.outbox.put(error_frame(400, e.errors(include_url=False, include_context=False)))
+                    continue
+                await self._handle(frame)
+        except WebSocketDisconnect:
+            pass
+        finally:
+            # Stop queueing first so finishing turns never wait on a dead writer
+            await self.outbox.close()
+            turns = list(self.turns.values())
+            for _, cancel in turns:
+                cancel.set()
+            await asyncio.gather(*(task for task, _ in turns), writer, return_exceptions=True)
+
+    async def _handle(self, frame: ChatSocketFrame):
+        if frame.type == "ping":
+            await self.outbox.put({"type": "pong"})
+            return
+
+        if frame.type == "auth":
+            await self.outbox.put(error_frame(400, "Already authenticated"))
+            return
+
+        if frame.chat_id is None:
+            await self.outbox.put(error_frame(400, f"chat_id is required for {frame.type}"))
+            return
+
+        if frame.type == "cancel":
+            turn = self.turns.get(frame.chat_id)
+            if turn is None:
+                await self.outbox.put(error_frame(404, "No reply in progress", frame.chat_id))
+            else:
+                turn[1].set()
+            return
+
+        if not frame.content:
+            await self.outbox.put(error_frame(400, "content is required for send", frame.chat_id))
+            return
+        if frame.chat_id in self.turns:
+            await self.outbox.put(error_frame(409, "A reply is already in progress for this chat", frame.chat_id))
+            return
+        if len(self.turns) >= settings.WS_MAX_ACTIVE_TURNS:
+            await self.outbox.put(error_frame(429, "Too many replies in progress on this connection", frame.chat_id))
+            return
+
+        # Same load shedding as POST /api/chats/{id}/messages
+        reason = admission_controller.try_acquire()
+        if reason:
+            await self.outbox.put(error_frame(
+                503, f"Service temporarily unavailable: {reason}", frame.chat_id,
+                retry_after=admission_controller.retry_after_seconds()
+            ))
+            return
+
+        cancel = asyncio.Event()
+        task = asyncio.create_task(self._run_turn(frame.chat_id, frame.content, cancel))
+        self.turns[frame.chat_id] = (task, cancel)
+
+    async def _run_turn(self, chat_id: int, content: str, cancel: asyncio.Event):
+        db = SessionLocal()
+        # Commits here (the user message, a rehydrated chat) keep this user's reads on the primary
+        db.info["user_id"] = self.user_id
+        try:
+            chat = db.query(Chat).filter(Chat.id == chat_id, Chat.user_id == self.user_id).first()
+            if not chat:
+                await self.outbox.put(error_frame(404, "Chat not found", chat_id))
+                return
+
+            rehydrate_chat(db, chat_id)
+            await persistence_queue.settle(chat_writes(chat_id))
+            await self.outbox.put(message_frame(save_user_message(db, chat_id, content)))
+            assistant_message = await generate_reply(
+                db, chat, self.user_id,
+                cancel=cancel,
+                on_delta=lambda delta: self.outbox.put_token(chat_id, delta),
+                on_code_block=lambda code_block: self.outbox.put(
+                    {"type": "code_block", "chat_id": chat_id, "code_block": code_block}
+                )
+            )
+            await self.outbox.put(message_frame(assistant_message))
+        except ClientDisconnected:
+            db.rollback()
+            await self.outbox.put({"type": "cancelled", "chat_id": chat_id})
+        except Exception as e:
+            db.rollback()
+            await self.outbox.put(error_frame(500, f"Error generating response: {str(e)}", chat_id))
+        finally:
+            db.close()
+            admission_controller.release()
+            self.turns.pop(chat_id, None)
+
+    async def _write(self):
+        try:
+            while (frame := await self.outbox.get()) is not None:
+                await self.websocket.send_text(orjson.dumps(frame, option=ORJSON_OPTIONS).decode())
+        finally:
+            # A failed send must not leave producers waiting for room
+            await self.outbox.close()
+
+@router.websocket("/ws")
+async def chat_socket(websocket: WebSocket):
+    """
+    Multiplexed chat over one WebSocket. Authenticate with an Authorization
+    header or a first {"type": "auth", "token": ...} frame, then send
+    {"type": "send", "chat_id", "content"} and {"type": "cancel", "chat_id"}
+    frames for any of your chats. The server pushes "message" frames for
+    saved messages, "token" frames with reply text as it streams in (deltas
+    are merged when the client reads slowly), a "code_block" frame for each
+    code block of the reply as soon as its fence closes, and
+    "cancelled"/"error" frames.
+    """
+    await websocket.accept()
+
+    token = None
+    scheme, _, credentials = websocket.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and credentials:
+        token = credentials
+    else:
+        try:
+            text = await asyncio.wait_for(websocket.receive_text(), settings.WS_AUTH_TIMEOUT_SECONDS)
+            frame = ChatSocketFrame.model_validate_json(text)
+            token = frame.token if frame.type == "auth" else None
+        except WebSocketDisconnect:
+            return
+        except (asyncio.TimeoutError, ValidationError):
+            token = None
+
+    user_id = authenticate(token) if token else None
+    if user_id is None:
+        await websocket.close(code=WS_POLICY_VIOLATION, reason="Could not validate credentials")
+        return
+
+    socket_connections.inc()
+    try:
+        await websocket.send_text(orjson.dumps({"type": "ready", "user_id": user_id}).decode())
+        await ChatConnection(websocket, user_id).serve()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        socket_connections.dec()
\ No newline at end of file
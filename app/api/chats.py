@@ -1,17 +1,88 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
-from typing import List
+from typing import Any, Awaitable, Callable, Dict, List, Optional
 from app.database import get_db
 from app.models.user import User
 from app.models.chat import Chat, Message
-from app.schemas.chat import ChatCreate, ChatUpdate, Chat as ChatSchema, MessageCreate, Message as MessageSchema
+from app.schemas.chat import ChatCreate, ChatUpdate, Chat as ChatSchema, MessageCreate, Message as MessageSchema, MessageSearchResults
 from app.dependencies.auth import get_current_user
-from app.services.openrouter import openrouter_service
-from app.utils.code_formatter import format_code_response
+from app.dependencies.database import get_read_db
+from app.services.archive import archived_messages, rehydrate_chat
+from app.services.openrouter import ClientDisconnected, openrouter_service
+from app.services.persistence import InsertRow, persistence_queue
+from app.services.search import search_messages
+from app.services.usage_ledger import usage_ledger
+from app.utils.code_formatter import CodeBlockTokenizer, format_code_response
+from app.utils.compressed_json import lazy_json_columns
+from app.utils.conditional import make_etag, not_modified, set_validators
+from app.utils.responses import ORJSONResponse, rows_response, schema_columns
 from datetime import datetime
 
 router = APIRouter(prefix="/chats", tags=["chats"])
 
+# Read paths select exactly the schema's columns and skip re-validation
+CHAT_COLUMNS = schema_columns(Chat.__table__, ChatSchema, exclude=("messages",))
+MESSAGE_COLUMNS = lazy_json_columns(schema_columns(Message.__table__, MessageSchema))
+MESSAGE_FIELDS = [column.name for column in MESSAGE_COLUMNS]
+
+def chats_with_messages(db: Session, chats) -> List[Dict[str, Any]]:
+    """
+    Chat rows with their messages attached, loaded with one IN query per
+    batch of chats instead of one query per chat. Archived chats are
+    listed from their archive without restoring them.
+    """
+    payloads = {chat.id: {**chat._asdict(), "messages": []} for chat in chats}
+    chat_ids = list(payloads)
+    for start in range(0, len(chat_ids), 500):
+        rows = db.execute(
+            select(*MESSAGE_COLUMNS)
+            .where(Message.chat_id.in_(chat_ids[start:start + 500]))
+            .order_by(Message.chat_id, Message.id)
+        )
+        for row in rows:
+            payloads[row.chat_id]["messages"].append(row._asdict())
+    
+    empty = [chat_id for chat_id, payload in payloads.items() if not payload["messages"]]
+    for chat_id, messages in archived_messages(db, empty).items():
+        payloads[chat_id]["messages"] = [
+            {name: message.get(name) for name in MESSAGE_FIELDS} for message in messages
+        ]
+    return list(payloads.values())
+
+def chat_version(db: Session, user_id: int, chat_id: int):
+    """
+    The chat's timestamps plus message count, last message id and newest
+    message time, from one aggregate query; None if the user has no such chat
+    """
+    return db.execute(
+        select(
+            Chat.created_at,
+            Chat.updated_at,
+            func.count(Message.id).label("message_count"),
+            func.max(Message.id).label("last_message_id"),
+            func.max(Message.created_at).label("last_message_at")
+        )
+        .select_from(Chat)
+        .outerjoin(Message, Message.chat_id == Chat.id)
+        .where(Chat.id == chat_id, Chat.user_id == user_id)
+        .group_by(Chat.id)
+    ).first()
+
+def current_chat_version(db: Session, read_db: Session, user_id: int, chat_id: int):
+    """
+    chat_version from the read session, after restoring the chat from cold
+    storage (on the primary) if it was archived. Archived chats have no
+    message rows, so chats with messages skip the archive lookup. Returns
+    the version and the session to read the chat from.
+    """
+    version = chat_version(read_db, user_id, chat_id)
+    if version is not None and version.message_count == 0 and rehydrate_chat(db, chat_id):
+        # The restored rows may not have reached the read engine yet
+        return chat_version(db, user_id, chat_id), db
+    return version, read_db
+
 @router.post("/", response_model=ChatSchema)
 async def create_chat(
     chat: ChatCreate,
@@ -32,22 +103,63 @@ async def create_chat(
 
 @router.get("/", response_model=List[ChatSchema])
 async def get_user_chats(
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    version = db.execute(
+        select(
+            func.count(func.distinct(Chat.id)),
+            func.max(Chat.id),
+            func.max(func.coalesce(Chat.updated_at, Chat.created_at)),
+            func.count(Message.id),
+            func.max(Message.id),
+            func.max(Message.created_at)
+        )
+        .select_from(Chat)
+        .outerjoin(Message, Message.chat_id == Chat.id)
+        .where(Chat.user_id == current_user.id)
+    ).one()
+    # ETag only: timestamps have one-second resolution and don't move when a chat is deleted
+    etag = make_etag("chats", current_user.id, *version)
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    
+    chats = db.execute(
+        select(*CHAT_COLUMNS).where(Chat.user_id == current_user.id).order_by(Chat.updated_at.desc())
+    ).all()
+    return set_validators(ORJSONResponse(chats_with_messages(db, chats)), etag)
+
+@router.get("/search", response_model=MessageSearchResults)
+async def search_chat_messages(
+    q: str = Query(..., min_length=1, max_length=256),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=10000),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    chats = db.query(Chat).filter(Chat.user_id == current_user.id).order_by(Chat.updated_at.desc()).all()
-    return chats
+    """Search the current user's messages and chat titles, best matches first"""
+    return search_messages(db, current_user.id, q, limit=limit, offset=offset)
 
 @router.get("/{chat_id}", response_model=ChatSchema)
 async def get_chat(
     chat_id: int,
+    request: Request,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    read_db: Session = Depends(get_read_db)
 ):
-    chat = db.query(Chat).filter(Chat.id == chat_id, Chat.user_id == current_user.id).first()
-    if not chat:
+    version, read_db = current_chat_version(db, read_db, current_user.id, chat_id)
+    if not version:
         raise HTTPException(status_code=404, detail="Chat not found")
-    return chat
+    etag = make_etag("chat", current_user.id, chat_id, *version)
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    
+    chat = read_db.execute(select(*CHAT_COLUMNS).where(Chat.id == chat_id)).first()
+    return set_validators(ORJSONResponse(chats_with_messages(read_db, [chat])[0]), etag)
 
 @router.put("/{chat_id}", response_model=ChatSchema)
 async def update_chat(
@@ -81,79 +193,142 @@ async def delete_chat(
     db.commit()
     return {"message": "Chat deleted successfully"}
 
-@router.post("/{chat_id}/messages", response_model=MessageSchema)
-async def send_message(
-    chat_id: int,
-    message: MessageCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    # Verify chat exists and belongs to user
-    chat = db.query(Chat).filter(Chat.id == chat_id, Chat.user_id == current_user.id).first()
-    if not chat:
-        raise HTTPException(status_code=404, detail="Chat not found")
-    
-    # Save user message
+def chat_writes(chat_id: int):
+    """Persistence queue key of a chat's replies"""
+    return ("chat", chat_id)
+
+def save_user_message(db: Session, chat_id: int, content: str) -> Message:
     user_message = Message(
         chat_id=chat_id,
         role="user",
-        content=message.content
+        content=content
     )
     db.add(user_message)
     db.commit()
     db.refresh(user_message)
+    return user_message
+
+async def generate_reply(
+    db: Session,
+    chat: Chat,
+    user_id: int,
+    request: Optional[Request] = None,
+    cancel: Optional[asyncio.Event] = None,
+    on_delta: Optional[Callable[[str], Awaitable[None]]] = None,
+    on_code_block: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None
+) -> Dict[str, Any]:
+    """
+    Ask the chat's model to answer the conversation so far and save the
+    reply through the persistence queue; returns the saved message row.
+    Code blocks are extracted while the reply streams, and on_code_block is
+    awaited with each one as its fence closes. Raises ClientDisconnected
+    when the client leaves (or `cancel` is set) and no partial reply is kept.
+    """
+    # Get all messages for context, including the one just saved, once any
+    # earlier reply still in the persistence queue has committed. The id
+    # tie-break keeps the order (and so the cached prompt prefix) stable.
+    await persistence_queue.settle(chat_writes(chat.id))
+    previous_messages = db.query(Message).filter(
+        Message.chat_id == chat.id
+    ).order_by(Message.created_at, Message.id).all()
     
+    # Format messages for OpenRouter
+    messages_for_api = [
+        {"role": msg.role, "content": msg.content}
+        for msg in previous_messages
+    ]
+    
+    # Code blocks are tokenized as the deltas arrive, not re-parsed afterwards
+    tokenizer = CodeBlockTokenizer() if chat.model_type in ("text", "code") else None
+    
+    async def stream_delta(delta: str):
+        closed = tokenizer.feed(delta) if tokenizer is not None else []
+        if on_delta is not None:
+            await on_delta(delta)
+        if on_code_block is not None:
+            for code_block in closed:
+                await on_code_block(code_block)
+    
+    # Call OpenRouter API; streamed so a client disconnect stops generation upstream
+    reasoning_enabled = chat.model_name in ["Aurora Alpha", "Solar Pro 3", "Qwen3 VL Thinking", "GPT-OSS 120B"]
     try:
-        # Get all previous messages for context
-        previous_messages = db.query(Message).filter(
-            Message.chat_id == chat_id
-        ).order_by(Message.created_at).all()
-        
-        # Format messages for OpenRouter
-        messages_for_api = [
-            {"role": msg.role, "content": msg.content}
-            for msg in previous_messages + [user_message]
-        ]
-        
-        # Call OpenRouter API
-        reasoning_enabled = chat.model_name in ["Aurora Alpha", "Solar Pro 3", "Qwen3 VL Thinking", "GPT-OSS 120B"]
         response = await openrouter_service.chat_completion(
             model=chat.model_id,
             messages=messages_for_api,
-            reasoning={"enabled": reasoning_enabled} if reasoning_enabled else None
+            reasoning={"enabled": reasoning_enabled} if reasoning_enabled else None,
+            stream=True,
+            request=request,
+            cancel=cancel,
+            on_delta=stream_delta
         )
-        
-        # Process response
-        assistant_content = response["choices"][0]["message"]["content"]
-        
-        # Extract code blocks
-        code_blocks = []
-        if chat.model_type == "text" or chat.model_type == "code":
+    except ClientDisconnected as disconnected:
+        # Nobody is waiting for the reply; keep it only if partial output is configured
+        if disconnected.partial is None:
+            raise
+        response = disconnected.partial
+    
+    # Process response
+    assistant_content = response["choices"][0]["message"]["content"]
+    usage = response.get("usage") or {}
+    
+    # Extract code blocks
+    code_blocks = []
+    if tokenizer is not None:
+        formatted = tokenizer.result()
+        if formatted["content"] != assistant_content:
+            # Content that didn't arrive as deltas (e.g. a non-streamed reply)
             formatted = format_code_response(assistant_content)
-            code_blocks = formatted["code_blocks"]
-            assistant_content = formatted["content"]
-        
-        # Save assistant message
-        assistant_message = Message(
-            chat_id=chat_id,
-            role="assistant",
-            content=assistant_content,
-            code_blocks=code_blocks if code_blocks else None,
-            reasoning_details=response["choices"][0]["message"].get("reasoning_details")
-        )
-        
-        db.add(assistant_message)
-        
-        # Update user stats
-        current_user.total_generations += 1
-        if response.get("usage"):
-            current_user.total_tokens += response["usage"].get("total_tokens", 0)
-        
-        db.commit()
-        db.refresh(assistant_message)
-        
-        return assistant_message
+        code_blocks = formatted["code_blocks"]
+        assistant_content = formatted["content"]
+    
+    # Save assistant message; in async persistence mode this returns once
+    # the row has its id and the commit happens after the response
+    assistant_message = await persistence_queue.submit(InsertRow(Message.__table__, {
+        "chat_id": chat.id,
+        "role": "assistant",
+        "content": assistant_content,
+        "code_blocks": code_blocks if code_blocks else None,
+        "images": None,
+        "audio_url": None,
+        "reasoning_details": response["choices"][0]["message"].get("reasoning_details"),
+        "tokens": usage.get("total_tokens", 0)
+    }), user_id=user_id, key=chat_writes(chat.id))
+    
+    # Update user stats and usage rollups (buffered, written in batches)
+    usage_ledger.record(
+        user_id,
+        tokens=usage.get("total_tokens", 0),
+        model_id=chat.model_id,
+        generation_type=chat.model_type,
+        usage=usage
+    )
+    
+    return assistant_message
+
+@router.post("/{chat_id}/messages", response_model=MessageSchema)
+async def send_message(
+    chat_id: int,
+    message: MessageCreate,
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    # Verify chat exists and belongs to user
+    chat = db.query(Chat).filter(Chat.id == chat_id, Chat.user_id == current_user.id).first()
+    if not chat:
+        raise HTTPException(status_code=404, detail="Chat not found")
+    
+    # The reply needs the whole conversation as context, and the new
+    # message has to come after a previous reply that is still being written
+    rehydrate_chat(db, chat_id)
+    await persistence_queue.settle(chat_writes(chat_id))
+    save_user_message(db, chat_id, message.content)
+    
+    try:
+        return await generate_reply(db, chat, current_user.id, request=request)
         
+    except ClientDisconnected:
+        raise HTTPException(status_code=499, detail="Client closed request")
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Error generating response: {str(e)}")
@@ -161,12 +336,21 @@ async def send_message(
 @router.get("/{chat_id}/messages", response_model=List[MessageSchema])
 async def get_chat_messages(
     chat_id: int,
+    request: Request,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    read_db: Session = Depends(get_read_db)
 ):
-    chat = db.query(Chat).filter(Chat.id == chat_id, Chat.user_id == current_user.id).first()
-    if not chat:
+    version, read_db = current_chat_version(db, read_db, current_user.id, chat_id)
+    if not version:
         raise HTTPException(status_code=404, detail="Chat not found")
+    # A reply saved in the same second as the message before it must still change the validator
+    etag = make_etag("messages", current_user.id, chat_id, version.message_count, version.last_message_id)
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
     
-    messages = db.query(Message).filter(Message.chat_id == chat_id).order_by(Message.created_at).all()
-    return messages
\ No newline at end of file
+    messages = read_db.execute(
+        select(*MESSAGE_COLUMNS).where(Message.chat_id == chat_id).order_by(Message.created_at, Message.id)
+    )
+    return set_validators(rows_response(messages), etag)
\ No newline at end of file
@@ -0,0 +1,59 @@
+import asyncio
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from app.config import settings
+from app.models.user import User
+from app.schemas.data import ImportResult
+from app.dependencies.auth import get_current_user
+from app.services.data_transfer import ImportFormatError, NdjsonImporter, export_user_data, split_lines
+
+router = APIRouter(prefix="/data", tags=["data"])
+
+@router.get("/export")
+async def export_data(current_user: User = Depends(get_current_user)):
+    """Stream all of the current user's chats, messages and generations as NDJSON"""
+    filename = f"crush-ai-export-{current_user.id}-{datetime.utcnow():%Y%m%d%H%M%S}.ndjson"
+    return StreamingResponse(
+        export_user_data(current_user.id),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@router.post("/import", response_model=ImportResult)
+async def import_data(
+    request: Request,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Import an NDJSON export into the current user's account. The body is
+    read as a stream and written in batches, each in its own transaction
+    on a session of the worker thread that writes it.
+    """
+    importer = NdjsonImporter(current_user.id)
+    buffer = bytearray()
+    
+    try:
+        async for chunk in request.stream():
+            buffer += chunk
+            for line in split_lines(buffer, settings.IMPORT_MAX_LINE_BYTES):
+                importer.add_line(line)
+                if importer.pending >= importer.batch_size:
+                    await asyncio.to_thread(importer.flush)
+        if buffer:
+            importer.add_line(bytes(buffer))
+        await asyncio.to_thread(importer.flush)
+    except ImportFormatError as e:
+        # Earlier batches stay committed
+        raise HTTPException(
+            status_code=400,
+            detail={"error": str(e), "line": e.line, "imported": importer.counts}
+        )
+    except ValueError as e:
+        # An oversized line
+        raise HTTPException(
+            status_code=400,
+            detail={"error": str(e), "imported": importer.counts}
+        )
+    
+    return importer.counts
\ No newline at end of file
@@ -1,23 +1,48 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Request
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
-from typing import List, Optional
-import base64
+from typing import Any, Dict, List, Optional
+import asyncio
+import io
+from app.config import settings
 from app.database import get_db
 from app.models.user import User
 from app.models.generation import Generation
 from app.schemas.generation import GenerationCreate, Generation as GenerationSchema, ImageGenerationRequest, AudioGenerationRequest
 from app.dependencies.auth import get_current_user
-from app.services.openrouter import openrouter_service
+from app.dependencies.database import get_read_db
+from app.services.openrouter import ClientDisconnected, openrouter_service
+from app.services.audio import AudioFormatError, process_audio, reply_text
+from app.services.persistence import InsertRow, persistence_queue
 from app.services.file_handler import file_handler
+from app.services.image_prep import image_preparer
+from app.services.media import decode_data_url, signed_media_url
+from app.services.usage_ledger import usage_ledger
 from app.utils.model_mappings import get_model_by_id
+from app.utils.compressed_json import lazy_json_columns
+from app.utils.conditional import make_etag, not_modified, set_validators
+from app.utils.responses import rows_response, schema_columns
 
 router = APIRouter(prefix="/generations", tags=["generations"])
 
+GENERATION_COLUMNS = lazy_json_columns(schema_columns(Generation.__table__, GenerationSchema))
+
+async def save_image(image_url: str, owner_id: int) -> Dict[str, Any]:
+    # Base64 decoding of large images runs off the event loop
+    image_bytes, extension = await asyncio.to_thread(decode_data_url, image_url)
+    filename, filepath = await file_handler.save_media(image_bytes, owner_id, extension)
+    return {
+        "url": image_url,
+        "media_url": signed_media_url(owner_id, filename),
+        "local_path": filepath,
+        "filename": filename
+    }
+
 @router.post("/image")
 async def generate_image(
     request: ImageGenerationRequest,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    http_request: Request,
+    current_user: User = Depends(get_current_user)
 ):
     # Verify model supports image generation
     model_info = get_model_by_id(request.model)
@@ -29,125 +54,211 @@ async def generate_image(
         response = await openrouter_service.generate_image(
             model=request.model,
             prompt=request.prompt,
-            num_images=request.num_images
+            num_images=request.num_images,
+            request=http_request
         )
         
-        # Process generated images
-        images = []
+        # Save the images concurrently, each under its content hash (served by /api/media)
+        image_urls = []
         if response.get("choices"):
             message = response["choices"][0]["message"]
-            if message.get("images"):
-                for idx, img in enumerate(message["images"]):
-                    image_url = img["image_url"]["url"]
-                    
-                    # Save image
-                    filename = f"gen_{current_user.id}_{idx}_{request.model.replace('/', '_')}.png"
-                    filepath = await file_handler.save_base64_image(image_url, filename)
-                    
-                    images.append({
-                        "url": image_url,
-                        "local_path": filepath,
-                        "filename": filename
-                    })
+            image_urls = [img["image_url"]["url"] for img in message.get("images") or []]
+        images = await asyncio.gather(*(save_image(url, current_user.id) for url in image_urls))
         
         # Save generation record
-        generation = Generation(
-            user_id=current_user.id,
-            model_id=request.model,
-            model_name=model_info["name"],
-            generation_type="image",
-            prompt=request.prompt,
-            result={"images": images},
-            generation_metadata={
+        generation = await persistence_queue.submit(InsertRow(Generation.__table__, {
+            "user_id": current_user.id,
+            "model_id": request.model,
+            "model_name": model_info["name"],
+            "generation_type": "image",
+            "prompt": request.prompt,
+            "result": {"images": images},
+            "generation_metadata": {
                 "negative_prompt": request.negative_prompt,
                 "num_images": request.num_images,
                 "size": request.size
             }
+        }), user_id=current_user.id)
+        usage_ledger.record(
+            current_user.id,
+            model_id=request.model,
+            generation_type="image",
+            usage=response.get("usage")
         )
         
-        db.add(generation)
-        current_user.total_generations += 1
-        db.commit()
-        db.refresh(generation)
-        
         return {
-            "generation_id": generation.id,
+            "generation_id": generation["id"],
             "images": images,
             "model": model_info["name"]
         }
         
+    except ClientDisconnected:
+        raise HTTPException(status_code=499, detail="Client closed request")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Image generation failed: {str(e)}")
 
 @router.post("/audio")
 async def generate_audio(
+    request: Request,
     prompt: str = Form(...),
     model: str = Form(...),
     audio_input: Optional[str] = Form(None),
     audio_file: Optional[UploadFile] = File(None),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user)
 ):
     # Verify model supports audio
     model_info = get_model_by_id(model)
     if not model_info or not model_info.get("supports_audio"):
         raise HTTPException(status_code=400, detail="Model does not support audio processing")
     
+    if audio_file:
+        stream = audio_file.file
+    elif audio_input:
+        # Base64 or a data URL
+        try:
+            data, _ = decode_data_url(audio_input, "wav")
+        except ValueError:
+            raise HTTPException(status_code=400, detail="audio_input is not valid base64")
+        stream = io.BytesIO(data)
+    else:
+        stream = None
+    
     try:
-        audio_base64 = None
-        if audio_file:
-            # Read and encode uploaded audio
-            content = await audio_file.read()
-            audio_base64 = base64.b64encode(content).decode('utf-8')
-        elif audio_input:
-            audio_base64 = audio_input
-        
-        # Process audio
-        response = await openrouter_service.generate_audio(
-            model=model,
-            prompt=prompt,
-            audio_input=audio_base64
-        )
+        # Long recordings are sent in overlapping parts and the replies stitched together
+        if stream is not None:
+            response, details = await process_audio(model, prompt, stream, request=request)
+        else:
+            response = await openrouter_service.generate_audio(model=model, prompt=prompt, request=request)
+            details = {}
         
         # Save generation record
-        generation = Generation(
-            user_id=current_user.id,
+        generation = await persistence_queue.submit(InsertRow(Generation.__table__, {
+            "user_id": current_user.id,
+            "model_id": model,
+            "model_name": model_info["name"],
+            "generation_type": "audio",
+            "prompt": prompt,
+            "result": response,
+            "generation_metadata": {
+                "has_audio_input": stream is not None,
+                **details
+            }
+        }), user_id=current_user.id)
+        usage_ledger.record(
+            current_user.id,
             model_id=model,
-            model_name=model_info["name"],
             generation_type="audio",
+            usage=response.get("usage")
+        )
+        
+        return {
+            "generation_id": generation["id"],
+            "response": reply_text(response),
+            **details
+        }
+        
+    except AudioFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ClientDisconnected:
+        raise HTTPException(status_code=499, detail="Client closed request")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Audio processing failed: {str(e)}")
+
+@router.post("/vision")
+async def analyze_images(
+    request: Request,
+    prompt: str = Form(...),
+    model: str = Form(...),
+    images: List[UploadFile] = File(...),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Ask a vision model about uploaded images. Each image is downscaled to
+    the model's useful resolution (and re-encoded) before it is sent.
+    """
+    model_info = get_model_by_id(model)
+    if not model_info or not model_info.get("supports_vision"):
+        raise HTTPException(status_code=400, detail="Model does not support vision")
+    if len(images) > settings.VISION_MAX_IMAGES:
+        raise HTTPException(status_code=400, detail=f"At most {settings.VISION_MAX_IMAGES} images per request")
+    
+    uploads = []
+    for image in images:
+        data = await image.read(settings.MAX_UPLOAD_SIZE + 1)
+        if len(data) > settings.MAX_UPLOAD_SIZE:
+            raise HTTPException(status_code=413, detail=f"{image.filename} is larger than {settings.MAX_UPLOAD_SIZE} bytes")
+        uploads.append(data)
+    
+    # Prepared payloads are cached by content hash, so re-asking about the same photo skips this
+    max_edge = model_info.get("vision_max_edge") or settings.VISION_MAX_EDGE
+    try:
+        prepared = await asyncio.gather(*(image_preparer.prepare(data, max_edge) for data in uploads))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        response = await openrouter_service.analyze_image(
+            model=model,
             prompt=prompt,
-            result=response,
-            generation_metadata={
-                "has_audio_input": bool(audio_base64)
-            }
+            image_url=[image.data_url for image in prepared],
+            request=request
         )
         
-        db.add(generation)
-        current_user.total_generations += 1
-        db.commit()
-        db.refresh(generation)
+        summaries = [image.summary() for image in prepared]
+        generation = await persistence_queue.submit(InsertRow(Generation.__table__, {
+            "user_id": current_user.id,
+            "model_id": model,
+            "model_name": model_info["name"],
+            "generation_type": "vision",
+            "prompt": prompt,
+            "result": response,
+            "generation_metadata": {
+                "images": summaries,
+                "max_edge": max_edge
+            }
+        }), user_id=current_user.id)
+        usage_ledger.record(
+            current_user.id,
+            model_id=model,
+            generation_type="vision",
+            usage=response.get("usage")
+        )
         
         return {
-            "generation_id": generation.id,
-            "response": response["choices"][0]["message"]["content"] if response.get("choices") else None
+            "generation_id": generation["id"],
+            "response": response["choices"][0]["message"]["content"] if response.get("choices") else None,
+            "model": model_info["name"],
+            "images": summaries
         }
         
+    except ClientDisconnected:
+        raise HTTPException(status_code=499, detail="Client closed request")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Audio processing failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Vision analysis failed: {str(e)}")
 
 @router.get("/", response_model=List[GenerationSchema])
 async def get_user_generations(
+    request: Request,
     generation_type: Optional[str] = None,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    query = db.query(Generation).filter(Generation.user_id == current_user.id)
-    
+    conditions = [Generation.user_id == current_user.id]
     if generation_type:
-        query = query.filter(Generation.generation_type == generation_type)
+        conditions.append(Generation.generation_type == generation_type)
+    
+    # Generations are never edited: count and newest id identify the list
+    # (no Last-Modified: several can be created within one second)
+    count, last_id = db.execute(
+        select(func.count(Generation.id), func.max(Generation.id)).where(*conditions)
+    ).one()
+    etag = make_etag("generations", current_user.id, generation_type, count, last_id)
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
     
-    generations = query.order_by(Generation.created_at.desc()).all()
-    return generations
+    query = select(*GENERATION_COLUMNS).where(*conditions).order_by(Generation.created_at.desc())
+    return set_validators(rows_response(db.execute(query)), etag)
 
 @router.get("/{generation_id}", response_model=GenerationSchema)
 async def get_generation(
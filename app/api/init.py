@@ -1 +1 @@
-from app.api import auth, chats, models, generations
\ No newline at end of file
+from app.api import auth, chats, chat_socket, models, generations, admin, usage, data, media
\ No newline at end of file
@@ -0,0 +1,91 @@
+import asyncio
+import os
+import stat
+from datetime import datetime, timezone
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException, Query, Request
+from fastapi.responses import FileResponse, Response
+from app.config import settings
+from app.services.media import MEDIA_NAME_RE, media_path, media_type, token_owner, verify_signature
+from app.utils.conditional import etag_matches, not_modified
+
+router = APIRouter(prefix="/media", tags=["media"])
+
+# Legacy flat files under /uploads (replaces the StaticFiles mount)
+uploads_router = APIRouter(tags=["media"], include_in_schema=False)
+
+async def stat_file(path: str) -> Optional[os.stat_result]:
+    try:
+        result = await asyncio.to_thread(os.stat, path)
+    except OSError:
+        return None
+    return result if stat.S_ISREG(result.st_mode) else None
+
+@router.get("/{owner_id}/{name}")
+async def get_media(
+    request: Request,
+    owner_id: int,
+    name: str,
+    sig: Optional[str] = Query(None),
+    exp: Optional[int] = Query(None),
+    authorization: Optional[str] = Header(None)
+):
+    """
+    Serve a content-addressed file. Access needs either a signed URL or a
+    bearer token for the owner; both are checked without a database query.
+    The name is the content hash, so the file is cached as immutable and
+    revalidation is answered before touching the disk.
+    """
+    if not MEDIA_NAME_RE.match(name):
+        raise HTTPException(status_code=404, detail="Not found")
+
+    authorized = (
+        sig is not None and verify_signature(owner_id, name, sig, exp)
+    ) or token_owner(authorization) == owner_id
+    if not authorized:
+        # Same answer as a missing file, so names can't be probed
+        raise HTTPException(status_code=404, detail="Not found")
+
+    headers = {
+        "ETag": f'"{name.split(".")[0]}"',
+        "Cache-Control": f"private, max-age={settings.MEDIA_CACHE_MAX_AGE}, immutable"
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None and etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    path = media_path(owner_id, name)
+    stat_result = await stat_file(path)
+    if stat_result is None:
+        raise HTTPException(status_code=404, detail="Not found")
+
+    # FileResponse handles Range/If-Range and uses pathsend when the server offers it
+    return FileResponse(path, media_type=media_type(name), headers=headers, stat_result=stat_result)
+
+@uploads_router.get("/uploads/{filename}")
+async def get_upload(request: Request, filename: str):
+    """
+    Files saved before content addressing; their names can be reused, so
+    they are cached briefly and revalidated by ETag/Last-Modified
+    """
+    if filename.startswith(".") or os.path.basename(filename) != filename:
+        raise HTTPException(status_code=404, detail="Not found")
+
+    path = os.path.join(settings.UPLOAD_DIR, filename)
+    stat_result = await stat_file(path)
+    if stat_result is None:
+        raise HTTPException(status_code=404, detail="Not found")
+
+    cache_control = f"public, max-age={settings.LEGACY_UPLOADS_MAX_AGE}"
+    response = FileResponse(
+        path,
+        media_type=media_type(filename),
+        headers={"Cache-Control": cache_control},
+        stat_result=stat_result
+    )
+    last_modified = datetime.fromtimestamp(stat_result.st_mtime, tz=timezone.utc)
+    cached = not_modified(request, response.headers["etag"], last_modified)
+    if cached is not None:
+        cached.headers["Cache-Control"] = cache_control
+        return cached
+    return response
\ No newline at end of file
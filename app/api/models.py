@@ -1,14 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List, Dict, Any
-from app.utils.model_mappings import MODELS, get_models_by_type, get_model_by_id
+from fastapi import APIRouter, Depends, HTTPException, Request
+from typing import List, Dict, Any, Tuple
 from app.dependencies.auth import get_current_user
 from app.models.user import User
+from app.services.model_catalog import CatalogSnapshot, model_catalog
+from app.utils.responses import PrecompressedJSON
 
 router = APIRouter(prefix="/models", tags=["models"])
 
-@router.get("/")
-async def get_all_models(current_user: User = Depends(get_current_user)):
-    """Get all available models"""
+# Each catalog version is encoded and compressed once per listing
+_catalog_cache: Dict[Tuple[str, str], PrecompressedJSON] = {}
+
+def all_models_payload(snapshot: CatalogSnapshot) -> Dict[str, Any]:
     return {
         "models": [
             {
@@ -19,17 +21,12 @@ async def get_all_models(current_user: User = Depends(get_current_user)):
                 "description": model["description"],
                 "free": model["free"]
             }
-            for model in MODELS.values()
+            for model in snapshot.models.values()
         ]
     }
 
-@router.get("/{model_type}")
-async def get_models_by_type_endpoint(
-    model_type: str,
-    current_user: User = Depends(get_current_user)
-):
-    """Get models by type (text, image, audio, vision)"""
-    models = get_models_by_type(model_type)
+def models_by_type_payload(snapshot: CatalogSnapshot, model_type: str) -> Dict[str, Any]:
+    models = snapshot.by_type.get(model_type, ())
     return {
         "type": model_type,
         "models": [
@@ -43,14 +40,44 @@ async def get_models_by_type_endpoint(
         ]
     }
 
+def cached_catalog(snapshot: CatalogSnapshot, key: str, build) -> PrecompressedJSON:
+    cache_key = (snapshot.version, key)
+    cached = _catalog_cache.get(cache_key)
+    if cached is None:
+        # Listings of older catalog versions are no longer served
+        for stale in [k for k in _catalog_cache if k[0] != snapshot.version]:
+            _catalog_cache.pop(stale, None)
+        cached = _catalog_cache[cache_key] = PrecompressedJSON(build())
+    return cached
+
+@router.get("/")
+async def get_all_models(request: Request, current_user: User = Depends(get_current_user)):
+    """Get all available models"""
+    snapshot = model_catalog.snapshot
+    return cached_catalog(snapshot, "all", lambda: all_models_payload(snapshot)).response(request)
+
+@router.get("/{model_type}")
+async def get_models_by_type_endpoint(
+    model_type: str,
+    request: Request,
+    current_user: User = Depends(get_current_user)
+):
+    """Get models by type (text, image, audio, vision)"""
+    snapshot = model_catalog.snapshot
+    if model_type not in snapshot.by_type:
+        return models_by_type_payload(snapshot, model_type)
+    return cached_catalog(
+        snapshot, f"type:{model_type}", lambda: models_by_type_payload(snapshot, model_type)
+    ).response(request)
+
 @router.get("/model/{model_id}")
 async def get_model_info(
     model_id: str,
     current_user: User = Depends(get_current_user)
 ):
     """Get specific model information"""
-    model = get_model_by_id(model_id)
+    model = model_catalog.get(model_id)
     if not model:
         raise HTTPException(status_code=404, detail="Model not found")
     
-    return model
\ No newline at end of file
+    return dict(model)
\ No newline at end of file
@@ -0,0 +1,56 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from typing import Optional
+from datetime import datetime, timedelta
+from app.database import get_db
+from app.models.user import User
+from app.models.usage import UsageRollup, GlobalUsageRollup, USAGE_COUNTERS
+from app.schemas.usage import UsageSeries
+from app.dependencies.auth import get_current_user
+
+router = APIRouter(prefix="/usage", tags=["usage"])
+
+def usage_series(
+    db: Session,
+    days: int,
+    user_id: Optional[int] = None,
+    model_id: Optional[str] = None,
+    generation_type: Optional[str] = None
+) -> dict:
+    """
+    Read rollup buckets for the last `days` days (one row per bucket, no
+    scan of messages or generations)
+    """
+    end = datetime.utcnow().date()
+    start = end - timedelta(days=days - 1)
+    
+    rollup = UsageRollup if user_id is not None else GlobalUsageRollup
+    query = db.query(rollup).filter(rollup.day >= start, rollup.day <= end)
+    if user_id is not None:
+        query = query.filter(rollup.user_id == user_id)
+    if model_id:
+        query = query.filter(rollup.model_id == model_id)
+    if generation_type:
+        query = query.filter(rollup.generation_type == generation_type)
+    
+    buckets = query.order_by(rollup.day, rollup.model_id, rollup.generation_type).all()
+    totals = {name: sum(getattr(bucket, name) for bucket in buckets) for name in USAGE_COUNTERS}
+    
+    return {
+        "user_id": user_id,
+        "start": start,
+        "end": end,
+        "buckets": buckets,
+        "totals": totals
+    }
+
+@router.get("/me", response_model=UsageSeries)
+async def get_my_usage(
+    days: int = Query(30, ge=1, le=366),
+    model_id: Optional[str] = None,
+    generation_type: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Daily usage of the current user per model and generation type"""
+    return usage_series(db, days, current_user.id, model_id, generation_type)
\ No newline at end of file
@@ -0,0 +1,107 @@
+import argparse
+import json
+import time
+from app.config import settings
+from app.database import SessionLocal
+
+def migrate(args):
+    """Create missing tables and indexes (run before starting workers)"""
+    from app.database import init_db
+    
+    started = time.perf_counter()
+    init_db()
+    print(json.dumps({"migrated": True, "seconds": round(time.perf_counter() - started, 3)}))
+
+def backfill_usage(args):
+    """Rebuild usage rollups from historical messages and generations"""
+    from app.services.usage_ledger import rebuild_usage_rollups
+    
+    db = SessionLocal()
+    try:
+        print(json.dumps(rebuild_usage_rollups(db, batch_size=args.batch_size)))
+    finally:
+        db.close()
+
+def search_reindex(args):
+    """Rebuild the full-text message search index (SQLite only)"""
+    from app.database import engine
+    from app.services.search import fts_supported, init_search_index, rebuild_search_index
+    
+    if not fts_supported(engine):
+        print(json.dumps({"indexed": 0, "detail": "Full-text index is only used on SQLite"}))
+        return
+    init_search_index(engine)
+    print(json.dumps({"indexed": rebuild_search_index(engine)}))
+
+def catalog_refresh(args):
+    """Fetch the model catalog from OpenRouter and save the startup snapshot"""
+    import asyncio
+    from app.services.model_catalog import model_catalog
+    from app.services.openrouter import openrouter_service
+    
+    async def refresh():
+        try:
+            return await model_catalog.refresh()
+        finally:
+            await openrouter_service.close()
+    
+    result = asyncio.run(refresh())
+    snapshot = model_catalog.snapshot
+    print(json.dumps({"result": result, "models": len(snapshot.models), "version": snapshot.version, "path": model_catalog.path}))
+
+def archive(args):
+    """Move inactive chats to compressed cold storage and reclaim the space"""
+    from app.database import engine
+    from app.models import user, chat, generation, usage  # noqa: F401 (mapper relationships)
+    from app.services.archive import archive_inactive_chats, reclaim_space
+    
+    db = SessionLocal()
+    try:
+        archived = archive_inactive_chats(db, days=args.days, batch_size=args.batch_size)
+    finally:
+        db.close()
+    print(json.dumps({"archived": archived, "vacuum": reclaim_space(engine, full=args.full_vacuum)}))
+
+def compress_json(args):
+    """Rewrite message and generation JSON fields still stored as plain JSON in the compressed format"""
+    from app.models import user, chat, generation, usage  # noqa: F401 (mapper relationships)
+    from app.services.column_compression import compress_json_columns
+    
+    db = SessionLocal()
+    try:
+        print(json.dumps(compress_json_columns(db, batch_size=args.batch_size)))
+    finally:
+        db.close()
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="CRUSH AI maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    migrate_parser = commands.add_parser("migrate", help=migrate.__doc__)
+    migrate_parser.set_defaults(handler=migrate)
+    
+    backfill = commands.add_parser("backfill-usage", help=backfill_usage.__doc__)
+    backfill.add_argument("--batch-size", type=int, default=1000)
+    backfill.set_defaults(handler=backfill_usage)
+    
+    reindex = commands.add_parser("search-reindex", help=search_reindex.__doc__)
+    reindex.set_defaults(handler=search_reindex)
+    
+    catalog = commands.add_parser("catalog-refresh", help=catalog_refresh.__doc__)
+    catalog.set_defaults(handler=catalog_refresh)
+    
+    archive_parser = commands.add_parser("archive", help=archive.__doc__)
+    archive_parser.add_argument("--days", type=int, default=settings.ARCHIVE_AFTER_DAYS)
+    archive_parser.add_argument("--batch-size", type=int, default=settings.ARCHIVE_BATCH_SIZE)
+    archive_parser.add_argument("--full-vacuum", action="store_true", help="Run VACUUM (locks the database) and switch it to incremental auto_vacuum")
+    archive_parser.set_defaults(handler=archive)
+    
+    compress_parser = commands.add_parser("compress-json", help=compress_json.__doc__)
+    compress_parser.add_argument("--batch-size", type=int, default=500)
+    compress_parser.set_defaults(handler=compress_json)
+    
+    args = parser.parse_args()
+    args.handler(args)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
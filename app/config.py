@@ -5,6 +5,12 @@ from typing import Optional
 class Settings(BaseSettings):
     # Database
     DATABASE_URL: str = "sqlite:///./crush_ai.db"
+    READ_DATABASE_URL: str = ""  # Read replica for list endpoints; empty = none
+    SQLITE_READ_POOL: bool = False  # Without a replica: WAL mode plus a read-only pool on the SQLite file
+    SQLITE_READ_POOL_SIZE: int = 10
+    REPLICA_MAX_LAG_SECONDS: float = 5.0  # Reads go to the primary while the replica is further behind
+    REPLICA_CHECK_INTERVAL_SECONDS: float = 2.0
+    READ_AFTER_WRITE_SECONDS: float = 5.0  # A user's reads stay on the primary this long after their writes
     
     # Security
     SECRET_KEY: str = "your-secret-key-change-in-production"
@@ -14,15 +20,98 @@ class Settings(BaseSettings):
     # OpenRouter
     OPENROUTER_API_KEY: str
     OPENROUTER_BASE_URL: str = "https://openrouter.ai/api/v1"
+    OPENROUTER_TIMEOUT: float = 120.0
+    OPENROUTER_MAX_CONNECTIONS: int = 100
+    PROMPT_CACHE_MIN_CHARS: int = 4096  # Shortest conversation prefix (~1k tokens) worth a cache breakpoint
+    KEEP_PARTIAL_ON_DISCONNECT: bool = False  # Save the reply streamed so far when a client leaves mid-generation
+    
+    # Model catalog (synced from OpenRouter /models)
+    MODEL_CATALOG_PATH: str = "model_catalog.json"  # Last fetched listing, loaded at startup; empty disables
+    MODEL_CATALOG_REFRESH_SECONDS: float = 900  # 0 disables background refresh
+    MODEL_CATALOG_RETRY_SECONDS: float = 30  # First retry delay after a failed refresh, doubled per failure
+    MODEL_CATALOG_ADD_FREE: bool = False  # Also offer free upstream models that aren't in the curated list
     
     # App
     APP_NAME: str = "CRUSH AI"
     APP_URL: str = "http://192.168.10.112:8000"
     SITE_URL: str = "http://192.168.10.112:8000"
     
+    # Server (run.py)
+    HOST: str = "0.0.0.0"
+    PORT: int = 8000
+    WEB_WORKERS: int = 0  # Production worker processes; 0 = one per available CPU core
+    
     # Upload
     UPLOAD_DIR: str = "uploads"
     MAX_UPLOAD_SIZE: int = 10 * 1024 * 1024  # 10MB
+    MEDIA_CACHE_MAX_AGE: int = 31536000  # Content-addressed media never changes
+    MEDIA_URL_TTL_SECONDS: int = 0  # Signed media URL lifetime; 0 = no expiry (stable, cacheable URLs)
+    LEGACY_UPLOADS_MAX_AGE: int = 300  # Cache lifetime for files under /uploads, whose names can be reused
+    
+    # Vision uploads (POST /api/generations/vision)
+    VISION_MAX_EDGE: int = 1024  # Default longest side for models without vision_max_edge
+    VISION_MAX_IMAGES: int = 4
+    VISION_JPEG_QUALITY: int = 85
+    VISION_PREP_WORKERS: int = 4  # Threads decoding and resizing uploads
+    VISION_CACHE_MAX_BYTES: int = 32 * 1024 * 1024  # Prepared payloads kept by content hash
+    
+    # Audio inputs (POST /api/generations/audio)
+    AUDIO_SEGMENT_SECONDS: float = 120  # WAV/MP3 inputs longer than this are sent in parts; 0 sends them whole
+    AUDIO_SEGMENT_OVERLAP_SECONDS: float = 2  # Audio repeated at the start of each part so words at a cut aren't lost
+    AUDIO_SEGMENT_CONCURRENCY: int = 4  # Parts in flight (and held in memory) per request
+    
+    # Admission control (load shedding for upstream-bound routes)
+    ADMISSION_MAX_INFLIGHT: int = 64
+    ADMISSION_MAX_LOOP_LAG_MS: int = 250  # 0 disables the lag check
+    ADMISSION_RETRY_AFTER_SECONDS: int = 5
+    
+    # Usage accounting (write-behind ledger)
+    USAGE_FLUSH_INTERVAL_SECONDS: float = 2.0
+    USAGE_FLUSH_MAX_PENDING: int = 500  # Flush early once this many users are buffered
+    
+    # Persistence of replies and generation records (write queue)
+    PERSISTENCE_MODE: str = "durable"  # "async" responds once the row is inserted and commits afterwards
+    PERSISTENCE_QUEUE_SIZE: int = 1000  # Queued writes before requests wait for room
+    PERSISTENCE_BATCH_SIZE: int = 50  # Writes committed per transaction
+    PERSISTENCE_MAX_ATTEMPTS: int = 5
+    PERSISTENCE_RETRY_SECONDS: float = 0.2  # First retry delay, doubled per attempt
+    
+    # Chat WebSocket (/api/chats/ws)
+    WS_AUTH_TIMEOUT_SECONDS: float = 10.0  # Time allowed for the auth frame after connecting
+    WS_MAX_ACTIVE_TURNS: int = 4  # Replies generating at once per connection
+    WS_MAX_QUEUED_FRAMES: int = 64  # Outbound frames buffered per connection before senders wait
+    WS_MAX_PENDING_CHARS: int = 64 * 1024  # Unsent reply text per connection before upstream reads pause
+    
+    # Cold storage for inactive chats (python -m app.cli archive)
+    ARCHIVE_AFTER_DAYS: int = 180  # Chats without activity for this long are archived
+    ARCHIVE_BATCH_SIZE: int = 100  # Chats archived per transaction
+    ARCHIVE_COMPRESSION_LEVEL: int = 9
+    
+    # Compressed JSON columns (reasoning traces, code blocks, generation results)
+    JSON_COMPRESSION_CODEC: str = "zstd"  # zstd when zstandard is installed, otherwise zlib
+    JSON_COMPRESSION_MIN_BYTES: int = 256  # Smaller values are stored uncompressed
+    
+    # Data export/import (NDJSON)
+    EXPORT_BATCH_SIZE: int = 500  # Rows fetched per server-side cursor batch
+    IMPORT_BATCH_SIZE: int = 1000  # Rows inserted per transaction
+    IMPORT_MAX_LINE_BYTES: int = 16 * 1024 * 1024
+    
+    # Response compression (gzip always; br/zstd when brotli/zstandard are installed)
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MIN_SIZE: int = 1024  # Smaller bodies are sent as-is
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 5
+    COMPRESSION_ZSTD_LEVEL: int = 3
+    
+    # Metrics
+    METRICS_ENABLED: bool = True
+    
+    # Profiling
+    PROFILE_DIR: str = "profiles"
+    PROFILING_HEADER_ENABLED: bool = True  # X-Profile header, superusers only
+    PROFILING_SAMPLE_RATE: float = 0.0  # Fraction of all requests to profile
+    PROFILING_INTERVAL_MS: int = 5
+    PROFILING_MAX_FILES: int = 200
     
     model_config = ConfigDict(env_file=".env", env_file_encoding="utf-8")
 
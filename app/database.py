@@ -1,17 +1,70 @@
-from sqlalchemy import create_engine
+import os
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.config import settings
+from app.services.metrics import instrument_engine
 
 engine = create_engine(
     settings.DATABASE_URL, 
     connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {}
 )
 
+def sqlite_read_only_url(url: str) -> str:
+    """The same SQLite file, opened read-only"""
+    database = make_url(url).database
+    if not database or database == ":memory:":
+        raise ValueError("SQLITE_READ_POOL needs a file-backed SQLite database")
+    return f"sqlite:///file:{os.path.abspath(database)}?mode=ro&uri=true"
+
+# Engine for read-mostly GET endpoints (see get_read_db): a replica, or a
+# read-only connection pool over the SQLite file; None reads from `engine`
+read_engine = None
+if settings.READ_DATABASE_URL:
+    read_engine = create_engine(
+        settings.READ_DATABASE_URL,
+        connect_args={"check_same_thread": False} if "sqlite" in settings.READ_DATABASE_URL else {}
+    )
+elif settings.SQLITE_READ_POOL and engine.dialect.name == "sqlite":
+    @event.listens_for(engine, "connect")
+    def _enable_wal(dbapi_connection, connection_record):
+        # Readers on other connections don't block the writer (or wait for it) in WAL mode
+        dbapi_connection.execute("PRAGMA journal_mode = WAL")
+
+    read_engine = create_engine(
+        sqlite_read_only_url(settings.DATABASE_URL),
+        connect_args={"check_same_thread": False},
+        pool_size=settings.SQLITE_READ_POOL_SIZE
+    )
+
+if settings.METRICS_ENABLED:
+    instrument_engine(engine)
+    if read_engine is not None:
+        instrument_engine(read_engine)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine) if read_engine is not None else None
 
 Base = declarative_base()
 
+def init_db(bind=engine):
+    """
+    Create missing tables and the SQLite search index. Run once per deploy
+    (python -m app.cli migrate), not on every worker import.
+    """
+    # Register every model on Base.metadata before creating tables
+    from app.models import user, chat, generation, usage  # noqa: F401
+    from app.services.search import init_search_index
+    
+    with bind.begin() as connection:
+        if connection.dialect.name == "sqlite":
+            # Only takes effect on a new database; lets the archive job hand
+            # freed pages back with PRAGMA incremental_vacuum
+            connection.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+        Base.metadata.create_all(bind=connection)
+    init_search_index(bind)
+
 def get_db():
     db = SessionLocal()
     try:
@@ -36,6 +36,8 @@ async def get_current_user(
             detail="Inactive user"
         )
     
+    # Lets the session's commits count as this user's writes (read-your-writes routing)
+    db.info["user_id"] = user.id
     return user
 
 async def get_current_active_superuser(
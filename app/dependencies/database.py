@@ -0,0 +1,27 @@
+from fastapi import Depends
+from sqlalchemy.orm import Session
+from app.database import ReadSessionLocal, get_db
+from app.dependencies.auth import get_current_user
+from app.models.user import User
+from app.services.read_routing import read_router, read_sessions_total
+
+def get_read_db(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Session for read-only endpoints: the read engine while it is caught up
+    and the user has no recent writes, otherwise the request's primary
+    session. Never write through it.
+    """
+    if ReadSessionLocal is None or not read_router.use_replica(current_user.id):
+        read_sessions_total.inc(target="primary")
+        yield db
+        return
+    
+    read_sessions_total.inc(target="replica")
+    read_db = ReadSessionLocal()
+    try:
+        yield read_db
+    finally:
+        read_db.close()
@@ -1 +1,2 @@
-from app.dependencies.auth import get_current_user, get_current_active_superuser
\ No newline at end of file
+from app.dependencies.auth import get_current_user, get_current_active_superuser
+from app.dependencies.database import get_read_db
\ No newline at end of file
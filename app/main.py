@@ -1,20 +1,81 @@
+import time
+
+# Measured from here so the import cost of the framework and app is included
+_import_started = time.perf_counter()
+
+from contextlib import asynccontextmanager
+import logging
 from fastapi import FastAPI
+from fastapi.datastructures import Default
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-import os
+from fastapi.responses import PlainTextResponse
 from app.config import settings
-from app.database import engine, Base
-from app.api import auth, chats, models, generations
+from app.api import auth, chats, chat_socket, models, generations, admin, usage, data, media
+from app.middleware.admission import AdmissionMiddleware
+from app.middleware.compression import CompressionMiddleware
+from app.middleware.metrics import MetricsMiddleware
+from app.middleware.profiling import ProfilingMiddleware
+from app.services.admission import admission_controller
+from app.services.image_prep import image_preparer
+from app.services.metrics import metrics
+from app.services.model_catalog import model_catalog
+from app.services.openrouter import openrouter_service
+from app.services.persistence import persistence_queue
+from app.services.read_routing import read_router
+from app.services.usage_ledger import usage_ledger
+from app.utils.responses import ORJSONResponse
+
+# Schema setup is an explicit step (python -m app.cli migrate), not done on import
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+# Startup timing goes to the server log, so cold-start regressions show up there
+logger = logging.getLogger("uvicorn.error")
+startup_import_seconds = metrics.gauge("app_import_seconds", "Seconds spent importing the application module")
+startup_lifespan_seconds = metrics.gauge("app_startup_seconds", "Seconds spent in lifespan startup")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    started = time.perf_counter()
+    admission_controller.start()
+    usage_ledger.start()
+    persistence_queue.start()
+    read_router.start()
+    model_catalog.start()
+    lifespan_seconds = time.perf_counter() - started
+    startup_lifespan_seconds.set(lifespan_seconds)
+    logger.info("Startup: import %.3fs, lifespan %.3fs", import_seconds, lifespan_seconds)
+    yield
+    await admission_controller.stop()
+    await persistence_queue.stop()
+    await read_router.stop()
+    image_preparer.stop()
+    await usage_ledger.stop()
+    await model_catalog.stop()
+    await openrouter_service.close()
 
 app = FastAPI(
     title=settings.APP_NAME,
     description="CRUSH AI - Universal AI Generation Platform",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    # Wrapped in Default() so routes with a response_model keep FastAPI's
+    # direct Pydantic-to-JSON path; plain dict responses render with orjson
+    default_response_class=Default(ORJSONResponse)
 )
 
+# Response compression (innermost, so request metrics include its cost)
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
+
+# Load shedding for expensive routes (added first so CORS wraps its 503s)
+app.add_middleware(AdmissionMiddleware)
+
+# Request metrics (outside admission control so shed requests are counted too)
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+# On-demand profiling (X-Profile header from a superuser, or sampled)
+app.add_middleware(ProfilingMiddleware)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -24,15 +85,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Create uploads directory if not exists
-os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
-app.mount("/uploads", StaticFiles(directory=settings.UPLOAD_DIR), name="uploads")
-
 # Include routers
 app.include_router(auth.router, prefix="/api")
 app.include_router(chats.router, prefix="/api")
+app.include_router(chat_socket.router, prefix="/api")
 app.include_router(models.router, prefix="/api")
 app.include_router(generations.router, prefix="/api")
+app.include_router(usage.router, prefix="/api")
+app.include_router(data.router, prefix="/api")
+app.include_router(media.router, prefix="/api")
+app.include_router(media.uploads_router)
+app.include_router(admin.router, prefix="/api")
 
 @app.get("/")
 async def root():
@@ -45,4 +108,12 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
\ No newline at end of file
+    return {"status": "healthy"}
+
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics_endpoint():
+        return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+import_seconds = time.perf_counter() - _import_started
+startup_import_seconds.set(import_seconds)
\ No newline at end of file
@@ -0,0 +1,45 @@
+import re
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+from app.services.admission import AdmissionController, admission_controller
+
+# Upstream-bound and bulk-write routes that are shed first when the service
+# is overloaded. Everything else (health, chat lists, model catalog) is
+# always admitted.
+EXPENSIVE_ROUTES = [
+    ("POST", re.compile(r"^/api/chats/[^/]+/messages/?$")),
+    ("POST", re.compile(r"^/api/generations/.+")),
+    ("POST", re.compile(r"^/api/data/import/?$")),
+]
+
+def is_expensive(method: str, path: str) -> bool:
+    return any(method == m and pattern.match(path) for m, pattern in EXPENSIVE_ROUTES)
+
+class AdmissionMiddleware:
+    """
+    Rejects expensive requests with 503 and Retry-After once the admission
+    controller reports overload
+    """
+    def __init__(self, app: ASGIApp, controller: AdmissionController = admission_controller):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not is_expensive(scope["method"], scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        reason = self.controller.try_acquire()
+        if reason:
+            response = JSONResponse(
+                {"detail": f"Service temporarily unavailable: {reason}"},
+                status_code=503,
+                headers={"Retry-After": str(self.controller.retry_after_seconds())}
+            )
+            await response(scope, receive, send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release()
\ No newline at end of file
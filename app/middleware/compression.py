@@ -0,0 +1,113 @@
+import asyncio
+from typing import Optional
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.config import settings
+from app.utils.compression import StreamCompressor, compress, is_compressible, negotiate_encoding, stream_compressor
+
+# Bodies above this are compressed in a worker thread to keep the loop responsive
+THREAD_COMPRESS_MIN_SIZE = 256 * 1024
+
+class CompressionMiddleware:
+    """
+    Negotiated zstd/br/gzip compression of compressible responses.
+
+    Single-body responses under COMPRESSION_MIN_SIZE are sent as-is.
+    Streamed bodies are compressed chunk by chunk and flushed after every
+    chunk, so NDJSON exports still arrive progressively. Server-sent events
+    and responses that already carry a Content-Encoding (such as the
+    pre-compressed model catalog) pass through untouched.
+    """
+    def __init__(self, app: ASGIApp, minimum_size: int = settings.COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        await CompressionResponder(self.app, encoding, self.minimum_size)(scope, receive, send)
+
+class CompressionResponder:
+    def __init__(self, app: ASGIApp, encoding: str, minimum_size: int):
+        self.app = app
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.send: Optional[Send] = None
+        self.start_message: Optional[Message] = None
+        # None until the first body message decides; then True/False
+        self.compressing: Optional[bool] = None
+        self.compressor: Optional[StreamCompressor] = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        self.send = send
+        await self.app(scope, receive, self.send_wrapper)
+
+    async def send_wrapper(self, message: Message):
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            if (
+                "content-encoding" in headers
+                or message["status"] < 200
+                or message["status"] in (204, 304)
+                or headers.get("content-type", "").startswith("text/event-stream")
+                or not is_compressible(headers.get("content-type"))
+            ):
+                self.compressing = False
+                await self.send(message)
+            else:
+                # Hold the headers until the first body chunk shows the size
+                self.start_message = message
+            return
+
+        if self.compressing is False or message_type != "http.response.body":
+            if self.start_message is not None:
+                # e.g. http.response.pathsend: nothing to compress
+                await self.send(self.start_message)
+                self.start_message = None
+                self.compressing = False
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.compressing is None:
+            headers = MutableHeaders(raw=self.start_message["headers"])
+            if not more_body and len(body) < self.minimum_size:
+                self.compressing = False
+                await self.send(self.start_message)
+                await self.send(message)
+                return
+
+            self.compressing = True
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            if not more_body:
+                body = await self._compress(body)
+                headers["Content-Length"] = str(len(body))
+                await self.send(self.start_message)
+                await self.send({"type": "http.response.body", "body": body})
+                return
+
+            # Streaming: length unknown, flush every chunk
+            del headers["Content-Length"]
+            self.compressor = stream_compressor(self.encoding)
+            await self.send(self.start_message)
+
+        data = self.compressor.compress(body) if body else b""
+        if not more_body:
+            data += self.compressor.finish()
+        await self.send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+    async def _compress(self, body: bytes) -> bytes:
+        if len(body) >= THREAD_COMPRESS_MIN_SIZE:
+            return await asyncio.to_thread(compress, body, self.encoding)
+        return compress(body, self.encoding)
\ No newline at end of file
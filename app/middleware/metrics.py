@@ -0,0 +1,34 @@
+import time
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.services.metrics import http_requests_total, http_request_duration
+
+class MetricsMiddleware:
+    """
+    Records latency and status per route template (not per raw path, so
+    path parameters don't explode label cardinality)
+    """
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            http_request_duration.observe(time.perf_counter() - started, method=method, route=route_path)
+            http_requests_total.inc(method=method, route=route_path, status=str(status_code))
\ No newline at end of file
@@ -0,0 +1,88 @@
+import random
+import threading
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.config import settings
+from app.database import SessionLocal
+from app.models.user import User
+from app.services.auth import auth_service
+from app.services.profiler import ProfileStore, StackSampler, profile_store
+
+PROFILE_HEADER = "x-profile"
+
+def is_superuser_token(token: str) -> bool:
+    """
+    Whether the token belongs to an active superuser; blocking, run it in
+    the threadpool
+    """
+    payload = auth_service.decode_token(token)
+    if not payload or not payload.get("sub"):
+        return False
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.username == payload["sub"]).first()
+        return user is not None and bool(user.is_active and user.is_superuser)
+    finally:
+        db.close()
+
+class ProfilingMiddleware:
+    """
+    Profiles a request when a superuser asks for it with the X-Profile
+    header, or when it is picked by PROFILING_SAMPLE_RATE. The dump name is
+    returned in the X-Profile-Id response header.
+
+    The sampler sees the whole event loop thread, so the dump name records
+    how many requests were in flight when profiling started; other
+    requests' frames are mixed into a profile taken under load.
+    """
+    def __init__(self, app: ASGIApp, store: ProfileStore = profile_store):
+        self.app = app
+        self.store = store
+        self.inflight = 0
+
+    async def _is_superuser(self, headers: Headers) -> bool:
+        scheme, _, token = headers.get("authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            return False
+        return await run_in_threadpool(is_superuser_token, token)
+
+    async def _should_profile(self, scope: Scope) -> bool:
+        if settings.PROFILING_SAMPLE_RATE and random.random() < settings.PROFILING_SAMPLE_RATE:
+            return True
+
+        headers = Headers(scope=scope)
+        if settings.PROFILING_HEADER_ENABLED and headers.get(PROFILE_HEADER):
+            return await self._is_superuser(headers)
+        return False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        self.inflight += 1
+        try:
+            if await self._should_profile(scope):
+                await self._profile(scope, receive, send)
+            else:
+                await self.app(scope, receive, send)
+        finally:
+            self.inflight -= 1
+
+    async def _profile(self, scope: Scope, receive: Receive, send: Send):
+        sampler = StackSampler(threading.get_ident(), settings.PROFILING_INTERVAL_MS / 1000)
+        # Reserve the dump name up front so it can go out in the response headers
+        name = self.store.new_name(scope["method"], scope["path"], inflight=self.inflight)
+
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", name.encode())]
+            await send(message)
+
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            sampler.stop()
+            self.store.save(sampler, name)
\ No newline at end of file
@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON, LargeBinary
 from sqlalchemy.sql import func
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import deferred, relationship
 from app.database import Base
+from app.utils.compressed_json import CompressedJSON
 
 class Chat(Base):
     __tablename__ = "chats"
@@ -18,17 +19,18 @@ class Chat(Base):
     # Relationships
     user = relationship("User")
     messages = relationship("Message", back_populates="chat", cascade="all, delete-orphan")
+    archive = relationship("ChatArchive", uselist=False, cascade="all, delete-orphan")
 
 class Message(Base):
     __tablename__ = "messages"
 
     id = Column(Integer, primary_key=True, index=True)
-    chat_id = Column(Integer, ForeignKey("chats.id"))
+    chat_id = Column(Integer, ForeignKey("chats.id"), index=True)
     role = Column(String)  # user, assistant
     content = Column(Text)
     
     # For code blocks - store as JSON array of code blocks
-    code_blocks = Column(JSON, nullable=True)
+    code_blocks = Column(CompressedJSON, nullable=True)
     
     # For images generation
     images = Column(JSON, nullable=True)  # List of image URLs/base64
@@ -37,11 +39,23 @@ class Message(Base):
     audio_url = Column(String, nullable=True)
     
     # Reasoning details (for models that support it)
-    reasoning_details = Column(JSON, nullable=True)
+    reasoning_details = Column(CompressedJSON, nullable=True)
     
     # Created at timestamp
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     tokens = Column(Integer, default=0)
     
     # Relationships
-    chat = relationship("Chat", back_populates="messages")
\ No newline at end of file
+    chat = relationship("Chat", back_populates="messages")
+
+class ChatArchive(Base):
+    """Messages of an inactive chat, moved out of `messages` into one compressed blob"""
+    __tablename__ = "chat_archives"
+
+    chat_id = Column(Integer, ForeignKey("chats.id"), primary_key=True)
+    message_count = Column(Integer, nullable=False)
+    last_message_at = Column(DateTime(timezone=True))
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    # zlib-compressed JSON list of the message rows; deferred so deleting a chat doesn't load it
+    payload = deferred(Column(LargeBinary, nullable=False))
\ No newline at end of file
@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.database import Base
+from app.utils.compressed_json import CompressedJSON
 
 class Generation(Base):
     __tablename__ = "generations"
@@ -12,8 +13,8 @@ class Generation(Base):
     model_name = Column(String)
     generation_type = Column(String)  # text, code, image, audio
     prompt = Column(Text)
-    result = Column(JSON)  # Store generation result
-    generation_metadata = Column(JSON, nullable=True)  # Renamed from 'metadata'
+    result = Column(CompressedJSON)  # Store generation result
+    generation_metadata = Column(CompressedJSON, nullable=True)  # Renamed from 'metadata'
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationships
@@ -1,3 +1,4 @@
 from app.models.user import User
-from app.models.chat import Chat, Message
-from app.models.generation import Generation
\ No newline at end of file
+from app.models.chat import Chat, ChatArchive, Message
+from app.models.generation import Generation
+from app.models.usage import UsageRollup, GlobalUsageRollup
\ No newline at end of file
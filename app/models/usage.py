@@ -0,0 +1,45 @@
+from sqlalchemy import Column, Integer, String, Date, ForeignKey, UniqueConstraint, Index
+from app.database import Base
+
+class UsageRollup(Base):
+    """Per-user usage counters for one (model, generation type, day) bucket"""
+    __tablename__ = "usage_rollups"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    model_id = Column(String, nullable=False)
+    generation_type = Column(String, nullable=False)  # text, code, image, audio
+    day = Column(Date, nullable=False)
+    
+    requests = Column(Integer, default=0, nullable=False)
+    prompt_tokens = Column(Integer, default=0, nullable=False)
+    completion_tokens = Column(Integer, default=0, nullable=False)
+    total_tokens = Column(Integer, default=0, nullable=False)
+    cached_tokens = Column(Integer, default=0, nullable=False)
+    
+    __table_args__ = (
+        UniqueConstraint("user_id", "model_id", "generation_type", "day", name="uq_usage_rollups_bucket"),
+        Index("ix_usage_rollups_user_day", "user_id", "day"),
+    )
+
+class GlobalUsageRollup(Base):
+    """Service-wide usage counters for one (model, generation type, day) bucket"""
+    __tablename__ = "usage_rollups_global"
+
+    id = Column(Integer, primary_key=True, index=True)
+    model_id = Column(String, nullable=False)
+    generation_type = Column(String, nullable=False)
+    day = Column(Date, nullable=False)
+    
+    requests = Column(Integer, default=0, nullable=False)
+    prompt_tokens = Column(Integer, default=0, nullable=False)
+    completion_tokens = Column(Integer, default=0, nullable=False)
+    total_tokens = Column(Integer, default=0, nullable=False)
+    cached_tokens = Column(Integer, default=0, nullable=False)
+    
+    __table_args__ = (
+        UniqueConstraint("model_id", "generation_type", "day", name="uq_usage_rollups_global_bucket"),
+        Index("ix_usage_rollups_global_day", "day"),
+    )
+
+USAGE_COUNTERS = ("requests", "prompt_tokens", "completion_tokens", "total_tokens", "cached_tokens")
\ No newline at end of file
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Literal
 from datetime import datetime
 
 class MessageBase(BaseModel):
@@ -39,12 +39,35 @@ class Chat(ChatBase):
     id: int
     user_id: int
     created_at: datetime
-    updated_at: datetime
+    updated_at: Optional[datetime] = None  # Not set until the chat is first updated
     messages: List[Message] = []
     
     class Config:
         from_attributes = True
 
+class MessageSearchHit(BaseModel):
+    message_id: int
+    chat_id: int
+    chat_title: Optional[str] = None
+    role: str
+    snippet: str
+    created_at: Optional[datetime] = None
+    rank: float
+
+class MessageSearchResults(BaseModel):
+    query: str
+    limit: int
+    offset: int
+    has_more: bool
+    results: List[MessageSearchHit]
+
+class ChatSocketFrame(BaseModel):
+    """Client frame on /api/chats/ws"""
+    type: Literal["auth", "send", "cancel", "ping"]
+    token: Optional[str] = None  # auth
+    chat_id: Optional[int] = None  # send, cancel
+    content: Optional[str] = None  # send
+
 class ChatCompletionRequest(BaseModel):
     model: str
     messages: List[Dict[str, Any]]
@@ -0,0 +1,34 @@
+from pydantic import BaseModel
+from typing import Optional, List, Dict, Any, Union
+from datetime import datetime
+from app.schemas.chat import ChatBase
+from app.schemas.generation import GenerationBase
+
+# One line of an NDJSON export; "type" selects the record kind
+
+class ChatRecord(ChatBase):
+    id: Union[int, str]  # Export-local id, referenced by message records
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+class MessageRecord(BaseModel):
+    chat_id: Union[int, str]
+    role: str
+    content: str
+    code_blocks: Optional[List[Dict[str, Any]]] = None
+    images: Optional[List[Any]] = None
+    audio_url: Optional[str] = None
+    reasoning_details: Optional[Any] = None
+    created_at: Optional[datetime] = None
+    tokens: int = 0
+
+class GenerationRecord(GenerationBase):
+    result: Dict[str, Any]
+    generation_metadata: Optional[Dict[str, Any]] = None
+    created_at: Optional[datetime] = None
+
+class ImportResult(BaseModel):
+    chats: int
+    messages: int
+    generations: int
+    skipped: int
\ No newline at end of file
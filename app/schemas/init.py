@@ -1,3 +1,5 @@
 from app.schemas.user import *
 from app.schemas.chat import *
-from app.schemas.generation import *
\ No newline at end of file
+from app.schemas.generation import *
+from app.schemas.usage import *
+from app.schemas.data import *
\ No newline at end of file
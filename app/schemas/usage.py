@@ -0,0 +1,25 @@
+from pydantic import BaseModel
+from typing import Optional, List
+from datetime import date
+
+class UsageCounters(BaseModel):
+    requests: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_tokens: int = 0
+    cached_tokens: int = 0
+
+class UsageBucket(UsageCounters):
+    day: date
+    model_id: str
+    generation_type: str
+    
+    class Config:
+        from_attributes = True
+
+class UsageSeries(BaseModel):
+    user_id: Optional[int] = None
+    start: date
+    end: date
+    buckets: List[UsageBucket]
+    totals: UsageCounters
\ No newline at end of file
@@ -0,0 +1,72 @@
+import asyncio
+import math
+from typing import Optional
+from app.config import settings
+
+class AdmissionController:
+    """
+    Tracks in-flight expensive requests and event loop lag and decides
+    whether new expensive work should be admitted
+    """
+    def __init__(
+        self,
+        max_inflight: int = settings.ADMISSION_MAX_INFLIGHT,
+        max_loop_lag: float = settings.ADMISSION_MAX_LOOP_LAG_MS / 1000,
+        retry_after: int = settings.ADMISSION_RETRY_AFTER_SECONDS,
+        lag_interval: float = 0.5
+    ):
+        self.max_inflight = max_inflight
+        self.max_loop_lag = max_loop_lag
+        self.retry_after = retry_after
+        self.lag_interval = lag_interval
+        self.inflight = 0
+        self.loop_lag = 0.0
+        self.rejected = 0
+        self._monitor: Optional[asyncio.Task] = None
+
+    def try_acquire(self) -> Optional[str]:
+        """
+        Reserve a slot for expensive work. Returns the rejection reason
+        when the request should be shed, None when it was admitted
+        """
+        if self.inflight >= self.max_inflight:
+            self.rejected += 1
+            return "too many requests in flight"
+
+        if self.max_loop_lag and self.loop_lag > self.max_loop_lag:
+            self.rejected += 1
+            return "server is overloaded"
+
+        self.inflight += 1
+        return None
+
+    def release(self):
+        self.inflight = max(self.inflight - 1, 0)
+
+    def retry_after_seconds(self) -> int:
+        # Back clients off at least as long as the loop is currently stalled
+        return max(self.retry_after, math.ceil(self.loop_lag))
+
+    async def _monitor_loop_lag(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.lag_interval)
+            lag = max(loop.time() - started - self.lag_interval, 0.0)
+            # Smooth single spikes, but react quickly to sustained stalls
+            self.loop_lag = max(lag, self.loop_lag * 0.5)
+
+    def start(self):
+        if self._monitor is None:
+            self._monitor = asyncio.create_task(self._monitor_loop_lag())
+
+    async def stop(self):
+        if self._monitor is not None:
+            self._monitor.cancel()
+            try:
+                await self._monitor
+            except asyncio.CancelledError:
+                pass
+            self._monitor = None
+
+admission_controller = AdmissionController()
\ No newline at end of file
@@ -0,0 +1,205 @@
+import logging
+import zlib
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+import orjson
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models.chat import Chat, ChatArchive, Message
+from app.services.metrics import metrics
+from app.services.search import index_archived_messages
+
+logger = logging.getLogger(__name__)
+
+messages_table = Message.__table__
+archives_table = ChatArchive.__table__
+
+DATETIME_FIELDS = ("created_at",)
+
+def decode_messages(payload: bytes) -> List[Dict[str, Any]]:
+    rows = orjson.loads(zlib.decompress(payload))
+    for row in rows:
+        for field in DATETIME_FIELDS:
+            if row.get(field):
+                row[field] = datetime.fromisoformat(row[field])
+    return rows
+
+def archived_messages(db: Session, chat_ids: List[int]) -> Dict[int, List[Dict[str, Any]]]:
+    """Messages of the given chats that are archived, decoded without restoring them"""
+    messages: Dict[int, List[Dict[str, Any]]] = {}
+    for start in range(0, len(chat_ids), 500):
+        rows = db.execute(
+            select(archives_table.c.chat_id, archives_table.c.payload)
+            .where(archives_table.c.chat_id.in_(chat_ids[start:start + 500]))
+        )
+        for chat_id, payload in rows:
+            messages[chat_id] = decode_messages(payload)
+    return messages
+
+def archive_inactive_chats(
+    db: Session,
+    days: int = settings.ARCHIVE_AFTER_DAYS,
+    batch_size: int = settings.ARCHIVE_BATCH_SIZE,
+    now: Optional[datetime] = None
+) -> Dict[str, int]:
+    """
+    Move the messages of chats with no activity for `days` into
+    chat_archives, one compressed row per chat. Each batch is one
+    transaction; a chat that gets a new message while its batch runs is
+    left in place.
+    """
+    cutoff = (now or datetime.utcnow()) - timedelta(days=days)
+    chat_ids = db.scalars(
+        select(Chat.id)
+        .join(Message, Message.chat_id == Chat.id)
+        .outerjoin(ChatArchive, ChatArchive.chat_id == Chat.id)
+        .where(ChatArchive.chat_id.is_(None))
+        .group_by(Chat.id)
+        .having(
+            func.max(Message.created_at) < cutoff,
+            func.max(func.coalesce(Chat.updated_at, Chat.created_at)) < cutoff
+        )
+    ).all()
+    db.rollback()
+
+    totals = {"chats": 0, "messages": 0, "raw_bytes": 0, "compressed_bytes": 0}
+    for start in range(0, len(chat_ids), batch_size):
+        batch = chat_ids[start:start + batch_size]
+        while batch:
+            result = _archive_batch(db, batch)
+            if isinstance(result, dict):
+                for key, value in result.items():
+                    totals[key] += value
+                break
+            # Chats that became active mid-batch stay hot; retry without them
+            batch = [chat_id for chat_id in batch if chat_id not in result]
+
+    archived_chats_total.inc(totals["chats"])
+    return totals
+
+def _archive_batch(db: Session, chat_ids: List[int]):
+    """
+    Archive one batch and commit. Returns the batch totals, or the set of
+    chats that received messages meanwhile (after rolling back).
+    """
+    rows = db.execute(
+        select(messages_table).where(messages_table.c.chat_id.in_(chat_ids)).order_by(messages_table.c.id)
+    ).mappings().all()
+    by_chat: Dict[int, List[Dict[str, Any]]] = {}
+    for row in rows:
+        by_chat.setdefault(row["chat_id"], []).append(dict(row))
+
+    totals = {"chats": 0, "messages": 0, "raw_bytes": 0, "compressed_bytes": 0}
+    archives = []
+    for chat_id, messages in by_chat.items():
+        raw = orjson.dumps(messages)
+        payload = zlib.compress(raw, settings.ARCHIVE_COMPRESSION_LEVEL)
+        archives.append({
+            "chat_id": chat_id,
+            "message_count": len(messages),
+            "last_message_at": max(message["created_at"] for message in messages),
+            "payload": payload
+        })
+        totals["chats"] += 1
+        totals["messages"] += len(messages)
+        totals["raw_bytes"] += len(raw)
+        totals["compressed_bytes"] += len(payload)
+    if not archives:
+        db.rollback()
+        return totals
+
+    db.execute(insert(archives_table), archives)
+    archived_ids = [message["id"] for messages in by_chat.values() for message in messages]
+    for start in range(0, len(archived_ids), 500):
+        db.execute(delete(messages_table).where(messages_table.c.id.in_(archived_ids[start:start + 500])))
+    # The delete trigger took them out of the search index; archived chats stay searchable
+    index_archived_messages(db, [message for messages in by_chat.values() for message in messages])
+
+    # On SQLite the writes above hold the database lock, so nothing can slip in after this check
+    still_active = set(db.scalars(
+        select(messages_table.c.chat_id).where(messages_table.c.chat_id.in_(list(by_chat))).distinct()
+    ))
+    if still_active:
+        db.rollback()
+        return still_active
+    db.commit()
+    return totals
+
+def rehydrate_chat(db: Session, chat_id: int) -> int:
+    """
+    Move an archived chat's messages back into `messages` (with their
+    original ids) and drop the archive row; the search index rows kept for
+    the archive are replaced by the ones the message inserts create. Returns the number of messages
+    restored; 0 when the chat isn't archived, which costs one primary key
+    lookup.
+    """
+    if db.scalar(select(archives_table.c.chat_id).where(archives_table.c.chat_id == chat_id)) is None:
+        return 0
+    # Deleting first claims the archive, so concurrent readers can't restore it twice
+    payload = db.scalar(
+        delete(archives_table).where(archives_table.c.chat_id == chat_id).returning(archives_table.c.payload)
+    )
+    if payload is None:
+        db.rollback()
+        return 0
+
+    rows = decode_messages(payload)
+    taken = set(db.scalars(
+        select(messages_table.c.id).where(messages_table.c.id.in_([row["id"] for row in rows]))
+    ))
+    with_ids = [row for row in rows if row["id"] not in taken]
+    renumbered = [{key: value for key, value in row.items() if key != "id"} for row in rows if row["id"] in taken]
+    if with_ids:
+        db.execute(insert(messages_table), with_ids)
+    if renumbered:
+        db.execute(insert(messages_table), renumbered)
+    db.commit()
+    rehydrated_chats_total.inc()
+    return len(rows)
+
+def sqlite_file_bytes(connection) -> Dict[str, int]:
+    page_size = connection.exec_driver_sql("PRAGMA page_size").scalar()
+    return {
+        "bytes": connection.exec_driver_sql("PRAGMA page_count").scalar() * page_size,
+        "free_bytes": connection.exec_driver_sql("PRAGMA freelist_count").scalar() * page_size
+    }
+
+def reclaim_space(engine: Engine, full: bool = False) -> Dict[str, Any]:
+    """
+    Return free pages to the filesystem. Databases in incremental
+    auto_vacuum mode (the default for new ones) run PRAGMA incremental_vacuum;
+    `full` runs a one-off VACUUM, which also switches an existing database to
+    incremental mode. Other engines are left alone.
+    """
+    if engine.dialect.name != "sqlite":
+        return {"mode": "unsupported", "reclaimed_bytes": 0}
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        before = sqlite_file_bytes(connection)
+        incremental = connection.exec_driver_sql("PRAGMA auto_vacuum").scalar() == 2
+        if full:
+            connection.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+            connection.exec_driver_sql("VACUUM")
+            mode = "full"
+        elif incremental:
+            # The pragma frees one page per step; executescript steps it to completion
+            connection.connection.driver_connection.executescript("PRAGMA incremental_vacuum;")
+            mode = "incremental"
+        else:
+            mode = "none"
+        after = sqlite_file_bytes(connection)
+
+    if mode == "none" and before["free_bytes"]:
+        logger.info("%d free bytes left in the database file; run with --full-vacuum to reclaim them", before["free_bytes"])
+    return {
+        "mode": mode,
+        "bytes_before": before["bytes"],
+        "bytes_after": after["bytes"],
+        "reclaimed_bytes": before["bytes"] - after["bytes"],
+        "free_bytes": after["free_bytes"]
+    }
+
+archived_chats_total = metrics.counter("chat_archive_archived_total", "Chats moved to cold storage")
+rehydrated_chats_total = metrics.counter("chat_archive_rehydrated_total", "Archived chats restored on access")
\ No newline at end of file
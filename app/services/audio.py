@@ -0,0 +1,379 @@
+import asyncio
+import base64
+import io
+import re
+import struct
+from collections import deque
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+from starlette.requests import Request
+from app.config import settings
+from app.services.metrics import metrics
+from app.services.openrouter import ClientDisconnected, openrouter_service, wait_for_disconnect
+
+# Bytes needed to recognise every supported container
+HEADER_BYTES = 12
+
+# Formats that can be cut without decoding; the rest are sent whole
+SPLITTABLE_FORMATS = ("wav", "mp3")
+
+# kbit/s by (MPEG version 1 or 2, layer) and bitrate index
+MP3_BITRATES = {
+    (1, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (1, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (1, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (2, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (2, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+# Hz by version bits (3 = MPEG 1, 2 = MPEG 2, 0 = MPEG 2.5) and rate index
+MP3_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+# Stitching: longest run of repeated words looked for at a cut, and how
+# many (half-heard) words at the start of a part may precede it
+STITCH_MAX_WORDS = 20
+STITCH_MAX_SKIP = 2
+WORD_RE = re.compile(r"\S+")
+PUNCTUATION = ".,;:!?\"'()[]-–—…“”‘’"
+
+class AudioFormatError(ValueError):
+    """The upload isn't audio this pipeline can read"""
+
+class AudioSegment:
+    __slots__ = ("data", "start", "duration")
+
+    def __init__(self, data: bytes, start: float = 0.0, duration: Optional[float] = None):
+        self.data = data
+        self.start = start
+        self.duration = duration
+
+def mp3_frame_info(header: bytes) -> Optional[Tuple[int, int, int]]:
+    """Frame length in bytes, samples and sample rate of an MPEG audio frame header"""
+    if len(header) < 4 or header[0] != 0xFF or header[1] & 0xE0 != 0xE0:
+        return None
+    version_bits = (header[1] >> 3) & 3
+    layer = 4 - ((header[1] >> 1) & 3)
+    bitrate_index = header[2] >> 4
+    rate_index = (header[2] >> 2) & 3
+    # Reserved values, and free-format streams whose frame length isn't in the header
+    if version_bits == 1 or layer == 4 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    mpeg1 = version_bits == 3
+    bitrate = MP3_BITRATES[(1, layer) if mpeg1 else (2, min(layer, 2))][bitrate_index] * 1000
+    sample_rate = MP3_SAMPLE_RATES[version_bits][rate_index]
+    padding = (header[2] >> 1) & 1
+    if layer == 1:
+        return (12 * bitrate // sample_rate + padding) * 4, 384, sample_rate
+    samples = 1152 if mpeg1 or layer == 2 else 576
+    return samples // 8 * bitrate // sample_rate + padding, samples, sample_rate
+
+def detect_format(header: bytes) -> Optional[str]:
+    """input_audio format name from the first HEADER_BYTES of a file"""
+    if header[:4] == b"RIFF" and header[8:12] == b"WAVE":
+        return "wav"
+    if header[:3] == b"ID3" or mp3_frame_info(header[:4]) is not None:
+        return "mp3"
+    if header[:4] == b"fLaC":
+        return "flac"
+    if header[:4] == b"OggS":
+        return "ogg"
+    if header[:4] == b"FORM" and header[8:12] in (b"AIFF", b"AIFC"):
+        return "aiff"
+    if header[4:8] == b"ftyp":
+        return "m4a"
+    if header[:2] in (b"\xff\xf1", b"\xff\xf9"):
+        return "aac"
+    return None
+
+def _wav_file(fmt_chunk: bytes, pcm: bytes) -> bytes:
+    fmt_part = b"fmt " + struct.pack("<I", len(fmt_chunk)) + fmt_chunk + b"\0" * (len(fmt_chunk) & 1)
+    pad = b"\0" * (len(pcm) & 1)
+    return (
+        b"RIFF" + struct.pack("<I", 4 + len(fmt_part) + 8 + len(pcm) + len(pad)) + b"WAVE"
+        + fmt_part + b"data" + struct.pack("<I", len(pcm)) + pcm + pad
+    )
+
+def wav_segments(stream: BinaryIO, segment_seconds: float, overlap_seconds: float) -> Iterator[AudioSegment]:
+    """
+    Cut a WAV file into standalone WAV files of segment_seconds that
+    overlap by overlap_seconds, reading the samples as it goes
+    """
+    if stream.read(HEADER_BYTES)[8:12] != b"WAVE":
+        raise AudioFormatError("Not a WAV file")
+    fmt_chunk = None
+    while True:
+        chunk = stream.read(8)
+        if len(chunk) < 8:
+            raise AudioFormatError("WAV file has no data chunk")
+        chunk_id, size = chunk[:4], struct.unpack("<I", chunk[4:])[0]
+        if chunk_id == b"data":
+            break
+        body = stream.read(size + (size & 1))
+        if chunk_id == b"fmt ":
+            fmt_chunk = body[:size]
+    if fmt_chunk is None or len(fmt_chunk) < 16:
+        raise AudioFormatError("WAV file has no fmt chunk")
+    byte_rate, block_align = struct.unpack_from("<IH", fmt_chunk, 8)
+    if not byte_rate or not block_align:
+        raise AudioFormatError("WAV file has an invalid fmt chunk")
+
+    # Streamed recordings leave the data size at 0 or 0xFFFFFFFF: read to the end
+    remaining = size if 0 < size < 0xFFFFFFFF else None
+    segment_bytes = max(block_align, int(segment_seconds * byte_rate) // block_align * block_align)
+    overlap_bytes = min(int(overlap_seconds * byte_rate) // block_align * block_align, segment_bytes // 2)
+    carry = b""
+    offset = 0
+    while True:
+        wanted = segment_bytes - len(carry)
+        if remaining is not None:
+            wanted = min(wanted, remaining)
+        fresh = stream.read(wanted) if wanted else b""
+        if not fresh:
+            return
+        if remaining is not None:
+            remaining -= len(fresh)
+        # Whole sample frames only, in case the file is truncated
+        pcm = carry + fresh
+        pcm = pcm[:len(pcm) - len(pcm) % block_align]
+        yield AudioSegment(_wav_file(fmt_chunk, pcm), offset / byte_rate, len(pcm) / byte_rate)
+        if len(fresh) < segment_bytes - len(carry):
+            return
+        carry = pcm[-overlap_bytes:] if overlap_bytes else b""
+        offset += len(pcm) - len(carry)
+
+def mp3_frames(stream: BinaryIO) -> Iterator[Tuple[bytes, float]]:
+    """MPEG audio frames and their durations, skipping tags and junk"""
+    buffer = stream.read(10)
+    if buffer[:3] == b"ID3" and len(buffer) == 10:
+        # Syncsafe tag size, plus a footer when flagged
+        size = sum((byte & 0x7F) << (7 * (3 - i)) for i, byte in enumerate(buffer[6:10]))
+        stream.seek(size + (10 if buffer[5] & 0x10 else 0), io.SEEK_CUR)
+        buffer = b""
+    while True:
+        if len(buffer) < 4:
+            buffer += stream.read(4 - len(buffer))
+            if len(buffer) < 4:
+                return
+        info = mp3_frame_info(buffer)
+        if info is None:
+            # Resync after junk or a trailing ID3v1 tag
+            buffer = buffer[1:]
+            continue
+        length, samples, sample_rate = info
+        frame = buffer + stream.read(length - len(buffer))
+        if len(frame) < length:
+            return
+        buffer = frame[length:]
+        yield frame[:length], samples / sample_rate
+
+def mp3_segments(stream: BinaryIO, segment_seconds: float, overlap_seconds: float) -> Iterator[AudioSegment]:
+    """
+    Cut an MP3 stream at frame boundaries into parts of segment_seconds
+    that overlap by overlap_seconds. A part may start with a frame that
+    refers back to the previous one (bit reservoir); the overlap covers
+    that glitch.
+    """
+    window = deque()
+    duration = 0.0
+    start = 0.0
+    fresh = False
+    for frame in mp3_frames(stream):
+        window.append(frame)
+        duration += frame[1]
+        fresh = True
+        if duration >= segment_seconds:
+            yield AudioSegment(b"".join(data for data, _ in window), start, duration)
+            fresh = False
+            # Keep the last overlap_seconds of frames for the next part
+            while window and duration - window[0][1] >= overlap_seconds:
+                start += window[0][1]
+                duration -= window.popleft()[1]
+    if fresh:
+        yield AudioSegment(b"".join(data for data, _ in window), start, duration)
+    elif not start and not window:
+        raise AudioFormatError("No MP3 frames found")
+
+def split_audio(
+    stream: BinaryIO,
+    audio_format: str,
+    segment_seconds: float = settings.AUDIO_SEGMENT_SECONDS,
+    overlap_seconds: float = settings.AUDIO_SEGMENT_OVERLAP_SECONDS
+) -> Iterator[AudioSegment]:
+    """
+    Parts of an audio file to send one by one. WAV and MP3 are cut into
+    overlapping segments while reading, so only the parts in flight are
+    in memory; other formats (or segment_seconds 0) come back whole.
+    """
+    if segment_seconds <= 0 or audio_format not in SPLITTABLE_FORMATS:
+        yield AudioSegment(stream.read())
+        return
+    overlap_seconds = min(overlap_seconds, segment_seconds / 2)
+    if audio_format == "wav":
+        yield from wav_segments(stream, segment_seconds, overlap_seconds)
+    else:
+        yield from mp3_segments(stream, segment_seconds, overlap_seconds)
+
+def _normalize(word: str) -> str:
+    return word.strip(PUNCTUATION).lower()
+
+def _repeated_words(previous: List[str], words: List[str]) -> int:
+    """
+    How many leading words of a part repeat the end of the text before it:
+    the longest run (two words or more) that ends `previous` and starts
+    `words`, possibly after a few half-heard words at the cut
+    """
+    tail = [_normalize(word) for word in previous[-STITCH_MAX_WORDS:]]
+    head = [_normalize(word) for word in words[:STITCH_MAX_WORDS + STITCH_MAX_SKIP]]
+    for size in range(min(len(tail), len(head)), 1, -1):
+        for skip in range(min(STITCH_MAX_SKIP, len(head) - size) + 1):
+            if head[skip:skip + size] == tail[-size:]:
+                return skip + size
+    return 0
+
+def stitch_texts(texts: Iterable[str]) -> str:
+    """
+    Join the replies for consecutive parts, dropping the words each part
+    repeats from the overlap with the one before
+    """
+    parts = []
+    previous: List[str] = []
+    for text in texts:
+        text = (text or "").strip()
+        if not text:
+            continue
+        matches = list(WORD_RE.finditer(text))
+        words = [match.group() for match in matches]
+        if previous:
+            repeated = _repeated_words(previous, words)
+            if repeated >= len(words):
+                continue
+            if repeated:
+                text = text[matches[repeated].start():]
+                words = words[repeated:]
+        parts.append(text)
+        previous = (previous + words)[-STITCH_MAX_WORDS:]
+    return " ".join(parts)
+
+def merge_usage(usages: Iterable[Optional[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+    """Sum OpenRouter usage objects, including nested token details"""
+    merged: Dict[str, Any] = {}
+    for usage in usages:
+        for name, value in (usage or {}).items():
+            if isinstance(value, dict):
+                nested = merged.setdefault(name, {})
+                for key, count in value.items():
+                    if isinstance(count, (int, float)) and not isinstance(count, bool):
+                        nested[key] = nested.get(key, 0) + count
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                merged[name] = merged.get(name, 0) + value
+    return merged or None
+
+def reply_text(response: Dict[str, Any]) -> Optional[str]:
+    return response["choices"][0]["message"]["content"] if response.get("choices") else None
+
+def _next_encoded(segments: Iterator[AudioSegment]) -> Optional[Tuple[AudioSegment, str]]:
+    # Reading the next part and base64 encoding it both run off the event loop
+    segment = next(segments, None)
+    if segment is None:
+        return None
+    return segment, base64.b64encode(segment.data).decode()
+
+async def process_audio(
+    model: str,
+    prompt: str,
+    stream: BinaryIO,
+    request: Optional[Request] = None,
+    concurrency: int = settings.AUDIO_SEGMENT_CONCURRENCY
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Send an audio file with the prompt, as one request or (for long WAV
+    and MP3 input) one per overlapping part, at most `concurrency` at a
+    time. Every part gets the same prompt, which suits transcription-style
+    prompts; the replies are stitched back together in order.
+
+    Returns the reply (a combined one for several parts) and metadata
+    about the input. Raises AudioFormatError for unrecognised input and
+    ClientDisconnected if the client goes away.
+    """
+    header = stream.read(HEADER_BYTES)
+    stream.seek(0)
+    audio_format = detect_format(header)
+    if audio_format is None:
+        raise AudioFormatError("Unsupported audio format (expected wav, mp3, flac, ogg, aiff, m4a or aac)")
+    audio_inputs_total.inc(format=audio_format)
+
+    # One disconnect watcher for all parts, which share the cancel event
+    cancel = asyncio.Event()
+    watcher = None
+    if request is not None:
+        async def watch():
+            await wait_for_disconnect(request.receive)
+            cancel.set()
+        watcher = asyncio.create_task(watch())
+
+    limit = asyncio.Semaphore(max(concurrency, 1))
+
+    async def send(segment: AudioSegment, data: str) -> Dict[str, Any]:
+        try:
+            return await openrouter_service.generate_audio(
+                model=model,
+                prompt=prompt,
+                audio_input=data,
+                audio_format=audio_format,
+                cancel=cancel
+            )
+        finally:
+            limit.release()
+
+    segments = split_audio(stream, audio_format)
+    parts: List[Tuple[AudioSegment, asyncio.Task]] = []
+    try:
+        async with asyncio.TaskGroup() as group:
+            while True:
+                # Reading waits for a free slot, so at most `concurrency` parts are in memory
+                await limit.acquire()
+                encoded = await asyncio.to_thread(_next_encoded, segments)
+                if encoded is None:
+                    limit.release()
+                    break
+                segment, data = encoded
+                parts.append((segment, group.create_task(send(segment, data))))
+                audio_segments_total.inc()
+    except BaseExceptionGroup as errors:
+        # Surface one error the way a single request would raise it
+        disconnected = [error for error in errors.exceptions if isinstance(error, ClientDisconnected)]
+        raise (disconnected or errors.exceptions)[0] from None
+    finally:
+        if watcher is not None:
+            watcher.cancel()
+
+    if not parts:
+        raise AudioFormatError("Audio file contains no audio data")
+
+    responses = [task.result() for _, task in parts]
+    durations = [segment.duration for segment, _ in parts]
+    details = {
+        "audio_format": audio_format,
+        "segments": len(parts),
+        "duration_seconds": round(parts[-1][0].start + durations[-1], 1) if None not in durations else None
+    }
+    if len(responses) == 1:
+        return responses[0], details
+
+    texts = [reply_text(response) or "" for response in responses]
+    combined = {
+        "id": responses[0].get("id"),
+        "model": responses[0].get("model"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": stitch_texts(texts)},
+            "finish_reason": responses[-1]["choices"][0].get("finish_reason") if responses[-1].get("choices") else None
+        }],
+        "usage": merge_usage(response.get("usage") for response in responses),
+        "segments": [
+            {"start": round(segment.start, 2), "duration": round(segment.duration, 2), "content": text}
+            for (segment, _), text in zip(parts, texts)
+        ]
+    }
+    return combined, details
+
+audio_inputs_total = metrics.counter("audio_inputs_total", "Audio inputs processed, by detected format", ("format",))
+audio_segments_total = metrics.counter("audio_segments_total", "Audio parts sent upstream")
\ No newline at end of file
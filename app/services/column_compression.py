@@ -0,0 +1,61 @@
+from typing import Dict, List
+from sqlalchemy import LargeBinary, Table, bindparam, select, type_coerce, update
+from sqlalchemy.orm import Session
+from app.models.chat import Message
+from app.models.generation import Generation
+from app.utils.compressed_json import CompressedJSON, decode_json, encode_json, is_legacy
+
+def compressed_columns(table: Table) -> List[str]:
+    return [column.name for column in table.columns if isinstance(column.type, CompressedJSON)]
+
+def compress_table(db: Session, table: Table, batch_size: int = 500) -> Dict[str, int]:
+    """
+    Rewrite rows still holding plain JSON text in the compressed format.
+    Walks the table by primary key and commits every batch, so it can run
+    while the app is serving; reads understand both formats meanwhile.
+    """
+    names = compressed_columns(table)
+    # Raw stored values, without CompressedJSON decoding them
+    raw_columns = [type_coerce(table.c[name], LargeBinary()).label(name) for name in names]
+    statement = (
+        update(table)
+        .where(table.c.id == bindparam("row_id"))
+        .values({name: bindparam(name, type_=LargeBinary()) for name in names})
+    )
+    totals = {"rows": 0, "bytes_before": 0, "bytes_after": 0}
+    last_id = 0
+    while True:
+        rows = db.execute(
+            select(table.c.id, *raw_columns).where(table.c.id > last_id).order_by(table.c.id).limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        updates = []
+        for row in rows:
+            stored = row._mapping
+            if not any(is_legacy(stored[name]) for name in names):
+                continue
+            values = {"row_id": row.id}
+            for name in names:
+                value = stored[name]
+                if is_legacy(value):
+                    totals["bytes_before"] += len(value.encode() if isinstance(value, str) else value)
+                    decoded = decode_json(value)
+                    # JSON null becomes SQL NULL, as the column type writes it
+                    value = None if decoded is None else encode_json(decoded)
+                    totals["bytes_after"] += len(value or b"")
+                values[name] = value
+            updates.append(values)
+        if updates:
+            db.execute(statement, updates)
+            totals["rows"] += len(updates)
+        db.commit()
+    return totals
+
+def compress_json_columns(db: Session, batch_size: int = 500) -> Dict[str, Dict[str, int]]:
+    return {
+        table.name: compress_table(db, table, batch_size)
+        for table in (Message.__table__, Generation.__table__)
+    }
\ No newline at end of file
@@ -0,0 +1,267 @@
+import json
+from datetime import date, datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import SessionLocal
+from app.models.chat import Chat, ChatArchive, Message
+from app.models.generation import Generation
+from app.schemas.data import ChatRecord, MessageRecord, GenerationRecord
+from app.services.archive import decode_messages
+
+EXPORT_FORMAT = "crush-ai-export"
+EXPORT_VERSION = 1
+# Encoded lines are sent in chunks of roughly this size
+EXPORT_CHUNK_BYTES = 64 * 1024
+MESSAGE_EXPORT_FIELDS = ("role", "content", "code_blocks", "images", "audio_url", "reasoning_details", "created_at", "tokens")
+
+chats_table = Chat.__table__
+messages_table = Message.__table__
+generations_table = Generation.__table__
+archives_table = ChatArchive.__table__
+
+def _json_default(value: Any):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+def encode_line(record: Dict[str, Any]) -> bytes:
+    return json.dumps(record, default=_json_default, ensure_ascii=False, separators=(",", ":")).encode() + b"\n"
+
+def export_user_data(
+    user_id: int,
+    session_factory=SessionLocal,
+    batch_size: int = settings.EXPORT_BATCH_SIZE
+) -> Iterator[bytes]:
+    """
+    Stream a user's chats, messages and generations as NDJSON.
+
+    Rows come from server-side cursors (yield_per) as plain tuples, so memory
+    stays flat however large the history is. Each chat line is followed by
+    its messages; a final "end" line carries the record counts. Runs in a
+    worker thread under StreamingResponse, with its own session.
+    """
+    db = session_factory()
+    try:
+        counts = {"chats": 0, "messages": 0, "generations": 0}
+        chunk = bytearray(encode_line({
+            "type": "export",
+            "format": EXPORT_FORMAT,
+            "version": EXPORT_VERSION,
+            "exported_at": datetime.utcnow()
+        }))
+
+        rows = db.execute(
+            select(
+                chats_table.c.id, chats_table.c.title, chats_table.c.model_id, chats_table.c.model_name,
+                chats_table.c.model_type, chats_table.c.created_at, chats_table.c.updated_at,
+                messages_table.c.id.label("message_id"), messages_table.c.role, messages_table.c.content,
+                messages_table.c.code_blocks, messages_table.c.images, messages_table.c.audio_url,
+                messages_table.c.reasoning_details, messages_table.c.created_at.label("message_created_at"),
+                messages_table.c.tokens, archives_table.c.payload.label("archive")
+            )
+            .select_from(
+                chats_table
+                .outerjoin(messages_table, messages_table.c.chat_id == chats_table.c.id)
+                .outerjoin(archives_table, archives_table.c.chat_id == chats_table.c.id)
+            )
+            .where(chats_table.c.user_id == user_id)
+            .order_by(chats_table.c.id, messages_table.c.id)
+            .execution_options(yield_per=batch_size)
+        )
+        current_chat = None
+        for row in rows:
+            if row.id != current_chat:
+                current_chat = row.id
+                counts["chats"] += 1
+                chunk += encode_line({
+                    "type": "chat",
+                    "id": row.id,
+                    "title": row.title,
+                    "model_id": row.model_id,
+                    "model_name": row.model_name,
+                    "model_type": row.model_type,
+                    "created_at": row.created_at,
+                    "updated_at": row.updated_at
+                })
+            if row.message_id is not None:
+                counts["messages"] += 1
+                chunk += encode_line({
+                    "type": "message",
+                    "chat_id": row.id,
+                    "role": row.role,
+                    "content": row.content,
+                    "code_blocks": row.code_blocks,
+                    "images": row.images,
+                    "audio_url": row.audio_url,
+                    "reasoning_details": row.reasoning_details,
+                    "created_at": row.message_created_at,
+                    "tokens": row.tokens
+                })
+            elif row.archive is not None:
+                # Archived chats are exported from the blob without restoring them
+                for message in decode_messages(row.archive):
+                    counts["messages"] += 1
+                    chunk += encode_line({
+                        "type": "message",
+                        "chat_id": row.id,
+                        **{field: message.get(field) for field in MESSAGE_EXPORT_FIELDS}
+                    })
+            if len(chunk) >= EXPORT_CHUNK_BYTES:
+                yield bytes(chunk)
+                chunk.clear()
+
+        rows = db.execute(
+            select(
+                generations_table.c.model_id, generations_table.c.model_name, generations_table.c.generation_type,
+                generations_table.c.prompt, generations_table.c.result, generations_table.c.generation_metadata,
+                generations_table.c.created_at
+            )
+            .where(generations_table.c.user_id == user_id)
+            .order_by(generations_table.c.id)
+            .execution_options(yield_per=batch_size)
+        )
+        for row in rows:
+            counts["generations"] += 1
+            chunk += encode_line({"type": "generation", **row._asdict()})
+            if len(chunk) >= EXPORT_CHUNK_BYTES:
+                yield bytes(chunk)
+                chunk.clear()
+
+        chunk += encode_line({"type": "end", **counts})
+        yield bytes(chunk)
+    finally:
+        db.close()
+
+class ImportFormatError(ValueError):
+    def __init__(self, line: int, message: str):
+        super().__init__(f"Line {line}: {message}")
+        self.line = line
+
+RECORD_TYPES = {"chat": ChatRecord, "message": MessageRecord, "generation": GenerationRecord}
+
+class NdjsonImporter:
+    """
+    Ingests export records for one user in batches: chats are inserted with
+    RETURNING to map export ids to new ids, then their messages and any
+    generations go in as executemany inserts. Every flush is its own
+    transaction on its own session, opened on the thread that runs it, so
+    a failure part-way keeps the batches already committed.
+    """
+    def __init__(self, user_id: int, batch_size: int = settings.IMPORT_BATCH_SIZE):
+        self.user_id = user_id
+        self.batch_size = batch_size
+        self.line = 0
+        self.counts = {"chats": 0, "messages": 0, "generations": 0, "skipped": 0}
+        # Export chat id -> new chat id, for every chat imported so far
+        self.chat_ids: Dict[Union[int, str], int] = {}
+        self._chats: List[Tuple[Union[int, str], Dict[str, Any]]] = []
+        self._pending_chats: Dict[Union[int, str], None] = {}
+        self._messages: List[Tuple[Union[int, str], Dict[str, Any]]] = []
+        self._generations: List[Dict[str, Any]] = []
+
+    @property
+    def pending(self) -> int:
+        return len(self._chats) + len(self._messages) + len(self._generations)
+
+    def add_line(self, line: bytes):
+        """
+        Parse and buffer one NDJSON line; blank lines and the export/end
+        envelope records are ignored, unknown record types are skipped
+        """
+        self.line += 1
+        if not line.strip():
+            return
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            raise ImportFormatError(self.line, f"invalid JSON ({e})")
+        if not isinstance(record, dict):
+            raise ImportFormatError(self.line, "expected a JSON object")
+
+        record_type = record.get("type")
+        if record_type in ("export", "end"):
+            return
+        schema = RECORD_TYPES.get(record_type)
+        if schema is None:
+            self.counts["skipped"] += 1
+            return
+        try:
+            item: BaseModel = schema.model_validate(record)
+        except ValidationError as e:
+            raise ImportFormatError(self.line, f"invalid {record_type} record ({e.error_count()} errors: {e.errors()[0]['msg']})")
+
+        # Every row of a batch needs the same keys for executemany, so
+        # missing timestamps are filled here rather than by server defaults
+        values = item.model_dump()
+        if values["created_at"] is None:
+            values["created_at"] = datetime.utcnow()
+        if record_type == "chat":
+            export_id = values.pop("id")
+            if export_id in self.chat_ids or export_id in self._pending_chats:
+                raise ImportFormatError(self.line, f"duplicate chat id {export_id!r}")
+            self._pending_chats[export_id] = None
+            self._chats.append((export_id, {**values, "user_id": self.user_id}))
+        elif record_type == "message":
+            export_chat_id = values.pop("chat_id")
+            if export_chat_id not in self.chat_ids and export_chat_id not in self._pending_chats:
+                raise ImportFormatError(self.line, f"message refers to unknown chat id {export_chat_id!r}")
+            self._messages.append((export_chat_id, values))
+        else:
+            self._generations.append({**values, "user_id": self.user_id})
+
+    def _insert_chats(self, db: Session, rows: List[Dict[str, Any]]) -> List[int]:
+        dialect = db.get_bind().dialect
+        if dialect.insert_executemany_returning_sort_by_parameter_order:
+            statement = insert(chats_table).returning(chats_table.c.id, sort_by_parameter_order=True)
+            return list(db.execute(statement, rows).scalars())
+        return [db.execute(insert(chats_table).values(**row)).inserted_primary_key[0] for row in rows]
+
+    def flush(self):
+        """
+        Write everything buffered in one transaction; blocking, meant to run
+        in a worker thread
+        """
+        if not self.pending:
+            return
+        db = SessionLocal()
+        try:
+            if self._chats:
+                new_ids = self._insert_chats(db, [row for _, row in self._chats])
+                for (export_id, _), new_id in zip(self._chats, new_ids):
+                    self.chat_ids[export_id] = new_id
+            if self._messages:
+                db.execute(insert(messages_table), [
+                    {**row, "chat_id": self.chat_ids[export_chat_id]} for export_chat_id, row in self._messages
+                ])
+            if self._generations:
+                db.execute(insert(generations_table), self._generations)
+            db.commit()
+        except Exception:
+            db.rollback()
+            for export_id, _ in self._chats:
+                self.chat_ids.pop(export_id, None)
+            raise
+        finally:
+            db.close()
+
+        self.counts["chats"] += len(self._chats)
+        self.counts["messages"] += len(self._messages)
+        self.counts["generations"] += len(self._generations)
+        self._chats, self._messages, self._generations = [], [], []
+        self._pending_chats.clear()
+
+def split_lines(buffer: bytearray, max_line_bytes: Optional[int] = None) -> List[bytes]:
+    """
+    Pop the complete lines off the front of buffer
+    """
+    end = buffer.rfind(b"\n")
+    if end == -1:
+        if max_line_bytes is not None and len(buffer) > max_line_bytes:
+            raise ValueError(f"Line longer than {max_line_bytes} bytes")
+        return []
+    lines = bytes(buffer[:end]).split(b"\n")
+    del buffer[:end + 1]
+    return lines
\ No newline at end of file
@@ -1,14 +1,42 @@
 import os
 import aiofiles
 import base64
+import uuid
 from datetime import datetime
-from typing import Optional
+from typing import Optional, Tuple
 from app.config import settings
+from app.services.media import media_name, media_path
 
 class FileHandler:
     def __init__(self):
         self.upload_dir = settings.UPLOAD_DIR
-        os.makedirs(self.upload_dir, exist_ok=True)
+        self._dir_ready = False
+    
+    def _path(self, filename: str) -> str:
+        # The directory is created on first write rather than at import
+        if not self._dir_ready:
+            os.makedirs(self.upload_dir, exist_ok=True)
+            self._dir_ready = True
+        return os.path.join(self.upload_dir, filename)
+    
+    async def save_media(self, data: bytes, owner_id: int, extension: str) -> Tuple[str, str]:
+        """
+        Save bytes under a content-addressed name and return (name, path).
+        Identical content is stored once; files never change after writing.
+        """
+        name = media_name(data, extension)
+        filepath = media_path(owner_id, name)
+        if os.path.exists(filepath):
+            return name, filepath
+        
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        # Write to a temp file and rename, so a half-written file is never served
+        temp_path = f"{filepath}.{uuid.uuid4().hex}.tmp"
+        async with aiofiles.open(temp_path, 'wb') as f:
+            await f.write(data)
+        os.replace(temp_path, filepath)
+        
+        return name, filepath
     
     async def save_base64_image(self, base64_data: str, filename: Optional[str] = None) -> str:
         """
@@ -26,7 +54,7 @@ class FileHandler:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             filename = f"image_{timestamp}.png"
         
-        filepath = os.path.join(self.upload_dir, filename)
+        filepath = self._path(filename)
         
         async with aiofiles.open(filepath, 'wb') as f:
             await f.write(image_data)
@@ -46,7 +74,7 @@ class FileHandler:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             filename = f"audio_{timestamp}.wav"
         
-        filepath = os.path.join(self.upload_dir, filename)
+        filepath = self._path(filename)
         
         async with aiofiles.open(filepath, 'wb') as f:
             await f.write(audio_bytes)
@@ -0,0 +1,137 @@
+import asyncio
+import base64
+import hashlib
+import io
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+from PIL import Image, ImageOps
+from app.config import settings
+from app.services.metrics import metrics
+
+# Decompression bomb guard, checked from the header before decoding
+MAX_PIXELS = 50_000_000
+
+# Formats every vision provider accepts as-is
+PASSTHROUGH_FORMATS = {"JPEG": "image/jpeg", "PNG": "image/png"}
+
+class PreparedImage:
+    __slots__ = ("data_url", "width", "height", "size", "original_size")
+
+    def __init__(self, data_url: str, width: int, height: int, size: int, original_size: int):
+        self.data_url = data_url
+        self.width = width
+        self.height = height
+        self.size = size
+        self.original_size = original_size
+
+    def summary(self) -> Dict[str, int]:
+        return {"width": self.width, "height": self.height, "bytes": self.size, "original_bytes": self.original_size}
+
+def prepare_image(data: bytes, max_edge: int, quality: int = settings.VISION_JPEG_QUALITY) -> PreparedImage:
+    """
+    Downscale an uploaded image so its longest side is at most max_edge and
+    re-encode it (JPEG, or PNG when it has transparency), which also drops
+    EXIF metadata. A JPEG/PNG that is already small enough and has no EXIF
+    is sent as uploaded. Raises ValueError for anything Pillow can't read.
+    """
+    try:
+        image = Image.open(io.BytesIO(data))
+        source_format = image.format
+        if image.width * image.height > MAX_PIXELS:
+            raise ValueError(f"Image is too large ({image.width}x{image.height})")
+        if max(image.size) <= max_edge and source_format in PASSTHROUGH_FORMATS and not image.getexif():
+            image.load()
+            width, height = image.size
+            encoded, mime = data, PASSTHROUGH_FORMATS[source_format]
+        else:
+            # JPEG can decode straight at a reduced scale, which is much faster
+            image.draft("RGB", (max_edge, max_edge))
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS, reducing_gap=3.0)
+            buffer = io.BytesIO()
+            if image.mode in ("RGBA", "LA", "PA") or (image.mode == "P" and "transparency" in image.info):
+                image.save(buffer, format="PNG", optimize=True)
+                mime = "image/png"
+            else:
+                image.convert("RGB").save(buffer, format="JPEG", quality=quality, optimize=True)
+                mime = "image/jpeg"
+            width, height = image.size
+            encoded = buffer.getvalue()
+    except (OSError, SyntaxError, Image.DecompressionBombError) as e:
+        raise ValueError("Not a readable image") from e
+
+    return PreparedImage(
+        f"data:{mime};base64,{base64.b64encode(encoded).decode()}",
+        width, height, len(encoded), len(data)
+    )
+
+class ImagePreparer:
+    """
+    Runs prepare_image in a small thread pool (Pillow releases the GIL
+    while decoding, resampling and encoding) and keeps prepared payloads in
+    an LRU keyed by content hash and target size, bounded by total bytes.
+    Concurrent requests for the same image share one preparation.
+    """
+    def __init__(
+        self,
+        workers: int = settings.VISION_PREP_WORKERS,
+        max_cache_bytes: int = settings.VISION_CACHE_MAX_BYTES
+    ):
+        self.workers = workers
+        self.max_cache_bytes = max_cache_bytes
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._cache: "OrderedDict[Tuple[str, int], PreparedImage]" = OrderedDict()
+        self._cache_bytes = 0
+        self._pending: Dict[Tuple[str, int], asyncio.Future] = {}
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="image-prep")
+        return self._executor
+
+    async def prepare(self, data: bytes, max_edge: int) -> PreparedImage:
+        key = (hashlib.sha256(data).hexdigest(), max_edge)
+        prepared = self._cache.get(key)
+        if prepared is not None:
+            self._cache.move_to_end(key)
+            prep_cache_total.inc(result="hit")
+            return prepared
+
+        pending = self._pending.get(key)
+        if pending is not None:
+            prep_cache_total.inc(result="shared")
+            return await asyncio.shield(pending)
+
+        prep_cache_total.inc(result="miss")
+        loop = asyncio.get_running_loop()
+        future = self._pending[key] = loop.run_in_executor(self.executor, prepare_image, data, max_edge)
+        try:
+            prepared = await asyncio.shield(future)
+        finally:
+            self._pending.pop(key, None)
+        self._remember(key, prepared)
+        prep_bytes_saved_total.inc(max(prepared.original_size - prepared.size, 0))
+        return prepared
+
+    def _remember(self, key: Tuple[str, int], prepared: PreparedImage):
+        if len(prepared.data_url) > self.max_cache_bytes:
+            return
+        self._cache[key] = prepared
+        self._cache_bytes += len(prepared.data_url)
+        while self._cache_bytes > self.max_cache_bytes:
+            _, evicted = self._cache.popitem(last=False)
+            self._cache_bytes -= len(evicted.data_url)
+        prep_cache_bytes.set(self._cache_bytes)
+
+    def stop(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+image_preparer = ImagePreparer()
+
+prep_cache_total = metrics.counter("vision_prep_total", "Vision image preparations by cache result", ("result",))
+prep_cache_bytes = metrics.gauge("vision_prep_cache_bytes", "Bytes of prepared vision payloads in the cache")
+prep_bytes_saved_total = metrics.counter("vision_prep_bytes_saved_total", "Upload bytes removed by downscaling and re-encoding")
\ No newline at end of file
@@ -1,3 +1,8 @@
 from app.services.openrouter import openrouter_service
 from app.services.auth import auth_service
-from app.services.file_handler import file_handler
\ No newline at end of file
+from app.services.file_handler import file_handler
+from app.services.admission import admission_controller
+from app.services.metrics import metrics
+from app.services.profiler import profile_store
+from app.services.usage_ledger import usage_ledger
+from app.services.search import search_messages
\ No newline at end of file
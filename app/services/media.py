@@ -0,0 +1,77 @@
+import base64
+import hashlib
+import hmac
+import mimetypes
+import os
+import re
+import time
+from typing import Optional, Tuple
+from urllib.parse import urlencode
+from app.config import settings
+from app.services.auth import auth_service
+
+# Content-addressed media: uploads/<owner id>/<sha256 of the bytes>.<ext>
+MEDIA_NAME_RE = re.compile(r"^[0-9a-f]{64}\.[a-z0-9]{1,5}$")
+MEDIA_ROUTE = "/api/media"
+
+def media_name(data: bytes, extension: str) -> str:
+    return f"{hashlib.sha256(data).hexdigest()}.{extension.lstrip('.').lower()}"
+
+def media_path(owner_id: int, name: str) -> str:
+    return os.path.join(settings.UPLOAD_DIR, str(owner_id), name)
+
+def media_type(name: str) -> str:
+    return mimetypes.guess_type(name)[0] or "application/octet-stream"
+
+def decode_data_url(url: str, default_extension: str = "png") -> Tuple[bytes, str]:
+    """
+    Bytes and file extension of a base64 data URL (or bare base64)
+    """
+    header, comma, payload = url.partition(",")
+    if not comma:
+        return base64.b64decode(url), default_extension
+    mime = header.removeprefix("data:").split(";")[0]
+    extension = (mimetypes.guess_extension(mime) or f".{default_extension}").lstrip(".")
+    return base64.b64decode(payload), extension
+
+def _signature(owner_id: int, name: str, expires: Optional[int]) -> str:
+    message = f"media:{owner_id}/{name}:{expires or ''}".encode()
+    return hmac.new(settings.SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()[:32]
+
+def signed_media_url(owner_id: int, name: str) -> str:
+    """
+    URL that grants access to one file without a token, for <img>/<audio>
+    tags. Expiry is rounded up to a whole TTL window so the URL (and the
+    client's cached copy) stays the same within a window.
+    """
+    params = {}
+    expires = None
+    ttl = settings.MEDIA_URL_TTL_SECONDS
+    if ttl > 0:
+        expires = (int(time.time()) // ttl + 2) * ttl
+        params["exp"] = expires
+    params["sig"] = _signature(owner_id, name, expires)
+    return f"{MEDIA_ROUTE}/{owner_id}/{name}?{urlencode(params)}"
+
+def verify_signature(owner_id: int, name: str, sig: str, expires: Optional[int]) -> bool:
+    if expires is not None and expires < time.time():
+        return False
+    if settings.MEDIA_URL_TTL_SECONDS > 0 and expires is None:
+        return False
+    return hmac.compare_digest(sig, _signature(owner_id, name, expires))
+
+def token_owner(authorization: Optional[str]) -> Optional[int]:
+    """
+    User id from a bearer token's uid claim; decoding the JWT needs no
+    database round trip
+    """
+    if not authorization:
+        return None
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    payload = auth_service.decode_token(token)
+    if not payload:
+        return None
+    uid = payload.get("uid")
+    return uid if isinstance(uid, int) else None
\ No newline at end of file
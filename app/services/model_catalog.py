@@ -0,0 +1,289 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import time
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+import httpx
+from app.config import settings
+from app.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+Model = Mapping[str, Any]
+
+def _freeze(model: Dict[str, Any]) -> Model:
+    return MappingProxyType({
+        key: tuple(value) if isinstance(value, list) else value
+        for key, value in model.items()
+    })
+
+class CatalogSnapshot:
+    """
+    Immutable model registry. Readers take `model_catalog.snapshot` once and
+    use it; a refresh builds a new snapshot and swaps the reference, so
+    lookups never lock and never see a half-updated catalog.
+    """
+    __slots__ = ("models", "by_id", "by_type", "version", "upstream", "etag", "fetched_at", "source")
+
+    def __init__(
+        self,
+        models: Dict[str, Dict[str, Any]],
+        upstream: Optional[List[Dict[str, Any]]] = None,
+        etag: Optional[str] = None,
+        fetched_at: Optional[float] = None,
+        source: str = "builtin"
+    ):
+        frozen = {key: _freeze(model) for key, model in models.items()}
+        by_type: Dict[str, List[Model]] = {}
+        for model in frozen.values():
+            by_type.setdefault(model["type"], []).append(model)
+
+        self.models: Mapping[str, Model] = MappingProxyType(frozen)
+        # Lookups accept the OpenRouter id or the catalog key
+        self.by_id: Mapping[str, Model] = MappingProxyType({
+            **frozen, **{model["id"]: model for model in frozen.values()}
+        })
+        self.by_type: Mapping[str, Tuple[Model, ...]] = MappingProxyType({
+            model_type: tuple(entries) for model_type, entries in by_type.items()
+        })
+        self.version = hashlib.blake2b(
+            json.dumps(models, sort_keys=True).encode(), digest_size=8
+        ).hexdigest()
+        # The upstream listing this snapshot was built from (None for the built-in list)
+        self.upstream = upstream
+        self.etag = etag
+        self.fetched_at = fetched_at
+        self.source = source
+
+    def to_json(self) -> Dict[str, Any]:
+        return {"etag": self.etag, "fetched_at": self.fetched_at, "upstream": self.upstream}
+
+# Fields of an upstream /models entry that the catalog uses
+UPSTREAM_FIELDS = ("id", "name", "description", "pricing", "architecture", "supported_parameters")
+
+def trim_upstream(entry: Dict[str, Any]) -> Dict[str, Any]:
+    return {field: entry[field] for field in UPSTREAM_FIELDS if field in entry}
+
+def is_free(entry: Dict[str, Any]) -> bool:
+    pricing = entry.get("pricing") or {}
+    if entry.get("id", "").endswith(":free"):
+        return True
+    try:
+        return float(pricing.get("prompt", 1)) == 0 and float(pricing.get("completion", 1)) == 0
+    except (TypeError, ValueError):
+        return False
+
+def entry_from_upstream(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Catalog entry for an upstream model we have no curated metadata for
+    """
+    architecture = entry.get("architecture") or {}
+    inputs = architecture.get("input_modalities") or ["text"]
+    outputs = architecture.get("output_modalities") or ["text"]
+    supports_images = "image" in outputs
+    supports_audio = "audio" in inputs or "audio" in outputs
+    supports_vision = "image" in inputs
+    supports_reasoning = "reasoning" in (entry.get("supported_parameters") or [])
+
+    if supports_images:
+        model_type, capabilities = "image", ["image"]
+    elif supports_audio:
+        model_type, capabilities = "audio", ["audio", "text"]
+    else:
+        model_type = "vision" if supports_vision else "text"
+        capabilities = ["text", "code"] + (["vision"] if supports_vision else []) + (["reasoning"] if supports_reasoning else [])
+
+    return {
+        "id": entry["id"],
+        "name": entry.get("name") or entry["id"],
+        "type": model_type,
+        "capabilities": capabilities,
+        "supports_reasoning": supports_reasoning,
+        "supports_images": supports_images,
+        "supports_audio": supports_audio,
+        "supports_vision": supports_vision,
+        "supports_prompt_cache": False,
+        "free": is_free(entry),
+        "description": (entry.get("description") or "").split("\n")[0][:200]
+    }
+
+def merge_upstream(
+    curated: Dict[str, Dict[str, Any]],
+    upstream: List[Dict[str, Any]],
+    add_free: bool = False
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Curated models that upstream still serves, plus (with add_free) the
+    free upstream models we don't list yet
+    """
+    available = {entry["id"] for entry in upstream if entry.get("id")}
+    models = {key: model for key, model in curated.items() if model["id"] in available}
+    if add_free:
+        known = {model["id"] for model in curated.values()}
+        for entry in upstream:
+            if entry.get("id") and entry["id"] not in known and is_free(entry):
+                models[entry["id"]] = entry_from_upstream(entry)
+    return models
+
+class ModelCatalog:
+    """
+    Model registry that starts from an on-disk snapshot (or the built-in
+    list) and refreshes from OpenRouter's /models in the background, with
+    ETag revalidation and exponential backoff on failures
+    """
+    def __init__(
+        self,
+        path: str = settings.MODEL_CATALOG_PATH,
+        refresh_interval: float = settings.MODEL_CATALOG_REFRESH_SECONDS,
+        retry_interval: float = settings.MODEL_CATALOG_RETRY_SECONDS,
+        add_free: bool = settings.MODEL_CATALOG_ADD_FREE
+    ):
+        self.path = path
+        self.refresh_interval = refresh_interval
+        self.retry_interval = retry_interval
+        self.add_free = add_free
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._task: Optional[asyncio.Task] = None
+        self.failures = 0
+
+    @property
+    def curated(self) -> Dict[str, Dict[str, Any]]:
+        from app.utils.model_mappings import MODELS
+        return MODELS
+
+    @property
+    def snapshot(self) -> CatalogSnapshot:
+        snapshot = self._snapshot
+        if snapshot is None:
+            snapshot = self._snapshot = self.load() or CatalogSnapshot(self.curated)
+        return snapshot
+
+    def swap(self, snapshot: CatalogSnapshot):
+        self._snapshot = snapshot
+        catalog_models.set(len(snapshot.models))
+
+    def get(self, model_id: str) -> Optional[Model]:
+        return self.snapshot.by_id.get(model_id)
+
+    def by_type(self, model_type: str) -> Tuple[Model, ...]:
+        return self.snapshot.by_type.get(model_type, ())
+
+    def build(
+        self,
+        upstream: List[Dict[str, Any]],
+        etag: Optional[str],
+        fetched_at: Optional[float],
+        source: str
+    ) -> CatalogSnapshot:
+        models = merge_upstream(self.curated, upstream, self.add_free)
+        if not models:
+            # An empty or unrelated listing is far more likely an upstream
+            # glitch than every model going away at once
+            raise ValueError(f"Upstream listed {len(upstream)} models, none of them known")
+        return CatalogSnapshot(models, upstream, etag, fetched_at, source)
+
+    def load(self) -> Optional[CatalogSnapshot]:
+        """
+        Snapshot of the last successful refresh, if one was saved. The saved
+        upstream listing is merged with the curated list of this release.
+        """
+        if not self.path or not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            return self.build(data["upstream"], data.get("etag"), data.get("fetched_at"), source="disk")
+        except (OSError, ValueError, KeyError, TypeError):
+            logger.warning("Ignoring unreadable model catalog snapshot %s", self.path, exc_info=True)
+            return None
+
+    def save(self, snapshot: CatalogSnapshot):
+        if not self.path:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(snapshot.to_json(), f)
+        os.replace(temp_path, self.path)
+
+    async def refresh(self, client: Optional[httpx.AsyncClient] = None) -> str:
+        """
+        Fetch /models once and swap in the result. Returns "updated",
+        "unchanged" or "not_modified"; raises on upstream errors.
+        """
+        from app.services.openrouter import openrouter_service
+
+        current = self.snapshot
+        headers = dict(openrouter_service.headers)
+        if current.etag and current.upstream is not None:
+            headers["If-None-Match"] = current.etag
+        response = await (client or openrouter_service.client).get(
+            f"{openrouter_service.base_url}/models", headers=headers
+        )
+
+        if response.status_code == 304 and current.upstream is not None:
+            snapshot = self.build(current.upstream, current.etag, time.time(), source="upstream")
+            result = "not_modified"
+        elif response.status_code == 200:
+            upstream = [trim_upstream(entry) for entry in response.json().get("data") or [] if entry.get("id")]
+            snapshot = self.build(upstream, response.headers.get("etag"), time.time(), source="upstream")
+            result = "unchanged" if snapshot.version == current.version else "updated"
+        else:
+            raise httpx.HTTPStatusError(
+                f"Upstream /models answered {response.status_code}", request=response.request, response=response
+            )
+
+        self.swap(snapshot)
+        await asyncio.to_thread(self.save, snapshot)
+        catalog_refreshes_total.inc(result=result)
+        if result == "updated":
+            logger.info("Model catalog updated: %d models (version %s)", len(snapshot.models), snapshot.version)
+        return result
+
+    def _next_delay(self) -> float:
+        if not self.failures:
+            return self.refresh_interval
+        # Exponential backoff with jitter, never slower than the regular interval
+        delay = min(self.retry_interval * 2 ** (self.failures - 1), self.refresh_interval)
+        return delay * random.uniform(0.5, 1.0)
+
+    async def _run(self):
+        # A snapshot from disk that is still fresh delays the first fetch
+        fetched_at = self.snapshot.fetched_at or 0
+        delay = max(fetched_at + self.refresh_interval - time.time(), 0)
+        while True:
+            await asyncio.sleep(delay)
+            try:
+                await self.refresh()
+                self.failures = 0
+            except Exception:
+                self.failures += 1
+                catalog_refreshes_total.inc(result="error")
+                logger.warning("Model catalog refresh failed (%d in a row)", self.failures, exc_info=True)
+            delay = self._next_delay()
+
+    def start(self):
+        catalog_models.set(len(self.snapshot.models))
+        if self._task is None and self.refresh_interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+model_catalog = ModelCatalog()
+
+catalog_models = metrics.gauge("model_catalog_models", "Models in the active catalog snapshot")
+catalog_refreshes_total = metrics.counter(
+    "model_catalog_refreshes_total", "Model catalog refreshes by result", ("result",)
+)
\ No newline at end of file
@@ -1,7 +1,125 @@
+import asyncio
 import httpx
-from typing import Dict, Any, List, Optional
+import json
+import time
+from typing import Awaitable, Callable, Dict, Any, List, Optional, Union
+from starlette.requests import Request
+from starlette.types import Receive
 from app.config import settings
 from app.utils.model_mappings import get_model_by_id
+from app.services.metrics import (
+    upstream_requests_total, upstream_duration, upstream_bytes_total,
+    upstream_inflight, upstream_pool_size, upstream_cancelled_total, record_upstream_usage
+)
+
+class ClientDisconnected(Exception):
+    """
+    The client went away (or cancelled) before upstream finished, and the
+    upstream request was cancelled. `partial` is the reply streamed so far, set only when
+    KEEP_PARTIAL_ON_DISCONNECT is on and some output had arrived.
+    """
+    def __init__(self, partial: Optional[Dict[str, Any]] = None):
+        super().__init__("Client disconnected")
+        self.partial = partial
+
+async def wait_for_disconnect(receive: Receive):
+    # Once the body has been read, receive() only returns on disconnect
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+CACHE_BREAKPOINT = {"type": "ephemeral"}
+
+def _mark_cacheable(message: Dict[str, Any]) -> Dict[str, Any]:
+    content = message.get("content")
+    if isinstance(content, str):
+        parts = [{"type": "text", "text": content}]
+    elif isinstance(content, list) and any(part.get("type") == "text" for part in content):
+        parts = [dict(part) for part in content]
+    else:
+        return message
+    
+    last_text = max(i for i, part in enumerate(parts) if part.get("type") == "text")
+    parts[last_text]["cache_control"] = CACHE_BREAKPOINT
+    return {**message, "content": parts}
+
+def add_cache_breakpoints(messages: List[Dict[str, Any]], min_chars: int) -> List[Dict[str, Any]]:
+    """
+    Copy of `messages` with provider prompt-cache breakpoints on the stable
+    prefix: the leading system prompt and the message just before the newest
+    turn. Each turn then reads the previous turn's prefix from cache and
+    only the new messages are processed. Prefixes shorter than `min_chars`
+    are left alone, since providers don't cache them and cache writes can
+    cost more than plain input.
+    """
+    if len(messages) < 2:
+        return messages
+    
+    prefix = messages[:-1]
+    if sum(len(json.dumps(message.get("content"))) for message in prefix) < min_chars:
+        return messages
+    
+    breakpoints = {len(prefix) - 1}
+    if messages[0].get("role") == "system":
+        breakpoints.add(0)
+    return [_mark_cacheable(message) if i in breakpoints else message for i, message in enumerate(messages)]
+
+class CompletionAggregator:
+    """
+    Folds streamed chat completion chunks into the shape of a non-streamed
+    response, so callers handle both the same way
+    """
+    def __init__(self):
+        self.id: Optional[str] = None
+        self.model: Optional[str] = None
+        self.content: List[str] = []
+        self.reasoning: List[str] = []
+        self.reasoning_details: List[Any] = []
+        self.images: List[Any] = []
+        self.finish_reason: Optional[str] = None
+        self.usage: Optional[Dict[str, Any]] = None
+    
+    def feed(self, chunk: Dict[str, Any]) -> str:
+        """
+        Add a chunk; returns the content text it carried
+        """
+        if chunk.get("error"):
+            raise Exception(f"OpenRouter API error: {json.dumps(chunk['error'])}")
+        self.id = chunk.get("id", self.id)
+        self.model = chunk.get("model", self.model)
+        text = ""
+        for choice in chunk.get("choices") or []:
+            delta = choice.get("delta") or {}
+            if delta.get("content"):
+                self.content.append(delta["content"])
+                text += delta["content"]
+            if delta.get("reasoning"):
+                self.reasoning.append(delta["reasoning"])
+            self.reasoning_details.extend(delta.get("reasoning_details") or [])
+            self.images.extend(delta.get("images") or [])
+            if choice.get("finish_reason"):
+                self.finish_reason = choice["finish_reason"]
+        if chunk.get("usage"):
+            self.usage = chunk["usage"]
+        return text
+    
+    @property
+    def has_output(self) -> bool:
+        return bool(self.content or self.images)
+    
+    def result(self) -> Dict[str, Any]:
+        message: Dict[str, Any] = {"role": "assistant", "content": "".join(self.content)}
+        if self.reasoning:
+            message["reasoning"] = "".join(self.reasoning)
+        if self.reasoning_details:
+            message["reasoning_details"] = self.reasoning_details
+        if self.images:
+            message["images"] = self.images
+        return {
+            "id": self.id,
+            "model": self.model,
+            "choices": [{"index": 0, "message": message, "finish_reason": self.finish_reason}],
+            "usage": self.usage
+        }
 
 class OpenRouterService:
     def __init__(self):
@@ -13,6 +131,26 @@ class OpenRouterService:
             "HTTP-Referer": settings.SITE_URL,
             "X-Title": settings.APP_NAME
         }
+        self.limits = httpx.Limits(
+            max_connections=settings.OPENROUTER_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.OPENROUTER_MAX_CONNECTIONS
+        )
+        self._client: Optional[httpx.AsyncClient] = None
+        upstream_pool_size.set(settings.OPENROUTER_MAX_CONNECTIONS)
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """
+        Shared client so upstream connections are pooled and kept alive
+        """
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(timeout=settings.OPENROUTER_TIMEOUT, limits=self.limits)
+        return self._client
+    
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
     
     async def chat_completion(
         self,
@@ -20,14 +158,30 @@ class OpenRouterService:
         messages: List[Dict[str, Any]],
         reasoning: Optional[Dict[str, bool]] = None,
         modalities: Optional[List[str]] = None,
-        stream: bool = False
+        stream: bool = False,
+        request: Optional[Request] = None,
+        cancel: Optional[asyncio.Event] = None,
+        on_delta: Optional[Callable[[str], Awaitable[None]]] = None
     ) -> Dict[str, Any]:
         """
-        Universal chat completion method for all model types
+        Universal chat completion method for all model types.
+        
+        With stream=True the reply is read as server-sent events and
+        aggregated; on_delta is awaited with each piece of content text,
+        so a slow consumer slows down reading from upstream. With a request
+        (or a cancel event), the call is cancelled as soon as that client
+        disconnects (or the event is set), raising ClientDisconnected;
+        upstream stops generating on a cancelled stream, so long replies
+        should stream.
         """
         model_info = get_model_by_id(model)
         if not model_info:
             model_info = get_model_by_id(model.split('/')[-1])
+        # Metrics are labelled by catalog id; model itself is client input
+        model_label = model_info["id"] if model_info else "other"
+        
+        if model_info and model_info.get("supports_prompt_cache"):
+            messages = add_cache_breakpoints(messages, settings.PROMPT_CACHE_MIN_CHARS)
         
         payload = {
             "model": model,
@@ -40,19 +194,118 @@ class OpenRouterService:
         if modalities:
             payload["modalities"] = modalities
         
-        async with httpx.AsyncClient(timeout=120.0) as client:
-            response = await client.post(
+        if stream:
+            payload["stream"] = True
+        
+        body = json.dumps(payload).encode("utf-8")
+        aggregator = CompletionAggregator() if stream else None
+        upstream = self._send(model_label, body, aggregator, on_delta)
+        if request is not None:
+            result = await self._cancel_on_disconnect(upstream, wait_for_disconnect(request.receive), model_label, aggregator)
+        elif cancel is not None:
+            result = await self._cancel_on_disconnect(upstream, cancel.wait(), model_label, aggregator)
+        else:
+            result = await upstream
+        
+        record_upstream_usage(model_label, result.get("usage"))
+        return result
+    
+    async def _send(
+        self,
+        model_label: str,
+        body: bytes,
+        aggregator: Optional[CompletionAggregator],
+        on_delta: Optional[Callable[[str], Awaitable[None]]] = None
+    ) -> Dict[str, Any]:
+        started = time.perf_counter()
+        status = "error"
+        received = 0
+        upstream_inflight.inc()
+        try:
+            if aggregator is None:
+                response = await self.client.post(
+                    f"{self.base_url}/chat/completions",
+                    headers=self.headers,
+                    content=body
+                )
+                status = str(response.status_code)
+                received = len(response.content)
+                if response.status_code != 200:
+                    raise Exception(f"OpenRouter API error: {response.text}")
+                return response.json()
+            
+            async with self.client.stream(
+                "POST",
                 f"{self.base_url}/chat/completions",
                 headers=self.headers,
-                json=payload
-            )
-            
-            if response.status_code != 200:
-                raise Exception(f"OpenRouter API error: {response.text}")
-            
-            return response.json()
+                content=body
+            ) as response:
+                status = str(response.status_code)
+                if response.status_code != 200:
+                    await response.aread()
+                    received = len(response.content)
+                    raise Exception(f"OpenRouter API error: {response.text}")
+                async for line in response.aiter_lines():
+                    received += len(line) + 1
+                    # Skip event separators and ": OPENROUTER PROCESSING" keep-alives
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    text = aggregator.feed(json.loads(data))
+                    if text and on_delta is not None:
+                        await on_delta(text)
+            return aggregator.result()
+        except asyncio.CancelledError:
+            status = "cancelled"
+            raise
+        finally:
+            upstream_inflight.dec()
+            upstream_duration.observe(time.perf_counter() - started, model=model_label)
+            upstream_requests_total.inc(model=model_label, status=status)
+            upstream_bytes_total.inc(len(body), model=model_label, direction="sent")
+            upstream_bytes_total.inc(received, model=model_label, direction="received")
     
-    async def generate_image(self, model: str, prompt: str, num_images: int = 1) -> Dict[str, Any]:
+    async def _cancel_on_disconnect(
+        self,
+        upstream: Awaitable[Dict[str, Any]],
+        disconnected: Awaitable[Any],
+        model_label: str,
+        aggregator: Optional[CompletionAggregator]
+    ) -> Dict[str, Any]:
+        """
+        Race the upstream call against the client disconnecting. Cancelling
+        the task closes the httpx connection, which aborts the upstream request.
+        """
+        upstream_task = asyncio.ensure_future(upstream)
+        watcher = asyncio.ensure_future(disconnected)
+        try:
+            done, _ = await asyncio.wait({upstream_task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            upstream_task.cancel()
+            watcher.cancel()
+            raise
+        
+        if upstream_task in done:
+            watcher.cancel()
+            return upstream_task.result()
+        
+        upstream_task.cancel()
+        await asyncio.gather(upstream_task, return_exceptions=True)
+        partial = None
+        if settings.KEEP_PARTIAL_ON_DISCONNECT and aggregator is not None and aggregator.has_output:
+            partial = aggregator.result()
+        upstream_cancelled_total.inc(model=model_label, partial=str(partial is not None).lower())
+        raise ClientDisconnected(partial)
+    
+    async def generate_image(
+        self,
+        model: str,
+        prompt: str,
+        num_images: int = 1,
+        request: Optional[Request] = None
+    ) -> Dict[str, Any]:
         """
         Generate images using compatible models
         """
@@ -66,12 +319,22 @@ class OpenRouterService:
         return await self.chat_completion(
             model=model,
             messages=messages,
-            modalities=["image"]
+            modalities=["image"],
+            request=request
         )
     
-    async def generate_audio(self, model: str, prompt: str, audio_input: Optional[str] = None) -> Dict[str, Any]:
+    async def generate_audio(
+        self,
+        model: str,
+        prompt: str,
+        audio_input: Optional[str] = None,
+        audio_format: str = "wav",
+        request: Optional[Request] = None,
+        cancel: Optional[asyncio.Event] = None
+    ) -> Dict[str, Any]:
         """
-        Generate/process audio using compatible models
+        Generate/process audio using compatible models; audio_input is
+        base64 audio in audio_format
         """
         content = []
         
@@ -87,7 +350,7 @@ class OpenRouterService:
                 "type": "input_audio",
                 "input_audio": {
                     "data": audio_input,
-                    "format": "wav"
+                    "format": audio_format
                 }
             })
         
@@ -100,24 +363,37 @@ class OpenRouterService:
         
         return await self.chat_completion(
             model=model,
-            messages=messages
+            messages=messages,
+            request=request,
+            cancel=cancel
         )
     
-    async def analyze_image(self, model: str, prompt: str, image_url: str) -> Dict[str, Any]:
+    async def analyze_image(
+        self,
+        model: str,
+        prompt: str,
+        image_url: Union[str, List[str]],
+        request: Optional[Request] = None
+    ) -> Dict[str, Any]:
         """
-        Analyze images using vision models
+        Analyze images using vision models; image_url is one URL (or data
+        URL) or a list of them
         """
+        image_urls = [image_url] if isinstance(image_url, str) else image_url
         content = [
             {
                 "type": "text",
                 "text": prompt
             },
-            {
-                "type": "image_url",
-                "image_url": {
-                    "url": image_url
+            *(
+                {
+                    "type": "image_url",
+                    "image_url": {
+                        "url": url
+                    }
                 }
-            }
+                for url in image_urls
+            )
         ]
         
         messages = [
@@ -129,7 +405,8 @@ class OpenRouterService:
         
         return await self.chat_completion(
             model=model,
-            messages=messages
+            messages=messages,
+            request=request
         )
 
 openrouter_service = OpenRouterService()
\ No newline at end of file
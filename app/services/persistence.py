@@ -0,0 +1,258 @@
+import asyncio
+import logging
+from typing import Any, Callable, Dict, Hashable, List, Optional, Set, Tuple
+from sqlalchemy import Table, insert, select
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import SessionLocal
+from app.services.metrics import metrics
+from app.services.read_routing import read_router
+
+logger = logging.getLogger(__name__)
+
+class InsertRow:
+    """
+    Insert one row and return it with its generated id and defaults. The
+    id is kept after the first attempt, so a retry writes the same row the
+    caller was already told about. If that id was taken in the meantime
+    (SQLite reuses the ids of a rolled-back insert), the row gets a new id,
+    which is what a durable caller receives; the remap is also logged.
+    """
+    def __init__(self, table: Table, values: Dict[str, Any]):
+        self.table = table
+        self.values = dict(values)
+
+    def __call__(self, db: Session) -> Dict[str, Any]:
+        promised = self.values.get("id")
+        if promised is not None and db.execute(
+            select(self.table.c.id).where(self.table.c.id == promised)
+        ).first() is not None:
+            del self.values["id"]
+        returned = db.execute(
+            insert(self.table).values(**self.values).returning(self.table.c.id, self.table.c.created_at)
+        ).one()
+        self.values.update(returned._asdict())
+        if promised is not None and self.values["id"] != promised:
+            logger.warning(
+                "%s id %d was reused before its write committed; stored as id %d",
+                self.table.name, promised, self.values["id"]
+            )
+        return dict(self.values)
+
+class WriteJob:
+    def __init__(self, apply: Callable[[Session], Any], loop: asyncio.AbstractEventLoop):
+        self.apply = apply
+        self.loop = loop
+        self.attempts = 0
+        # Resolved with apply()'s result once it ran, and once it is committed
+        self.applied = loop.create_future()
+        self.committed = loop.create_future()
+
+    def resolve(self, future: asyncio.Future, result: Any = None, error: Optional[BaseException] = None):
+        """Complete one of the job's futures from the writer thread"""
+        def resolve():
+            if future.done():
+                return
+            if error is None:
+                future.set_result(result)
+                return
+            future.set_exception(error)
+            # Nobody awaits `committed` in async mode; don't warn about it
+            future.exception()
+        self.loop.call_soon_threadsafe(resolve)
+
+    def fail(self, error: BaseException):
+        self.resolve(self.applied, error=error)
+        self.resolve(self.committed, error=error)
+
+class PersistenceQueue:
+    """
+    Writes response bookkeeping (assistant messages, generation records)
+    from a bounded queue, several jobs per transaction, with retries.
+
+    In "durable" mode (the default) a request waits for the commit, so a
+    write that is dropped after its retries raises in the caller and a row
+    that had to take a new id is returned with that id. "async" mode only
+    waits until the row is inserted and commits after the response is sent;
+    a failure then can't reach the caller and is only logged. Writes
+    submitted with a key can be awaited with settle(key), which is how a
+    chat turn waits for the previous reply before reading the history.
+    Submitting blocks while the queue is full.
+    """
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        mode: str = settings.PERSISTENCE_MODE,
+        max_queued: int = settings.PERSISTENCE_QUEUE_SIZE,
+        batch_size: int = settings.PERSISTENCE_BATCH_SIZE,
+        max_attempts: int = settings.PERSISTENCE_MAX_ATTEMPTS,
+        retry_delay: float = settings.PERSISTENCE_RETRY_SECONDS
+    ):
+        self.session_factory = session_factory
+        self.mode = mode
+        self.max_queued = max_queued
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        # Commit futures of unfinished writes, by submit key
+        self._pending: Dict[Hashable, Set[asyncio.Future]] = {}
+        # Failed jobs waiting out their backoff before going back on the queue
+        self._retries: Set[asyncio.Task] = set()
+
+    @property
+    def durable(self) -> bool:
+        return self.mode == "durable"
+
+    async def submit(
+        self,
+        apply: Callable[[Session], Any],
+        durable: Optional[bool] = None,
+        user_id: Optional[int] = None,
+        key: Optional[Hashable] = None
+    ) -> Any:
+        """
+        Run apply(session) in the writer and return its result, after the
+        commit when durable (default: the configured mode). user_id keeps
+        that user's reads on the primary until the write can have replicated;
+        settle(key) waits for this write.
+        """
+        if user_id is not None:
+            read_router.note_write(user_id)
+        job = WriteJob(apply, asyncio.get_running_loop())
+        if key is not None:
+            self._track(key, job.committed)
+        if self._queue is None:
+            await self._write_inline(job)
+        else:
+            await self._queue.put(job)
+            persistence_queue_depth.set(self._queue.qsize())
+        durable = self.durable if durable is None else durable
+        return await (job.committed if durable else job.applied)
+
+    def _track(self, key: Hashable, committed: asyncio.Future):
+        pending = self._pending.setdefault(key, set())
+        pending.add(committed)
+
+        def forget(future: asyncio.Future):
+            pending.discard(future)
+            if not pending and self._pending.get(key) is pending:
+                del self._pending[key]
+        committed.add_done_callback(forget)
+
+    async def settle(self, key: Hashable):
+        """Wait until every write submitted under key has committed or failed"""
+        pending = self._pending.get(key)
+        if pending:
+            await asyncio.wait(list(pending))
+
+    def _write(self, jobs: List[WriteJob]):
+        """Apply and commit the jobs in one transaction"""
+        db = self.session_factory()
+        try:
+            results = []
+            for job in jobs:
+                job.attempts += 1
+                results.append(job.apply(db))
+                # The caller may answer as soon as its row has an id
+                job.resolve(job.applied, results[-1])
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        for job, result in zip(jobs, results):
+            job.resolve(job.committed, result)
+        persistence_jobs_total.inc(len(jobs), result="committed")
+
+    def _write_batch(self, jobs: List[WriteJob]) -> List[Tuple[WriteJob, Exception]]:
+        """Write the jobs; returns the ones that failed, with their errors"""
+        try:
+            self._write(jobs)
+            return []
+        except Exception as error:
+            if len(jobs) == 1:
+                return [(jobs[0], error)]
+            # Give every job its own transaction so one bad write can't sink the rest
+            failed = []
+            for job in jobs:
+                failed.extend(self._write_batch([job]))
+            return failed
+
+    def _retry_delay(self, job: WriteJob, error: Exception) -> Optional[float]:
+        """Backoff before the job's next attempt, or None (and the job fails) once it has used them all"""
+        if job.attempts < self.max_attempts:
+            persistence_jobs_total.inc(result="retried")
+            logger.warning("Write failed (attempt %d), retrying", job.attempts, exc_info=error)
+            return self.retry_delay * 2 ** (job.attempts - 1)
+        logger.error("Dropping write after %d attempts", job.attempts, exc_info=error)
+        persistence_jobs_total.inc(result="failed")
+        job.fail(error)
+        return None
+
+    async def _write_inline(self, job: WriteJob):
+        # Not started (CLI, scripts): nothing else is waiting on this writer
+        while True:
+            failed = await asyncio.to_thread(self._write_batch, [job])
+            if not failed:
+                return
+            delay = self._retry_delay(*failed[0])
+            if delay is None:
+                return
+            await asyncio.sleep(delay)
+
+    async def _requeue(self, job: WriteJob, delay: float):
+        await asyncio.sleep(delay)
+        await self._queue.put(job)
+
+    def _schedule_retry(self, job: WriteJob, error: Exception):
+        # The backoff runs on the loop; the writer moves on to other jobs meanwhile
+        delay = self._retry_delay(job, error)
+        if delay is None:
+            return
+        task = asyncio.create_task(self._requeue(job, delay))
+        self._retries.add(task)
+        task.add_done_callback(self._retries.discard)
+
+    async def _run(self):
+        while True:
+            jobs = [await self._queue.get()]
+            while len(jobs) < self.batch_size and not self._queue.empty():
+                jobs.append(self._queue.get_nowait())
+            persistence_queue_depth.set(self._queue.qsize())
+            try:
+                for job, error in await asyncio.to_thread(self._write_batch, jobs):
+                    self._schedule_retry(job, error)
+            finally:
+                for _ in jobs:
+                    self._queue.task_done()
+
+    def start(self):
+        if self._task is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queued)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Write everything still queued (including pending retries), then stop the writer"""
+        if self._task is None:
+            return
+        await self._queue.join()
+        while self._retries:
+            await asyncio.gather(*self._retries, return_exceptions=True)
+            await self._queue.join()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._queue = None
+
+persistence_queue = PersistenceQueue()
+
+persistence_queue_depth = metrics.gauge("persistence_queue_depth", "Writes waiting in the persistence queue")
+persistence_jobs_total = metrics.counter(
+    "persistence_jobs_total", "Queued writes by outcome (committed, retried, failed)", ("result",)
+)
\ No newline at end of file
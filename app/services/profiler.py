@@ -0,0 +1,113 @@
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from app.config import settings
+
+PROFILE_NAME_RE = re.compile(r"^[\w.-]+\.collapsed$")
+
+class StackSampler:
+    """
+    Samples the call stack of one thread at a fixed interval from a helper
+    thread and aggregates the samples as collapsed stacks.
+
+    Profiling the event loop thread means concurrent requests on the same
+    worker show up in each other's profiles; the dominant frames are still
+    the ones that make the profiled request slow.
+    """
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread.start()
+
+    def stop(self) -> float:
+        self._stop.set()
+        self._thread.join()
+        return time.perf_counter() - self.started
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        """
+        Brendan Gregg's folded format, loadable by speedscope and flamegraph.pl
+        """
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common()) + "\n"
+
+class ProfileStore:
+    def __init__(self, directory: str = settings.PROFILE_DIR, max_files: int = settings.PROFILING_MAX_FILES):
+        self.directory = directory
+        self.max_files = max_files
+
+    def new_name(self, method: str, path: str, inflight: int = 1) -> str:
+        """
+        Dump name with the request and the number of requests in flight on
+        the worker (including this one) when it started
+        """
+        slug = re.sub(r"[^\w]+", "_", path).strip("_") or "root"
+        return (
+            f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}_{method}_{slug}"
+            f"_inflight{inflight}_{uuid.uuid4().hex[:8]}.collapsed"
+        )
+
+    def save(self, sampler: StackSampler, name: str):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, name), "w") as f:
+            f.write(sampler.collapsed())
+        self._prune()
+
+    def _prune(self):
+        profiles = self.list()
+        for profile in profiles[self.max_files:]:
+            try:
+                os.remove(os.path.join(self.directory, profile["name"]))
+            except FileNotFoundError:
+                pass
+
+    def list(self) -> List[Dict[str, Any]]:
+        """
+        Stored profiles, newest first
+        """
+        if not os.path.isdir(self.directory):
+            return []
+        profiles = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and PROFILE_NAME_RE.match(entry.name):
+                stat = entry.stat()
+                profiles.append({
+                    "name": entry.name,
+                    "size": stat.st_size,
+                    "created_at": datetime.utcfromtimestamp(stat.st_mtime)
+                })
+        profiles.sort(key=lambda p: p["created_at"], reverse=True)
+        return profiles
+
+    def path(self, name: str) -> Optional[str]:
+        if not PROFILE_NAME_RE.match(name):
+            return None
+        filepath = os.path.join(self.directory, name)
+        return filepath if os.path.isfile(filepath) else None
+
+profile_store = ProfileStore()
\ No newline at end of file
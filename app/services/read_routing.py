@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Dict, Optional
+from sqlalchemy import event, text
+from app.config import settings
+from app.database import SessionLocal, read_engine
+from app.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Seconds the replica is behind; 0 when it has replayed everything it received
+POSTGRES_LAG_SQL = text("""
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END
+""")
+
+class ReadRouter:
+    """
+    Decides per request whether reads can go to the read engine. A
+    background check measures replica lag; while it is above
+    REPLICA_MAX_LAG_SECONDS (or the check fails) everything reads from the
+    primary. A user who committed recently keeps reading from the primary
+    until the replica has had time to replay that write.
+
+    Writes are tracked per process, so read-your-writes holds for clients
+    that keep talking to the same worker.
+    """
+    def __init__(
+        self,
+        engine=read_engine,
+        max_lag: float = settings.REPLICA_MAX_LAG_SECONDS,
+        check_interval: float = settings.REPLICA_CHECK_INTERVAL_SECONDS,
+        read_after_write: float = settings.READ_AFTER_WRITE_SECONDS
+    ):
+        self.engine = engine
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.read_after_write = read_after_write
+        # None until the first check; the replica isn't used before that
+        self.lag: Optional[float] = None
+        self._last_write: Dict[int, float] = {}
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.engine is not None
+
+    def note_write(self, user_id: int):
+        with self._lock:
+            self._last_write[user_id] = time.monotonic()
+
+    def use_replica(self, user_id: Optional[int] = None) -> bool:
+        lag = self.lag
+        if not self.enabled or lag is None or lag > self.max_lag:
+            return False
+        if user_id is not None:
+            last_write = self._last_write.get(user_id)
+            if last_write is not None and time.monotonic() - last_write < max(self.read_after_write, lag):
+                return False
+        return True
+
+    def measure_lag(self) -> float:
+        with self.engine.connect() as connection:
+            if connection.dialect.name == "postgresql":
+                return float(connection.execute(POSTGRES_LAG_SQL).scalar() or 0)
+            # A read-only pool over the primary's SQLite file never lags
+            connection.execute(text("SELECT 1"))
+            return 0.0
+
+    def _forget_old_writes(self):
+        cutoff = time.monotonic() - max(self.read_after_write, self.max_lag)
+        with self._lock:
+            self._last_write = {user_id: at for user_id, at in self._last_write.items() if at >= cutoff}
+
+    async def check(self):
+        try:
+            lag = await asyncio.to_thread(self.measure_lag)
+        except Exception:
+            if self.lag is not None:
+                logger.warning("Read replica check failed, reading from the primary", exc_info=True)
+            self.lag = None
+            replica_available.set(0)
+            return
+        if lag > self.max_lag and (self.lag is None or self.lag <= self.max_lag):
+            logger.warning("Read replica is %.1fs behind, reading from the primary", lag)
+        self.lag = lag
+        replica_lag_seconds.set(lag)
+        replica_available.set(1 if lag <= self.max_lag else 0)
+
+    async def _run(self):
+        while True:
+            await self.check()
+            self._forget_old_writes()
+            await asyncio.sleep(self.check_interval)
+
+    def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+read_router = ReadRouter()
+
+@event.listens_for(SessionLocal, "after_commit")
+def _note_user_write(session):
+    # get_current_user tags request sessions with the user id
+    user_id = session.info.get("user_id")
+    if user_id is not None:
+        read_router.note_write(user_id)
+
+replica_lag_seconds = metrics.gauge("read_replica_lag_seconds", "Replication lag of the read engine at the last check")
+replica_available = metrics.gauge("read_replica_available", "1 while reads may use the read engine")
+read_sessions_total = metrics.counter("read_sessions_total", "Sessions handed out by get_read_db, by target", ("target",))
\ No newline at end of file
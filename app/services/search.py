@@ -0,0 +1,257 @@
+import html
+import re
+from typing import Any, Dict, List
+from sqlalchemy import select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+# Full-text index over message content and chat titles. Rows share the
+# message id as rowid; user_tag ("u<user id>") is indexed so the user scope
+# is part of the MATCH itself instead of a filter over every hit.
+FTS_TABLE_SQL = """
+CREATE VIRTUAL TABLE messages_fts USING fts5(
+    content, title, user_tag, chat_id UNINDEXED,
+    tokenize = 'unicode61 remove_diacritics 2'
+)
+"""
+
+FTS_TRIGGERS_SQL = [
+    """
+    CREATE TRIGGER IF NOT EXISTS messages_fts_ai AFTER INSERT ON messages BEGIN
+        INSERT INTO messages_fts (rowid, content, title, user_tag, chat_id)
+        SELECT new.id, new.content, chats.title, 'u' || chats.user_id, chats.id
+        FROM chats WHERE chats.id = new.chat_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS messages_fts_ad AFTER DELETE ON messages BEGIN
+        DELETE FROM messages_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS messages_fts_au AFTER UPDATE OF content, chat_id ON messages BEGIN
+        DELETE FROM messages_fts WHERE rowid = old.id;
+        INSERT INTO messages_fts (rowid, content, title, user_tag, chat_id)
+        SELECT new.id, new.content, chats.title, 'u' || chats.user_id, chats.id
+        FROM chats WHERE chats.id = new.chat_id;
+    END
+    """,
+    # Archived messages keep their index rows without a messages row; they
+    # go when the archive does (chat restored or deleted)
+    """
+    CREATE TRIGGER IF NOT EXISTS chat_archives_fts_ad AFTER DELETE ON chat_archives BEGIN
+        DELETE FROM messages_fts WHERE rowid IN (
+            SELECT rowid FROM messages_fts
+            WHERE messages_fts MATCH (SELECT 'user_tag : "u' || user_id || '"' FROM chats WHERE id = old.chat_id)
+              AND chat_id = old.chat_id
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS chats_fts_au AFTER UPDATE OF title ON chats BEGIN
+        UPDATE messages_fts SET title = new.title
+        WHERE rowid IN (SELECT id FROM messages WHERE chat_id = new.id);
+    END
+    """,
+]
+
+REINDEX_SQL = """
+INSERT INTO messages_fts (rowid, content, title, user_tag, chat_id)
+SELECT messages.id, messages.content, chats.title, 'u' || chats.user_id, chats.id
+FROM messages JOIN chats ON chats.id = messages.chat_id
+"""
+
+INDEX_ARCHIVED_SQL = """
+INSERT INTO messages_fts (rowid, content, title, user_tag, chat_id)
+SELECT :id, :content, chats.title, 'u' || chats.user_id, chats.id
+FROM chats WHERE chats.id = :chat_id
+"""
+
+SEARCH_SQL = """
+SELECT messages_fts.rowid AS message_id,
+       chats.id AS chat_id,
+       chats.title AS chat_title,
+       messages.role AS role,
+       messages.created_at AS created_at,
+       snippet(messages_fts, -1, char(2), char(3), '...', 16) AS snippet,
+       bm25(messages_fts, 1.0, 2.0, 0.0) AS rank
+FROM messages_fts
+JOIN chats ON chats.id = messages_fts.chat_id
+LEFT JOIN messages ON messages.id = messages_fts.rowid
+WHERE messages_fts MATCH :match AND chats.user_id = :user_id
+ORDER BY rank
+LIMIT :limit OFFSET :offset
+"""
+
+# Words, optionally ending in "*" for a prefix match
+TOKEN_RE = re.compile(r"(\w+)(\*?)", re.UNICODE)
+
+# snippet() wraps matches in these control characters; highlight_snippet
+# turns them into <mark> tags after escaping the text
+MATCH_START, MATCH_END = "\x02", "\x03"
+MARKED_RE = re.compile(f"{MATCH_START}([^{MATCH_START}{MATCH_END}]*){MATCH_END}")
+
+def highlight_snippet(snippet: str) -> str:
+    """
+    HTML-escaped snippet with matches in <mark> tags. Message text is user
+    input and model output, so nothing else in it may reach the markup.
+    """
+    marked = MARKED_RE.sub(lambda match: f"<mark>{match.group(1)}</mark>", html.escape(snippet or ""))
+    return marked.replace(MATCH_START, "").replace(MATCH_END, "")
+
+def like_pattern(query: str) -> str:
+    """Substring LIKE pattern with the query's own wildcards escaped"""
+    escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+def fts_supported(engine: Engine) -> bool:
+    return engine.dialect.name == "sqlite"
+
+def search_index_exists(db: Session) -> bool:
+    return fts_supported(db.get_bind()) and db.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'messages_fts'"
+    )).first() is not None
+
+def index_archived_messages(db: Session, messages: List[Dict[str, Any]]):
+    """
+    Index messages that now live only in an archive payload (in the
+    caller's transaction), so archived chats stay searchable
+    """
+    if messages and search_index_exists(db):
+        db.execute(text(INDEX_ARCHIVED_SQL), [
+            {"id": message["id"], "content": message.get("content"), "chat_id": message["chat_id"]}
+            for message in messages
+        ])
+
+def init_search_index(engine: Engine):
+    """
+    Create the FTS5 table and its sync triggers (SQLite only). A newly
+    created index is filled from the existing messages.
+    """
+    if not fts_supported(engine):
+        return
+    with engine.begin() as conn:
+        exists = conn.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'messages_fts'"
+        )).first()
+        if not exists:
+            conn.execute(text(FTS_TABLE_SQL))
+        # The title trigger looks messages up by chat; databases created before
+        # Message.chat_id was indexed don't have this index yet
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_messages_chat_id ON messages (chat_id)"))
+        for statement in FTS_TRIGGERS_SQL:
+            conn.execute(text(statement))
+        if not exists:
+            conn.execute(text(REINDEX_SQL))
+
+def rebuild_search_index(engine: Engine) -> int:
+    """
+    Drop and refill the index from messages and archived chats; returns
+    the indexed row count
+    """
+    from app.models.chat import ChatArchive
+    from app.services.archive import decode_messages
+
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM messages_fts"))
+        conn.execute(text(REINDEX_SQL))
+        archives = conn.execute(select(ChatArchive.payload)).scalars().all()
+        for payload in archives:
+            messages = decode_messages(payload)
+            if messages:
+                conn.execute(text(INDEX_ARCHIVED_SQL), [
+                    {"id": message["id"], "content": message.get("content"), "chat_id": message["chat_id"]}
+                    for message in messages
+                ])
+        conn.execute(text("INSERT INTO messages_fts (messages_fts) VALUES ('optimize')"))
+        return conn.execute(text("SELECT count(*) FROM messages_fts")).scalar()
+
+def build_match_query(user_id: int, query: str) -> str:
+    """
+    Turn free text into a safe FTS5 expression: every word must match in
+    the content or title, scoped to the user's own rows. Operators and
+    quotes in the input are dropped; "word*" keeps its prefix match.
+    """
+    tokens = TOKEN_RE.findall(query)
+    if not tokens:
+        return ""
+    terms = [f'"{word}"{star}' for word, star in tokens]
+    return f'user_tag : "u{user_id}" AND {{content title}} : ({" AND ".join(terms)})'
+
+def search_messages(db: Session, user_id: int, query: str, limit: int = 20, offset: int = 0) -> Dict[str, Any]:
+    """
+    Ranked message search for one user. Fetches one extra row to report
+    whether another page exists without counting every hit.
+    """
+    if fts_supported(db.get_bind()):
+        match = build_match_query(user_id, query)
+        rows: List[Any] = []
+        if match:
+            rows = [
+                {**row, "snippet": highlight_snippet(row["snippet"])}
+                for row in db.execute(
+                    text(SEARCH_SQL),
+                    {"match": match, "user_id": user_id, "limit": limit + 1, "offset": offset}
+                ).mappings()
+            ]
+            rows = _fill_archived_hits(db, rows)
+    else:
+        rows = _search_messages_like(db, user_id, query, limit + 1, offset)
+
+    return {
+        "query": query,
+        "limit": limit,
+        "offset": offset,
+        "has_more": len(rows) > limit,
+        "results": [dict(row) for row in rows[:limit]]
+    }
+
+def _fill_archived_hits(db: Session, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # Hits in archived chats have no messages row; role and time come from the archive
+    archived = list({row["chat_id"] for row in rows if row["role"] is None})
+    if not archived:
+        return rows
+    from app.services.archive import archived_messages
+
+    by_id = {
+        message["id"]: message
+        for messages in archived_messages(db, archived).values()
+        for message in messages
+    }
+    filled = []
+    for row in rows:
+        if row["role"] is None:
+            message = by_id.get(row["message_id"])
+            if message is None:
+                continue
+            row = {**row, "role": message["role"], "created_at": message.get("created_at")}
+        filled.append(row)
+    return filled
+
+def _search_messages_like(db: Session, user_id: int, query: str, limit: int, offset: int) -> List[Dict[str, Any]]:
+    # Fallback for databases without FTS5: unranked substring match
+    from app.models.chat import Chat, Message
+
+    pattern = like_pattern(query)
+    rows = (
+        db.query(Message, Chat.title)
+        .join(Chat, Chat.id == Message.chat_id)
+        .filter(Chat.user_id == user_id)
+        .filter(Message.content.ilike(pattern, escape="\\") | Chat.title.ilike(pattern, escape="\\"))
+        .order_by(Message.created_at.desc())
+        .limit(limit)
+        .offset(offset)
+        .all()
+    )
+    return [
+        {
+            "message_id": message.id,
+            "chat_id": message.chat_id,
+            "chat_title": title,
+            "role": message.role,
+            "created_at": message.created_at,
+            "snippet": html.escape((message.content or "")[:200]),
+            "rank": 0.0
+        }
+        for message, title in rows
+    ]
\ No newline at end of file
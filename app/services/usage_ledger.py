@@ -0,0 +1,311 @@
+import asyncio
+import logging
+import threading
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import bindparam, delete, func, select, update
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import SessionLocal
+from app.models.user import User
+from app.models.chat import Chat, ChatArchive, Message
+from app.models.generation import Generation
+from app.models.usage import UsageRollup, GlobalUsageRollup, USAGE_COUNTERS
+from app.services.archive import decode_messages
+from app.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+users_table = User.__table__
+
+# One executemany statement per flush; counters are incremented in SQL so
+# concurrent workers never overwrite each other's totals
+INCREMENT_USER_USAGE = (
+    update(users_table)
+    .where(users_table.c.id == bindparam("b_user_id"))
+    .values(
+        total_generations=func.coalesce(users_table.c.total_generations, 0) + bindparam("b_generations"),
+        total_tokens=func.coalesce(users_table.c.total_tokens, 0) + bindparam("b_tokens")
+    )
+)
+
+RollupKey = Tuple[int, str, str, date]
+
+def usage_counters(usage: Optional[Dict[str, Any]]) -> Dict[str, int]:
+    """
+    Normalize an OpenRouter usage object into rollup counters
+    """
+    usage = usage or {}
+    details = usage.get("prompt_tokens_details") or {}
+    return {
+        "requests": 1,
+        "prompt_tokens": usage.get("prompt_tokens") or 0,
+        "completion_tokens": usage.get("completion_tokens") or 0,
+        "total_tokens": usage.get("total_tokens") or 0,
+        "cached_tokens": details.get("cached_tokens") or 0
+    }
+
+def upsert_rollups(db: Session, model, key_columns: Tuple[str, ...], rows: List[Dict[str, Any]]):
+    """
+    Add counters to rollup buckets, creating buckets that don't exist yet
+    """
+    if not rows:
+        return
+    table = model.__table__
+    dialect = db.get_bind().dialect.name
+
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        statement = insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=list(key_columns),
+            set_={name: table.c[name] + statement.excluded[name] for name in USAGE_COUNTERS}
+        )
+        db.execute(statement, rows)
+        return
+
+    # Portable fallback: update the bucket, insert it when nothing matched
+    for row in rows:
+        condition = [table.c[name] == row[name] for name in key_columns]
+        result = db.execute(
+            update(table).where(*condition).values({name: table.c[name] + row[name] for name in USAGE_COUNTERS})
+        )
+        if result.rowcount == 0:
+            db.execute(table.insert().values(**row))
+
+def rollup_rows(rollups: Dict[RollupKey, Dict[str, int]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Per-user rollup rows plus the same counters summed service-wide
+    """
+    user_rows = []
+    global_rollups: Dict[Tuple[str, str, date], Dict[str, int]] = {}
+    for (user_id, model_id, generation_type, day), counters in rollups.items():
+        user_rows.append({"user_id": user_id, "model_id": model_id, "generation_type": generation_type, "day": day, **counters})
+        bucket = global_rollups.setdefault((model_id, generation_type, day), dict.fromkeys(USAGE_COUNTERS, 0))
+        for name, value in counters.items():
+            bucket[name] += value
+    
+    global_rows = [
+        {"model_id": model_id, "generation_type": generation_type, "day": day, **counters}
+        for (model_id, generation_type, day), counters in global_rollups.items()
+    ]
+    return user_rows, global_rows
+
+def rebuild_usage_rollups(db: Session, batch_size: int = 1000) -> Dict[str, int]:
+    """
+    Recompute all rollups from historical messages (including those of
+    archived chats) and generations. Existing rollups are replaced, so run it while the app is stopped (or
+    before rollups start being recorded) to avoid double counting.
+    """
+    rollups: Dict[RollupKey, Dict[str, int]] = {}
+    
+    def add(key: RollupKey, counters: Dict[str, int]):
+        bucket = rollups.setdefault(key, dict.fromkeys(USAGE_COUNTERS, 0))
+        for name, value in counters.items():
+            bucket[name] += value
+    
+    replies = db.execute(
+        select(Chat.user_id, Chat.model_id, Chat.model_type, Message.created_at, Message.tokens)
+        .join(Chat, Message.chat_id == Chat.id)
+        .where(Message.role == "assistant")
+        .execution_options(yield_per=batch_size)
+    )
+    message_count = 0
+    for user_id, model_id, model_type, created_at, tokens in replies:
+        add((user_id, model_id, model_type or "text", created_at.date()), {"requests": 1, "total_tokens": tokens or 0})
+        message_count += 1
+    
+    # Archived chats keep their replies only in the compressed payload
+    archives = db.execute(
+        select(Chat.user_id, Chat.model_id, Chat.model_type, ChatArchive.payload)
+        .join(Chat, ChatArchive.chat_id == Chat.id)
+        .execution_options(yield_per=batch_size)
+    )
+    for user_id, model_id, model_type, payload in archives:
+        for message in decode_messages(payload):
+            if message.get("role") != "assistant" or message.get("created_at") is None:
+                continue
+            add(
+                (user_id, model_id, model_type or "text", message["created_at"].date()),
+                {"requests": 1, "total_tokens": message.get("tokens") or 0}
+            )
+            message_count += 1
+    
+    generations = db.execute(
+        select(Generation.user_id, Generation.model_id, Generation.generation_type, Generation.created_at, Generation.result)
+        .execution_options(yield_per=batch_size)
+    )
+    generation_count = 0
+    for user_id, model_id, generation_type, created_at, result in generations:
+        usage = result.get("usage") if isinstance(result, dict) else None
+        add((user_id, model_id, generation_type or "text", created_at.date()), usage_counters(usage))
+        generation_count += 1
+    
+    db.execute(delete(UsageRollup))
+    db.execute(delete(GlobalUsageRollup))
+    user_rows, global_rows = rollup_rows(rollups)
+    for start in range(0, len(user_rows), batch_size):
+        db.execute(UsageRollup.__table__.insert(), user_rows[start:start + batch_size])
+    for start in range(0, len(global_rows), batch_size):
+        db.execute(GlobalUsageRollup.__table__.insert(), global_rows[start:start + batch_size])
+    db.commit()
+    
+    return {
+        "messages": message_count,
+        "generations": generation_count,
+        "user_buckets": len(user_rows),
+        "global_buckets": len(global_rows)
+    }
+
+class UsageLedger:
+    """
+    Buffers per-request usage in memory and writes it in batches from a
+    background task: user totals are incremented atomically and the daily
+    per-model rollups are upserted in the same transaction. Requests never
+    hold a write on the hot user row. Pending usage is flushed on shutdown.
+    """
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        flush_interval: float = settings.USAGE_FLUSH_INTERVAL_SECONDS,
+        max_pending: int = settings.USAGE_FLUSH_MAX_PENDING
+    ):
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        # user_id -> [generations, tokens]
+        self._pending: Dict[int, List[int]] = {}
+        # (user_id, model_id, generation_type, day) -> counters
+        self._rollups: Dict[RollupKey, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def record(
+        self,
+        user_id: int,
+        tokens: int = 0,
+        generations: int = 1,
+        model_id: Optional[str] = None,
+        generation_type: Optional[str] = None,
+        usage: Optional[Dict[str, Any]] = None
+    ):
+        """
+        Account usage for a completed request. Never blocks on the database.
+        Pass model_id and generation_type to also count it in the rollups.
+        """
+        counters = usage_counters(usage) if model_id else None
+        with self._lock:
+            entry = self._pending.get(user_id)
+            if entry is None:
+                entry = self._pending[user_id] = [0, 0]
+            entry[0] += generations
+            entry[1] += tokens or 0
+
+            if counters is not None:
+                key = (user_id, model_id, generation_type or "text", datetime.utcnow().date())
+                bucket = self._rollups.get(key)
+                if bucket is None:
+                    self._rollups[key] = counters
+                else:
+                    for name, value in counters.items():
+                        bucket[name] += value
+            pending = len(self._pending)
+
+        if pending >= self.max_pending and self._wakeup is not None:
+            self._wakeup.set()
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def _take_pending(self):
+        with self._lock:
+            batch, self._pending = self._pending, {}
+            rollups, self._rollups = self._rollups, {}
+        return batch, rollups
+
+    def _restore(self, batch: Dict[int, List[int]], rollups: Dict[RollupKey, Dict[str, int]]):
+        with self._lock:
+            for user_id, (generations, tokens) in batch.items():
+                entry = self._pending.setdefault(user_id, [0, 0])
+                entry[0] += generations
+                entry[1] += tokens
+            for key, counters in rollups.items():
+                bucket = self._rollups.setdefault(key, dict.fromkeys(USAGE_COUNTERS, 0))
+                for name, value in counters.items():
+                    bucket[name] += value
+
+    def _write(self, batch: Dict[int, List[int]], rollups: Dict[RollupKey, Dict[str, int]]):
+        user_rows, global_rows = rollup_rows(rollups)
+        db = self.session_factory()
+        try:
+            if batch:
+                db.execute(INCREMENT_USER_USAGE, [
+                    {"b_user_id": user_id, "b_generations": generations, "b_tokens": tokens}
+                    for user_id, (generations, tokens) in batch.items()
+                ])
+            upsert_rollups(db, UsageRollup, ("user_id", "model_id", "generation_type", "day"), user_rows)
+            upsert_rollups(db, GlobalUsageRollup, ("model_id", "generation_type", "day"), global_rows)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    async def flush(self):
+        batch, rollups = self._take_pending()
+        if not batch and not rollups:
+            return
+        try:
+            await asyncio.to_thread(self._write, batch, rollups)
+        except Exception:
+            logger.exception("Usage flush failed, keeping %d users for the next attempt", len(batch))
+            usage_flush_failures_total.inc()
+            self._restore(batch, rollups)
+            return
+        usage_flushed_users_total.inc(len(batch))
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def start(self):
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Stop the background flusher and drain everything still buffered
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+usage_ledger = UsageLedger()
+
+usage_pending_users = metrics.gauge(
+    "usage_ledger_pending_users", "Users with usage buffered but not yet written",
+    callback=lambda: usage_ledger.pending
+)
+usage_flushed_users_total = metrics.counter(
+    "usage_ledger_flushed_users_total", "User usage rows written by the ledger"
+)
+usage_flush_failures_total = metrics.counter(
+    "usage_ledger_flush_failures_total", "Ledger flushes that failed and were retried"
+)
\ No newline at end of file
@@ -1,38 +1,185 @@
-import re
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+
+CODE_BLOCK_PLACEHOLDER = "[Code Block]"
+
+class CodeBlockTokenizer:
+    """
+    Single-pass scanner for fenced markdown code blocks.
+
+    Understands ``` and ~~~ fences (three or more, closed by a fence of the
+    same character that is at least as long), info strings such as
+    "c++" or "objective-c", and a closing fence on the last line without a
+    trailing newline. Text can be fed in arbitrary chunks as it streams in;
+    feed() returns the blocks that were closed by that chunk.
+    """
+    def __init__(self):
+        self.code_blocks: List[Dict[str, Any]] = []
+        self._chunks: List[str] = []
+        self._pending: List[str] = []
+        self._plain: List[str] = []
+        self._block: Optional[Dict[str, Any]] = None
+        self._closed = False
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        if self._closed:
+            raise ValueError("Tokenizer already closed")
+        if not chunk:
+            return []
+
+        self._chunks.append(chunk)
+        last_newline = chunk.rfind("\n")
+        if last_newline == -1:
+            # Still inside one line; nothing can be decided until it ends
+            self._pending.append(chunk)
+            return []
+
+        self._pending.append(chunk[:last_newline + 1])
+        text = "".join(self._pending)
+        self._pending = [chunk[last_newline + 1:]] if last_newline + 1 < len(chunk) else []
+
+        closed: List[Dict[str, Any]] = []
+        self._scan(text, closed)
+        return closed
+
+    def close(self) -> List[Dict[str, Any]]:
+        """
+        Flush the last line and any block left open at the end of the text
+        """
+        if self._closed:
+            return []
+        closed: List[Dict[str, Any]] = []
+        if self._pending:
+            self._scan("".join(self._pending), closed)
+            self._pending = []
+        if self._block is not None:
+            # An unterminated fence runs to the end of the text
+            closed.append(self._finish_block(closed_fence=False))
+            self._plain.append(CODE_BLOCK_PLACEHOLDER)
+        self._closed = True
+        return closed
+
+    def _scan(self, text: str, closed: List[Dict[str, Any]]):
+        """
+        Walk the fence-like lines of complete-line text: up to 3 spaces of
+        indent, then a run of at least three backticks or tildes. Candidates
+        are located with str.find, so everything between fences is skipped
+        at C speed and copied to the plain text or the open block in one slice.
+        """
+        length = len(text)
+        position = 0
+        next_backticks = text.find("```")
+        next_tildes = text.find("~~~")
+        while next_backticks != -1 or next_tildes != -1:
+            if next_tildes == -1 or (next_backticks != -1 and next_backticks < next_tildes):
+                index = next_backticks
+            else:
+                index = next_tildes
+            fence_char = text[index]
+            line_start = text.rfind("\n", 0, index) + 1
+            line_end = text.find("\n", index) + 1 or length
+
+            if index - line_start <= 3 and not text[line_start:index].strip(" "):
+                run_end = index + 3
+                while run_end < length and text[run_end] == fence_char:
+                    run_end += 1
+                self._fence_line(text, position, line_start, line_end, text[index:run_end], text[run_end:line_end], closed)
+                position = line_end
+
+            if next_backticks != -1 and next_backticks < line_end:
+                next_backticks = text.find("```", line_end)
+            if next_tildes != -1 and next_tildes < line_end:
+                next_tildes = text.find("~~~", line_end)
+
+        rest = text[position:]
+        if rest:
+            if self._block is None:
+                self._plain.append(rest)
+            else:
+                self._block["parts"].append(rest)
+
+    def _fence_line(
+        self,
+        text: str,
+        position: int,
+        line_start: int,
+        line_end: int,
+        fence: str,
+        info: str,
+        closed: List[Dict[str, Any]]
+    ):
+        block = self._block
+        if block is None:
+            if position < line_start:
+                self._plain.append(text[position:line_start])
+            if not self._open_block(fence, info):
+                self._plain.append(text[line_start:line_end])
+            return
+
+        if position < line_start:
+            block["parts"].append(text[position:line_start])
+        if fence[0] == block["fence_char"] and len(fence) >= block["fence_length"] and not info.strip():
+            closed.append(self._finish_block(closed_fence=True))
+            self._plain.append(CODE_BLOCK_PLACEHOLDER + ("\n" if text[line_end - 1] == "\n" else ""))
+        else:
+            block["parts"].append(text[line_start:line_end])
+
+    def _open_block(self, fence: str, info: str) -> bool:
+        info = info.strip()
+        # Backtick fences can't have backticks in the info string (inline code)
+        if fence[0] == "`" and "`" in info:
+            return False
+        self._block = {
+            "fence_char": fence[0],
+            "fence_length": len(fence),
+            "language": info.split()[0] if info else "text",
+            "parts": []
+        }
+        return True
+
+    def _finish_block(self, closed_fence: bool) -> Dict[str, Any]:
+        block = self._block
+        self._block = None
+        code = "".join(block["parts"]).strip("\r\n")
+        code_block = {
+            "language": block["language"],
+            "code": code,
+            "length": len(code),
+            "closed": closed_fence
+        }
+        self.code_blocks.append(code_block)
+        return code_block
+
+    @property
+    def in_code_block(self) -> bool:
+        return self._block is not None
+
+    def result(self) -> Dict[str, Any]:
+        """
+        Full formatted result; closes the tokenizer if still open
+        """
+        self.close()
+        return {
+            "content": "".join(self._chunks),
+            "plain_text": "".join(self._plain),
+            "code_blocks": self.code_blocks,
+            "has_code": len(self.code_blocks) > 0,
+            "languages": sorted({block["language"] for block in self.code_blocks})
+        }
 
 def extract_code_blocks(text: str) -> List[Dict[str, Any]]:
     """
     Extract code blocks from markdown text
     Returns list of dicts with language and code
     """
-    pattern = r'```(\w+)?\n(.*?)```'
-    matches = re.findall(pattern, text, re.DOTALL)
-    
-    code_blocks = []
-    for match in matches:
-        language = match[0] if match[0] else 'text'
-        code = match[1].strip()
-        code_blocks.append({
-            'language': language,
-            'code': code,
-            'length': len(code)
-        })
-    
-    return code_blocks
+    tokenizer = CodeBlockTokenizer()
+    tokenizer.feed(text)
+    tokenizer.close()
+    return tokenizer.code_blocks
 
 def format_code_response(content: str) -> Dict[str, Any]:
     """
     Format response with code blocks and regular text
     """
-    code_blocks = extract_code_blocks(content)
-    
-    # Remove code blocks from content for plain text version
-    plain_text = re.sub(r'```(\w+)?\n.*?```', '[Code Block]', content, flags=re.DOTALL)
-    
-    return {
-        'content': content,
-        'plain_text': plain_text,
-        'code_blocks': code_blocks,
-        'has_code': len(code_blocks) > 0
-    }
\ No newline at end of file
+    tokenizer = CodeBlockTokenizer()
+    tokenizer.feed(content)
+    return tokenizer.result()
\ No newline at end of file
@@ -0,0 +1,118 @@
+import zlib
+from typing import Any, Iterable, List, Optional, Union
+import orjson
+from sqlalchemy import LargeBinary, type_coerce
+from sqlalchemy.types import TypeDecorator
+from app.config import settings
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+# First byte of a stored value. Legacy rows written by the plain JSON type
+# start with JSON text instead, which can never be one of these bytes.
+FORMAT_RAW = 0
+FORMAT_ZLIB = 1
+FORMAT_ZSTD = 2
+
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 3
+
+def encode_json(
+    value: Any,
+    min_bytes: int = settings.JSON_COMPRESSION_MIN_BYTES,
+    codec: str = settings.JSON_COMPRESSION_CODEC
+) -> bytes:
+    """
+    Version byte plus JSON, compressed when it is at least min_bytes long
+    and compression actually makes it smaller
+    """
+    raw = orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+    if len(raw) >= min_bytes:
+        if codec == "zstd" and zstandard is not None:
+            packed, version = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw), FORMAT_ZSTD
+        else:
+            packed, version = zlib.compress(raw, ZLIB_LEVEL), FORMAT_ZLIB
+        if len(packed) < len(raw):
+            return bytes((version,)) + packed
+    return bytes((FORMAT_RAW,)) + raw
+
+def json_bytes(stored: Union[bytes, str]) -> bytes:
+    """
+    The JSON text of a stored value, in any format including legacy rows
+    """
+    if isinstance(stored, str):
+        return stored.encode()
+    version = stored[0]
+    if version == FORMAT_RAW:
+        return bytes(stored[1:])
+    if version == FORMAT_ZLIB:
+        return zlib.decompress(stored[1:])
+    if version == FORMAT_ZSTD:
+        if zstandard is None:
+            raise ValueError("Reading zstd-compressed JSON needs the zstandard package")
+        return zstandard.ZstdDecompressor().decompress(stored[1:])
+    return bytes(stored)
+
+def decode_json(stored: Union[bytes, str]) -> Any:
+    return orjson.loads(json_bytes(stored))
+
+def is_legacy(stored: Union[bytes, str, None]) -> bool:
+    """True for values still in the uncompressed JSON text format"""
+    return stored is not None and (isinstance(stored, str) or stored[:1] not in (b"\x00", b"\x01", b"\x02"))
+
+class LazyJSON:
+    """
+    A stored JSON value that is only decompressed when it is rendered;
+    orjson embeds it as-is through json_default
+    """
+    __slots__ = ("stored",)
+
+    def __init__(self, stored: Union[bytes, str]):
+        self.stored = stored
+
+    @property
+    def value(self) -> Any:
+        return decode_json(self.stored)
+
+    def fragment(self) -> orjson.Fragment:
+        return orjson.Fragment(json_bytes(self.stored))
+
+def json_default(value: Any):
+    """orjson `default` hook for LazyJSON values"""
+    if isinstance(value, LazyJSON):
+        return value.fragment()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+class CompressedJSON(TypeDecorator):
+    """
+    JSON column stored as a version byte plus (for large values) zlib or
+    zstd compressed JSON. Reads also accept rows written as plain JSON, so
+    existing data can be migrated in the background.
+    """
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value: Any, dialect) -> Optional[bytes]:
+        return None if value is None else encode_json(value)
+
+    def process_result_value(self, value: Optional[Union[bytes, str]], dialect) -> Any:
+        return None if value is None else decode_json(value)
+
+class LazyCompressedJSON(CompressedJSON):
+    """Result type for read paths that only serialize the value"""
+    cache_ok = True
+
+    def process_result_value(self, value: Optional[Union[bytes, str]], dialect) -> Optional[LazyJSON]:
+        return None if value is None else LazyJSON(value)
+
+def lazy_json_columns(columns: Iterable[Any]) -> List[Any]:
+    """
+    The given columns with CompressedJSON ones returning LazyJSON, for
+    selects whose rows go straight into an orjson response
+    """
+    return [
+        type_coerce(column, LazyCompressedJSON()).label(column.name) if isinstance(column.type, CompressedJSON) else column
+        for column in columns
+    ]
\ No newline at end of file
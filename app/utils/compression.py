@@ -0,0 +1,109 @@
+import zlib
+from typing import Callable, Dict, Optional
+from app.config import settings
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+# Content types worth compressing; images, audio and archives are already compressed
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "application/problem+json",
+    "image/svg+xml",
+)
+
+class StreamCompressor:
+    """
+    Incremental compressor: every compress() call returns output that is
+    flushed to a block boundary, so each chunk can be decoded on arrival
+    """
+    def __init__(self, compress: Callable[[bytes], bytes], finish: Callable[[], bytes]):
+        self.compress = compress
+        self.finish = finish
+
+def _gzip_stream() -> StreamCompressor:
+    compressor = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+    return StreamCompressor(
+        lambda data: compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH),
+        compressor.flush
+    )
+
+def _brotli_stream() -> StreamCompressor:
+    compressor = brotli.Compressor(quality=settings.COMPRESSION_BROTLI_QUALITY)
+    return StreamCompressor(lambda data: compressor.process(data) + compressor.flush(), compressor.finish)
+
+def _zstd_stream() -> StreamCompressor:
+    compressor = zstandard.ZstdCompressor(level=settings.COMPRESSION_ZSTD_LEVEL).compressobj()
+    return StreamCompressor(
+        lambda data: compressor.compress(data) + compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK),
+        compressor.flush
+    )
+
+def _gzip(data: bytes) -> bytes:
+    compressor = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+def _brotli(data: bytes) -> bytes:
+    return brotli.compress(data, quality=settings.COMPRESSION_BROTLI_QUALITY)
+
+def _zstd(data: bytes) -> bytes:
+    return zstandard.ZstdCompressor(level=settings.COMPRESSION_ZSTD_LEVEL).compress(data)
+
+# Server preference order, best ratio per CPU first; only installed codecs are offered
+ENCODERS: Dict[str, Callable[[bytes], bytes]] = {}
+STREAM_ENCODERS: Dict[str, Callable[[], StreamCompressor]] = {}
+if zstandard is not None:
+    ENCODERS["zstd"], STREAM_ENCODERS["zstd"] = _zstd, _zstd_stream
+if brotli is not None:
+    ENCODERS["br"], STREAM_ENCODERS["br"] = _brotli, _brotli_stream
+ENCODERS["gzip"], STREAM_ENCODERS["gzip"] = _gzip, _gzip_stream
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Pick the content coding for an Accept-Encoding header: the highest
+    q-value among the codecs we have, ties going to server preference.
+    None means send the body as-is.
+    """
+    if not accept_encoding:
+        return None
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip().lower()] = q
+
+    best, best_q = None, 0.0
+    for encoding in ENCODERS:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+def is_compressible(content_type: Optional[str]) -> bool:
+    if not content_type:
+        return False
+    content_type = content_type.lower()
+    return content_type.startswith(COMPRESSIBLE_TYPES) or content_type.split(";")[0].endswith("+json")
+
+def compress(data: bytes, encoding: str) -> bytes:
+    return ENCODERS[encoding](data)
+
+def stream_compressor(encoding: str) -> StreamCompressor:
+    return STREAM_ENCODERS[encoding]()
\ No newline at end of file
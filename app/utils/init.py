@@ -1,2 +1,3 @@
 from app.utils.model_mappings import MODELS, get_models_by_type, get_model_by_id
-from app.utils.code_formatter import extract_code_blocks, format_code_response
\ No newline at end of file
+from app.utils.code_formatter import CodeBlockTokenizer, extract_code_blocks, format_code_response
+from app.utils.responses import ORJSONResponse, PrecompressedJSON, rows_response, schema_columns
\ No newline at end of file
@@ -1,6 +1,7 @@
 from typing import Dict, List, Any
 
 # Полный список моделей OpenRouter (бесплатные)
+# Curated metadata; app.services.model_catalog drops models OpenRouter no longer serves
 MODELS: Dict[str, Dict[str, Any]] = {
     # Text/Code модели с reasoning
     "aurora-alpha": {
@@ -12,6 +13,7 @@ MODELS: Dict[str, Dict[str, Any]] = {
         "supports_images": False,
         "supports_audio": False,
         "supports_vision": False,
+        "supports_prompt_cache": False,
         "free": True,
         "description": "Advanced reasoning model with chain-of-thought"
     },
@@ -24,6 +26,7 @@ MODELS: Dict[str, Dict[str, Any]] = {
         "supports_images": False,
         "supports_audio": False,
         "supports_vision": False,
+        "supports_prompt_cache": False,
         "free": True,
         "description": "Efficient reasoning model"
     },
@@ -36,6 +39,7 @@ MODELS: Dict[str, Dict[str, Any]] = {
         "supports_images": False,
         "supports_audio": False,
         "supports_vision": False,
+        "supports_prompt_cache": False,
         "free": True,
         "description": "Lightweight thinking model"
     },
@@ -48,6 +52,8 @@ MODELS: Dict[str, Dict[str, Any]] = {
         "supports_images": True,
         "supports_audio": False,
         "supports_vision": True,
+        "supports_prompt_cache": False,
+        "vision_max_edge": 1280,  # Longest image side worth sending; larger inputs are downscaled
         "free": True,
         "description": "Vision-language model with reasoning"
     },
@@ -60,6 +66,7 @@ MODELS: Dict[str, Dict[str, Any]] = {
         "supports_images": False,
         "supports_audio": False,
         "supports_vision": False,
+        "supports_prompt_cache": False,
         "free": True,
         "description": "Open source GPT with 120B parameters"
     },
@@ -72,6 +79,7 @@ MODELS: Dict[str, Dict[str, Any]] = {
         "supports_images": False,
         "supports_audio": False,
         "supports_vision": False,
+        "supports_prompt_cache": False,
         "free": True,
         "description": "Advanced reasoning model"
     },
@@ -84,6 +92,7 @@ MODELS: Dict[str, Dict[str, Any]] = {
         "supports_images": False,
         "supports_audio": False,
         "supports_vision": False,
+        "supports_prompt_cache": False,
         "free": True,
         "description": "State-of-the-art reasoning"
     },
@@ -96,6 +105,7 @@ MODELS: Dict[str, Dict[str, Any]] = {
         "supports_images": False,
         "supports_audio": False,
         "supports_vision": False,
+        "supports_prompt_cache": False,
         "free": True,
         "description": "Powerful instruction-tuned model"
     },
@@ -108,6 +118,8 @@ MODELS: Dict[str, Dict[str, Any]] = {
         "supports_images": True,
         "supports_audio": False,
         "supports_vision": True,
+        "supports_prompt_cache": True,
+        "vision_max_edge": 896,  # The vision encoder works on 896x896 crops
         "free": True,
         "description": "Google's vision-language model"
     },
@@ -120,6 +132,7 @@ MODELS: Dict[str, Dict[str, Any]] = {
         "supports_images": False,
         "supports_audio": False,
         "supports_vision": False,
+        "supports_prompt_cache": False,
         "free": True,
         "description": "Meta's latest instruction model"
     },
@@ -134,6 +147,7 @@ MODELS: Dict[str, Dict[str, Any]] = {
         "supports_images": False,
         "supports_audio": True,
         "supports_vision": False,
+        "supports_prompt_cache": False,
         "free": True,
         "description": "Audio understanding and generation"
     },
@@ -148,6 +162,7 @@ MODELS: Dict[str, Dict[str, Any]] = {
         "supports_images": True,
         "supports_audio": False,
         "supports_vision": False,
+        "supports_prompt_cache": False,
         "free": True,
         "description": "Image generation model"
     },
@@ -160,6 +175,7 @@ MODELS: Dict[str, Dict[str, Any]] = {
         "supports_images": True,
         "supports_audio": False,
         "supports_vision": False,
+        "supports_prompt_cache": False,
         "free": True,
         "description": "High-quality image generation"
     },
@@ -172,6 +188,7 @@ MODELS: Dict[str, Dict[str, Any]] = {
         "supports_images": True,
         "supports_audio": False,
         "supports_vision": False,
+        "supports_prompt_cache": False,
         "free": True,
         "description": "Professional image generation"
     },
@@ -184,18 +201,18 @@ MODELS: Dict[str, Dict[str, Any]] = {
         "supports_images": True,
         "supports_audio": False,
         "supports_vision": False,
+        "supports_prompt_cache": False,
         "free": True,
         "description": "Professional image generation"
     }
 }
 
 def get_models_by_type(model_type: str) -> List[Dict]:
-    """Get all models of a specific type"""
-    return [model for model in MODELS.values() if model["type"] == model_type]
+    """Get all models of a specific type (from the live catalog)"""
+    from app.services.model_catalog import model_catalog
+    return list(model_catalog.by_type(model_type))
 
 def get_model_by_id(model_id: str) -> Dict:
-    """Get model info by ID"""
-    for key, model in MODELS.items():
-        if model["id"] == model_id or key == model_id:
-            return model
-    return None
\ No newline at end of file
+    """Get model info by ID or catalog key (from the live catalog)"""
+    from app.services.model_catalog import model_catalog
+    return model_catalog.get(model_id)
\ No newline at end of file
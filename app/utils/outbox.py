@@ -0,0 +1,66 @@
+import asyncio
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+class Outbox:
+    """
+    Bounded send queue for one WebSocket connection.
+
+    Control frames wait for room once max_frames are queued. Token deltas
+    for a chat are coalesced into a single queued frame, so a slow client
+    gets fewer, larger token frames instead of a growing backlog; once
+    max_pending_chars of token text is buffered, producers wait too, which
+    stops reading from upstream until the client catches up.
+    """
+    def __init__(self, max_frames: int, max_pending_chars: int):
+        self.max_frames = max_frames
+        self.max_pending_chars = max_pending_chars
+        self.closed = False
+        self._frames: Deque[Dict[str, Any]] = deque()
+        self._tokens: Dict[int, List[str]] = {}
+        self._pending_chars = 0
+        self._changed = asyncio.Condition()
+
+    async def put(self, frame: Dict[str, Any]):
+        async with self._changed:
+            await self._changed.wait_for(lambda: self.closed or len(self._frames) < self.max_frames)
+            if self.closed:
+                return
+            self._frames.append(frame)
+            self._changed.notify_all()
+
+    async def put_token(self, chat_id: int, delta: str):
+        async with self._changed:
+            await self._changed.wait_for(lambda: self.closed or self._pending_chars < self.max_pending_chars)
+            if self.closed:
+                return
+            buffered = self._tokens.get(chat_id)
+            if buffered is None:
+                # The text is attached when the writer takes the frame
+                self._tokens[chat_id] = [delta]
+                self._frames.append({"type": "token", "chat_id": chat_id})
+            else:
+                buffered.append(delta)
+            self._pending_chars += len(delta)
+            self._changed.notify_all()
+
+    async def get(self) -> Optional[Dict[str, Any]]:
+        """
+        Next frame to send; None once the outbox is closed and drained
+        """
+        async with self._changed:
+            await self._changed.wait_for(lambda: self.closed or self._frames)
+            if not self._frames:
+                return None
+            frame = self._frames.popleft()
+            if frame["type"] == "token":
+                text = "".join(self._tokens.pop(frame["chat_id"]))
+                self._pending_chars -= len(text)
+                frame = {**frame, "delta": text}
+            self._changed.notify_all()
+            return frame
+
+    async def close(self):
+        async with self._changed:
+            self.closed = True
+            self._changed.notify_all()
\ No newline at end of file
@@ -0,0 +1,71 @@
+from typing import Any, Dict, Iterable, List, Optional, Type
+import orjson
+from pydantic import BaseModel
+from sqlalchemy import Column, Table
+from sqlalchemy.engine import Row
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from app.config import settings
+from app.utils.compressed_json import json_default
+from app.utils.compression import compress, negotiate_encoding
+from app.utils.conditional import make_etag, not_modified, set_validators
+
+# Aware UTC datetimes end in "Z", matching Pydantic's JSON output
+ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+class ORJSONResponse(JSONResponse):
+    """
+    JSON response rendered with orjson, which handles datetimes natively
+    and embeds LazyJSON column values without re-parsing them
+    """
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=json_default, option=ORJSON_OPTIONS)
+
+def schema_columns(table: Table, schema: Type[BaseModel], exclude: Iterable[str] = ()) -> List[Column]:
+    """
+    The table columns behind a response schema's fields, in schema order, so
+    a core select returns rows shaped exactly like the serialized schema
+    """
+    return [table.c[name] for name in schema.model_fields if name not in exclude]
+
+def rows_response(rows: Iterable[Row]) -> ORJSONResponse:
+    """
+    Serialize trusted database rows as-is. Returning a Response skips
+    response_model validation, which dominates CPU on large lists.
+    """
+    return ORJSONResponse([row._asdict() for row in rows])
+
+class PrecompressedJSON:
+    """
+    A constant JSON payload rendered once and compressed at most once per
+    content coding; responses carry Content-Encoding, so the compression
+    middleware passes them through. The ETag is derived from the body, so
+    revalidation is answered with 304 without touching the payload.
+    """
+    def __init__(self, content: Any):
+        self.body = orjson.dumps(content, option=ORJSON_OPTIONS)
+        self.etag = make_etag(self.body)
+        self._variants: Dict[str, bytes] = {}
+
+    def response(self, request: Request) -> Response:
+        cached = not_modified(request, self.etag)
+        if cached:
+            cached.headers["Vary"] = "Accept-Encoding"
+            return cached
+
+        encoding: Optional[str] = None
+        if settings.COMPRESSION_ENABLED and len(self.body) >= settings.COMPRESSION_MIN_SIZE:
+            encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+        if encoding is None:
+            response = Response(self.body, media_type="application/json", headers={"Vary": "Accept-Encoding"})
+            return set_validators(response, self.etag)
+
+        body = self._variants.get(encoding)
+        if body is None:
+            body = self._variants[encoding] = compress(self.body, encoding)
+        response = Response(
+            body,
+            media_type="application/json",
+            headers={"Content-Encoding": encoding, "Vary": "Accept-Encoding"}
+        )
+        return set_validators(response, self.etag)
\ No newline at end of file
@@ -0,0 +1,178 @@
+"""
+Local stand-in for the OpenRouter API used by the benchmark suite.
+
+Serves /chat/completions (plain and streamed) and /models (the app's
+curated catalog, with ETag revalidation) with configurable latency, streaming cadence, image payload size and error
+injection, so the app can be load tested without touching the real
+upstream.
+
+    python -m benchmarks.fake_openrouter --port 9100 --latency-ms 300
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import random
+import time
+import uuid
+from dataclasses import dataclass, asdict
+from typing import Any, Dict
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+from app.utils.model_mappings import MODELS
+
+LOREM = (
+    "Here is a short explanation followed by an example.\n\n"
+    "```python\ndef fib(n):\n    a, b = 0, 1\n    for _ in range(n):\n        a, b = b, a + b\n    return a\n```\n\n"
+    "The loop keeps only the last two values, so it runs in linear time and constant memory. "
+)
+
+@dataclass
+class FakeUpstreamConfig:
+    latency_ms: float = 200.0
+    jitter_ms: float = 50.0
+    chunk_interval_ms: float = 20.0
+    chunk_chars: int = 16
+    reply_chars: int = 1200
+    image_bytes: int = 256 * 1024
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+
+    @classmethod
+    def from_env(cls) -> "FakeUpstreamConfig":
+        raw = os.environ.get("FAKE_OPENROUTER_CONFIG")
+        return cls(**json.loads(raw)) if raw else cls()
+
+def _reply_text(length: int) -> str:
+    return (LOREM * (length // len(LOREM) + 1))[:length]
+
+def _usage(prompt: str, completion: str) -> Dict[str, int]:
+    prompt_tokens = max(len(prompt) // 4, 1)
+    completion_tokens = max(len(completion) // 4, 1)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens
+    }
+
+def _fake_png(size: int) -> str:
+    # PNG signature followed by filler; clients only store and echo it back
+    payload = b"\x89PNG\r\n\x1a\n" + os.urandom(max(size - 8, 0))
+    return "data:image/png;base64," + base64.b64encode(payload).decode("ascii")
+
+def _upstream_model(model: Dict[str, Any]) -> Dict[str, Any]:
+    inputs = ["text"] + (["image"] if model["supports_vision"] else []) + (["audio"] if model["supports_audio"] else [])
+    outputs = ["image"] if model["supports_images"] and model["type"] == "image" else ["text"]
+    return {
+        "id": model["id"],
+        "name": model["name"],
+        "description": model["description"],
+        "pricing": {"prompt": "0", "completion": "0"},
+        "architecture": {"input_modalities": inputs, "output_modalities": outputs},
+        "supported_parameters": ["reasoning"] if model["supports_reasoning"] else []
+    }
+
+def create_app(config: FakeUpstreamConfig = None) -> FastAPI:
+    config = config or FakeUpstreamConfig.from_env()
+    app = FastAPI(title="Fake OpenRouter")
+    app.state.config = config
+    app.state.stats = {"requests": 0, "errors": 0, "streams": 0}
+
+    async def _latency():
+        delay = config.latency_ms + random.uniform(-config.jitter_ms, config.jitter_ms)
+        await asyncio.sleep(max(delay, 0) / 1000)
+
+    @app.get("/config")
+    async def get_config():
+        return {"config": asdict(config), "stats": app.state.stats}
+
+    # Listing in OpenRouter's shape; tests may edit app.state.models
+    app.state.models = [_upstream_model(model) for model in MODELS.values()]
+
+    @app.get("/models")
+    async def list_models(request: Request):
+        body = json.dumps({"data": app.state.models})
+        etag = '"' + hashlib.sha1(body.encode()).hexdigest() + '"'
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+        return Response(body, media_type="application/json", headers={"ETag": etag})
+
+    @app.post("/chat/completions")
+    async def chat_completions(request: Request):
+        payload: Dict[str, Any] = await request.json()
+        app.state.stats["requests"] += 1
+
+        roll = random.random()
+        if roll < config.rate_limit_rate:
+            app.state.stats["errors"] += 1
+            return JSONResponse({"error": {"code": 429, "message": "Rate limited"}}, status_code=429)
+        if roll < config.rate_limit_rate + config.error_rate:
+            await _latency()
+            app.state.stats["errors"] += 1
+            return JSONResponse({"error": {"code": 502, "message": "Injected upstream error"}}, status_code=502)
+
+        prompt = json.dumps(payload.get("messages", []))
+        reply = _reply_text(config.reply_chars)
+        completion_id = f"gen-{uuid.uuid4().hex}"
+        model = payload.get("model", "fake/model")
+
+        if payload.get("stream"):
+            app.state.stats["streams"] += 1
+
+            async def events():
+                await _latency()
+                for start in range(0, len(reply), config.chunk_chars):
+                    chunk = {
+                        "id": completion_id,
+                        "model": model,
+                        "choices": [{"index": 0, "delta": {"content": reply[start:start + config.chunk_chars]}}]
+                    }
+                    yield f"data: {json.dumps(chunk)}\n\n"
+                    await asyncio.sleep(config.chunk_interval_ms / 1000)
+                final = {
+                    "id": completion_id,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                    "usage": _usage(prompt, reply)
+                }
+                yield f"data: {json.dumps(final)}\n\n"
+                yield "data: [DONE]\n\n"
+
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        await _latency()
+        message: Dict[str, Any] = {"role": "assistant", "content": reply}
+        if "image" in (payload.get("modalities") or []):
+            message["content"] = "Generated image"
+            message["images"] = [{"type": "image_url", "image_url": {"url": _fake_png(config.image_bytes)}}]
+
+        return {
+            "id": completion_id,
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": message, "finish_reason": "stop"}],
+            "usage": _usage(prompt, message["content"])
+        }
+
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    defaults = FakeUpstreamConfig()
+    for field, value in asdict(defaults).items():
+        parser.add_argument(f"--{field.replace('_', '-')}", type=type(value), default=value)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    config = FakeUpstreamConfig(**{field: getattr(args, field) for field in asdict(defaults)})
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,350 @@
+"""
+End-to-end load test for the API against a local fake OpenRouter.
+
+Starts the fake upstream and the app (uvicorn) on free ports with a
+temporary SQLite database and upload directory, drives a weighted mix of
+register/login/chat/image/audio traffic from concurrent virtual users, and
+writes throughput and p50/p95/p99 latency per endpoint as JSON.
+
+    python -m benchmarks.loadtest --users 50 --duration 60 --output run.json
+    python -m benchmarks.loadtest --compare baseline.json --output run.json
+"""
+import argparse
+import asyncio
+import io
+import json
+import math
+import os
+import random
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+import wave
+from collections import defaultdict
+from dataclasses import asdict
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from benchmarks.fake_openrouter import FakeUpstreamConfig
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHAT_MODEL = {"model_id": "meta-llama/llama-3.3-70b-instruct:free", "model_name": "Meta Llama 3.3", "model_type": "text"}
+IMAGE_MODEL = "sourceful/riverflow-v2-pro"
+AUDIO_MODEL = "openai/gpt-audio-mini"
+
+DEFAULT_MIX = {
+    "chat_send": 40,
+    "chat_list": 20,
+    "chat_messages": 15,
+    "image": 8,
+    "audio": 7,
+    "login": 7,
+    "register": 3,
+}
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def make_wav(seconds: float, rate: int = 16000) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        frames = int(seconds * rate)
+        wav.writeframes(b"".join(
+            struct.pack("<h", int(8000 * math.sin(2 * math.pi * 440 * i / rate))) for i in range(frames)
+        ))
+    return buffer.getvalue()
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(pct / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[rank]
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.recording = False
+
+    def record(self, name: str, elapsed: float, status: Any):
+        if not self.recording:
+            return
+        self.latencies[name].append(elapsed)
+        self.statuses[name][str(status)] += 1
+
+    def report(self, duration: float) -> Dict[str, Any]:
+        endpoints = {}
+        total = 0
+        for name, values in sorted(self.latencies.items()):
+            values.sort()
+            statuses = dict(self.statuses[name])
+            errors = sum(count for status, count in statuses.items() if not status.startswith("2"))
+            total += len(values)
+            endpoints[name] = {
+                "requests": len(values),
+                "errors": errors,
+                "throughput_rps": round(len(values) / duration, 3),
+                "mean_ms": round(sum(values) / len(values) * 1000, 3),
+                "p50_ms": round(percentile(values, 50) * 1000, 3),
+                "p95_ms": round(percentile(values, 95) * 1000, 3),
+                "p99_ms": round(percentile(values, 99) * 1000, 3),
+                "max_ms": round(values[-1] * 1000, 3),
+                "statuses": statuses
+            }
+        return {"total_requests": total, "throughput_rps": round(total / duration, 3), "endpoints": endpoints}
+
+class VirtualUser:
+    def __init__(self, client: httpx.AsyncClient, recorder: Recorder, audio_clip: bytes):
+        self.client = client
+        self.recorder = recorder
+        self.audio_clip = audio_clip
+        self.username = f"bench_{uuid.uuid4().hex[:12]}"
+        self.password = "bench-password"
+        self.headers: Dict[str, str] = {}
+        self.chat_id: Optional[int] = None
+
+    async def timed(self, name: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+            status = response.status_code
+        except httpx.HTTPError as e:
+            response, status = None, type(e).__name__
+        self.recorder.record(name, time.perf_counter() - started, status)
+        return response
+
+    async def register(self, username: Optional[str] = None):
+        username = username or f"bench_{uuid.uuid4().hex[:12]}"
+        return await self.timed("register", "POST", "/api/auth/register", json={
+            "username": username,
+            "email": f"{username}@example.com",
+            "password": self.password
+        })
+
+    async def login(self):
+        response = await self.timed("login", "POST", "/api/auth/login", data={
+            "username": self.username,
+            "password": self.password
+        })
+        if response is not None and response.status_code == 200:
+            self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    async def setup(self):
+        await self.register(self.username)
+        await self.login()
+        response = await self.timed("chat_create", "POST", "/api/chats/", headers=self.headers, json={
+            "title": "Benchmark chat", **CHAT_MODEL
+        })
+        if response is not None and response.status_code == 200:
+            self.chat_id = response.json()["id"]
+
+    async def chat_send(self):
+        await self.timed("chat_send", "POST", f"/api/chats/{self.chat_id}/messages", headers=self.headers, json={
+            "chat_id": self.chat_id,
+            "role": "user",
+            "content": random.choice([
+                "Explain how a hash map works.",
+                "Write a python function that merges two sorted lists.",
+                "What changed between HTTP/1.1 and HTTP/2?",
+            ])
+        })
+
+    async def chat_list(self):
+        await self.timed("chat_list", "GET", "/api/chats/", headers=self.headers)
+
+    async def chat_messages(self):
+        await self.timed("chat_messages", "GET", f"/api/chats/{self.chat_id}/messages", headers=self.headers)
+
+    async def image(self):
+        await self.timed("image", "POST", "/api/generations/image", headers=self.headers, json={
+            "prompt": "A lighthouse at dusk, watercolor",
+            "model": IMAGE_MODEL
+        })
+
+    async def audio(self):
+        await self.timed(
+            "audio", "POST", "/api/generations/audio", headers=self.headers,
+            data={"prompt": "Transcribe this recording", "model": AUDIO_MODEL},
+            files={"audio_file": ("clip.wav", self.audio_clip, "audio/wav")}
+        )
+
+async def run_load(base_url: str, args, recorder: Recorder) -> float:
+    mix = json.loads(args.mix) if args.mix else DEFAULT_MIX
+    names, weights = list(mix), list(mix.values())
+    audio_clip = make_wav(args.audio_seconds)
+    limits = httpx.Limits(max_connections=args.users * 2, max_keepalive_connections=args.users * 2)
+    stop_at = 0.0
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.request_timeout, limits=limits) as client:
+        users = [VirtualUser(client, recorder, audio_clip) for _ in range(args.users)]
+        await asyncio.gather(*(user.setup() for user in users))
+
+        async def drive(user: VirtualUser):
+            while time.perf_counter() < stop_at:
+                operation = random.choices(names, weights)[0]
+                if operation == "register":
+                    await user.register()
+                else:
+                    await getattr(user, operation)()
+                if args.think_ms:
+                    await asyncio.sleep(random.expovariate(1000 / args.think_ms))
+
+        stop_at = time.perf_counter() + args.warmup
+        await asyncio.gather(*(drive(user) for user in users))
+
+        recorder.recording = True
+        started = time.perf_counter()
+        stop_at = started + args.duration
+        await asyncio.gather(*(drive(user) for user in users))
+        return time.perf_counter() - started
+
+def wait_ready(url: str, process: subprocess.Popen, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Process for {url} exited with code {process.returncode}")
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Timed out waiting for {url}")
+
+def start_services(args, workdir: str):
+    upstream_config = FakeUpstreamConfig(
+        latency_ms=args.upstream_latency_ms,
+        jitter_ms=args.upstream_jitter_ms,
+        chunk_interval_ms=args.chunk_interval_ms,
+        image_bytes=args.image_bytes,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate
+    )
+    upstream_port, app_port = free_port(), free_port()
+    env = {
+        **os.environ,
+        "PYTHONPATH": REPO_ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""),
+        "FAKE_OPENROUTER_CONFIG": json.dumps(asdict(upstream_config)),
+    }
+    log = open(os.path.join(workdir, "services.log"), "wb")
+
+    upstream = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "benchmarks.fake_openrouter:create_app", "--factory",
+         "--port", str(upstream_port), "--log-level", "warning"],
+        cwd=REPO_ROOT, env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+    app_env = {
+        **env,
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        "UPLOAD_DIR": os.path.join(workdir, "uploads"),
+        "PROFILE_DIR": os.path.join(workdir, "profiles"),
+        "OPENROUTER_API_KEY": "bench",
+        "OPENROUTER_BASE_URL": f"http://127.0.0.1:{upstream_port}",
+    }
+    # Schema setup is a separate step; the app no longer creates tables on import
+    subprocess.run(
+        [sys.executable, "-m", "app.cli", "migrate"],
+        cwd=REPO_ROOT, env=app_env, stdout=log, stderr=subprocess.STDOUT, check=True
+    )
+    app = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(app_port),
+         "--workers", str(args.workers), "--log-level", "warning", "--no-access-log"],
+        cwd=workdir, env=app_env, stdout=log, stderr=subprocess.STDOUT
+    )
+    processes = [upstream, app]
+    try:
+        wait_ready(f"http://127.0.0.1:{upstream_port}/config", upstream)
+        wait_ready(f"http://127.0.0.1:{app_port}/health", app)
+    except Exception:
+        stop_services(processes)
+        raise
+    return f"http://127.0.0.1:{app_port}", processes, upstream_config
+
+def stop_services(processes: List[subprocess.Popen]):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any]):
+    print(f"{'endpoint':<16}{'metric':<16}{'baseline':>12}{'current':>12}{'change':>10}")
+    for name, current in report["endpoints"].items():
+        previous = baseline.get("endpoints", {}).get(name)
+        if not previous:
+            continue
+        for metric in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms"):
+            before, after = previous[metric], current[metric]
+            change = f"{(after - before) / before * 100:+.1f}%" if before else "n/a"
+            print(f"{name:<16}{metric:<16}{before:>12.2f}{after:>12.2f}{change:>10}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20, help="Concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30.0, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Unmeasured seconds before the run")
+    parser.add_argument("--workers", type=int, default=1, help="App worker processes")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="Mean pause between a user's requests")
+    parser.add_argument("--mix", help="JSON object of operation weights, e.g. '{\"chat_send\": 1}'")
+    parser.add_argument("--request-timeout", type=float, default=130.0)
+    parser.add_argument("--audio-seconds", type=float, default=5.0)
+    parser.add_argument("--upstream-latency-ms", type=float, default=200.0)
+    parser.add_argument("--upstream-jitter-ms", type=float, default=50.0)
+    parser.add_argument("--chunk-interval-ms", type=float, default=20.0)
+    parser.add_argument("--image-bytes", type=int, default=256 * 1024)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--base-url", help="Drive an already running app instead of starting one")
+    parser.add_argument("--output", help="Write the JSON report here")
+    parser.add_argument("--compare", help="Baseline JSON report to compare against")
+    args = parser.parse_args()
+
+    recorder = Recorder()
+    processes: List[subprocess.Popen] = []
+    upstream_config = None
+    with tempfile.TemporaryDirectory(prefix="crush-bench-") as workdir:
+        base_url = args.base_url
+        if not base_url:
+            base_url, processes, upstream_config = start_services(args, workdir)
+        try:
+            duration = asyncio.run(run_load(base_url, args, recorder))
+        finally:
+            stop_services(processes)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": sys.version.split()[0],
+            "duration_s": round(duration, 3),
+            "args": vars(args),
+            "upstream": asdict(upstream_config) if upstream_config else None
+        },
+        **recorder.report(duration)
+    }
+
+    print(json.dumps({name: {k: v[k] for k in ("requests", "errors", "p50_ms", "p95_ms", "p99_ms")}
+                      for name, v in report["endpoints"].items()}, indent=2))
+    print(f"total throughput: {report['throughput_rps']} req/s")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""
+Micro-benchmarks for CPU-bound helpers on the request path.
+
+Each benchmark times one call of a hot helper against a realistic fixture
+(large markdown replies, long chats, many generations). Results are written
+as JSON; with --baseline the run fails (exit code 1) when any benchmark is
+slower than the stored baseline by more than --threshold.
+
+    python -m benchmarks.micro --save-baseline benchmarks/results/micro.json
+    python -m benchmarks.micro --baseline benchmarks/results/micro.json --threshold 0.25
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import timeit
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List
+
+os.environ.setdefault("OPENROUTER_API_KEY", "bench")
+
+BENCHMARKS: Dict[str, Callable[[], Callable[[], Any]]] = {}
+
+def benchmark(name: str):
+    """
+    Register a benchmark. The decorated function builds the fixture and
+    returns the zero-argument callable that is timed.
+    """
+    def decorator(setup: Callable[[], Callable[[], Any]]):
+        BENCHMARKS[name] = setup
+        return setup
+    return decorator
+
+# Fixtures
+
+LANGUAGES = ["python", "javascript", "c++", "objective-c", "rust", "bash", "sql", ""]
+
+def markdown_reply(size: int = 100 * 1024, seed: int = 7) -> str:
+    """
+    Assistant-style markdown: prose paragraphs interleaved with fenced blocks
+    """
+    rng = random.Random(seed)
+    parts: List[str] = []
+    total = 0
+    while total < size:
+        paragraph = " ".join(rng.choice(["the", "request", "handler", "returns", "a", "value", "cache", "loop"])
+                             for _ in range(rng.randint(20, 80)))
+        code = "\n".join(f"    line_{i} = compute({i}, {rng.randint(0, 99)})" for i in range(rng.randint(3, 30)))
+        language = rng.choice(LANGUAGES)
+        part = f"{paragraph}\n\n```{language}\n{code}\n```\n\n"
+        parts.append(part)
+        total += len(part)
+    return "".join(parts)[:size]
+
+def message_rows(count: int, chat_id: int = 1) -> List[SimpleNamespace]:
+    rng = random.Random(count)
+    started = datetime(2025, 1, 1)
+    rows = []
+    for i in range(count):
+        assistant = i % 2 == 1
+        rows.append(SimpleNamespace(
+            id=i + 1,
+            chat_id=chat_id,
+            role="assistant" if assistant else "user",
+            content=markdown_reply(rng.randint(200, 3000), seed=i) if assistant else "How do I do this faster?",
+            code_blocks=[{"language": "python", "code": "print('hi')", "length": 11}] if assistant else None,
+            images=None,
+            audio_url=None,
+            reasoning_details={"steps": ["consider the input", "choose an algorithm"]} if assistant else None,
+            created_at=started + timedelta(seconds=i),
+            tokens=rng.randint(10, 800)
+        ))
+    return rows
+
+def chat_rows(chats: int, messages_per_chat: int) -> List[SimpleNamespace]:
+    return [
+        SimpleNamespace(
+            id=chat_id,
+            user_id=1,
+            title=f"Chat {chat_id}",
+            model_id="meta-llama/llama-3.3-70b-instruct:free",
+            model_name="Meta Llama 3.3",
+            model_type="text",
+            created_at=datetime(2025, 1, 1),
+            updated_at=datetime(2025, 1, 2),
+            messages=message_rows(messages_per_chat, chat_id)
+        )
+        for chat_id in range(1, chats + 1)
+    ]
+
+def generation_rows(count: int) -> List[SimpleNamespace]:
+    return [
+        SimpleNamespace(
+            id=i + 1,
+            user_id=1,
+            model_id="sourceful/riverflow-v2-pro",
+            model_name="Riverflow V2 Pro",
+            generation_type="image",
+            prompt="A lighthouse at dusk, watercolor",
+            result={"images": [{"url": f"/uploads/{i}.png", "local_path": f"uploads/{i}.png", "filename": f"{i}.png"}]},
+            generation_metadata={"negative_prompt": None, "num_images": 1, "size": "1024x1024"},
+            created_at=datetime(2025, 1, 1) + timedelta(minutes=i)
+        )
+        for i in range(count)
+    ]
+
+# Benchmarks
+
+@benchmark("code_formatter.extract_code_blocks[100KB]")
+def bench_extract_code_blocks():
+    from app.utils.code_formatter import extract_code_blocks
+    text = markdown_reply()
+    return lambda: extract_code_blocks(text)
+
+@benchmark("code_formatter.format_code_response[100KB]")
+def bench_format_code_response():
+    from app.utils.code_formatter import format_code_response
+    text = markdown_reply()
+    return lambda: format_code_response(text)
+
+@benchmark("model_mappings.get_model_by_id[hit-last]")
+def bench_get_model_by_id_hit():
+    from app.utils.model_mappings import MODELS, get_model_by_id
+    model_id = list(MODELS.values())[-1]["id"]
+    return lambda: get_model_by_id(model_id)
+
+@benchmark("model_mappings.get_model_by_id[miss]")
+def bench_get_model_by_id_miss():
+    from app.utils.model_mappings import get_model_by_id
+    return lambda: get_model_by_id("vendor/not-a-model")
+
+@benchmark("auth.create_access_token")
+def bench_jwt_encode():
+    from app.services.auth import auth_service
+    return lambda: auth_service.create_access_token({"sub": "benchmark-user"})
+
+@benchmark("auth.decode_token")
+def bench_jwt_decode():
+    from app.services.auth import auth_service
+    token = auth_service.create_access_token({"sub": "benchmark-user"})
+    return lambda: auth_service.decode_token(token)
+
+@benchmark("schemas.ChatSchema[1 chat x 2000 messages]")
+def bench_chat_schema_long_chat():
+    from app.schemas.chat import Chat as ChatSchema
+    chats = chat_rows(1, 2000)
+    return lambda: [ChatSchema.model_validate(chat).model_dump_json() for chat in chats]
+
+@benchmark("schemas.ChatSchema[50 chats x 40 messages]")
+def bench_chat_schema_list():
+    from app.schemas.chat import Chat as ChatSchema
+    chats = chat_rows(50, 40)
+    return lambda: [ChatSchema.model_validate(chat).model_dump_json() for chat in chats]
+
+@benchmark("schemas.GenerationSchema[1000 generations]")
+def bench_generation_schema_list():
+    from app.schemas.generation import Generation as GenerationSchema
+    generations = generation_rows(1000)
+    return lambda: [GenerationSchema.model_validate(g).model_dump_json() for g in generations]
+
+# Runner
+
+def measure(func: Callable[[], Any], repeat: int, min_time: float) -> Dict[str, float]:
+    timer = timeit.Timer(func)
+    number, elapsed = timer.autorange()
+    # autorange targets ~0.2s; scale to the requested minimum measurement time
+    number = max(int(number * min_time / max(elapsed, 1e-9)), 1)
+    runs = [t / number for t in timer.repeat(repeat=repeat, number=number)]
+    return {
+        "min_s": min(runs),
+        "median_s": statistics.median(runs),
+        "stdev_s": statistics.stdev(runs) if len(runs) > 1 else 0.0,
+        "loops": number,
+        "repeat": repeat
+    }
+
+def run(selected: List[str], repeat: int, min_time: float) -> Dict[str, Any]:
+    results = {}
+    for name in selected:
+        func = BENCHMARKS[name]()
+        results[name] = measure(func, repeat, min_time)
+        print(f"{name:<50} {results[name]['min_s'] * 1e6:>12.2f} us", flush=True)
+    return results
+
+def check_regressions(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get("results", {}).get(name)
+        if not previous:
+            continue
+        ratio = result["min_s"] / previous["min_s"]
+        if ratio > 1 + threshold:
+            regressions.append(f"{name}: {previous['min_s'] * 1e6:.2f} us -> {result['min_s'] * 1e6:.2f} us ({(ratio - 1) * 100:+.1f}%)")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-k", "--filter", default="", help="Only run benchmarks whose name contains this text")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2, help="Seconds per repeat")
+    parser.add_argument("--output", help="Write results JSON here")
+    parser.add_argument("--baseline", help="Compare against this results JSON and fail on regressions")
+    parser.add_argument("--save-baseline", help="Write results as the new baseline to this path")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed slowdown as a fraction (0.2 = 20%%)")
+    parser.add_argument("--list", action="store_true", help="List benchmarks and exit")
+    args = parser.parse_args()
+
+    selected = [name for name in BENCHMARKS if args.filter in name]
+    if args.list:
+        print("\n".join(selected))
+        return
+
+    report = {
+        "meta": {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": sys.version.split()[0]},
+        "results": run(selected, args.repeat, args.min_time)
+    }
+
+    for path in filter(None, (args.output, args.save_baseline)):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = check_regressions(report["results"], json.load(f), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}:")
+            print("\n".join(f"  {line}" for line in regressions))
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.threshold:.0%}")
+
+if __name__ == "__main__":
+    main()
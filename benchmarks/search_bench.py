@@ -0,0 +1,197 @@
+"""
+Search latency benchmark on a large synthetic chat history.
+
+Builds (or reuses) a SQLite database with --messages messages spread over
+--users users, creates the FTS5 index the same way the app does, then times
+search_messages() for common, rare, multi-word and prefix queries, plus the
+per-message cost the sync trigger adds to inserts.
+
+    python -m benchmarks.search_bench --messages 1000000
+    python -m benchmarks.search_bench --db /tmp/search.db --reuse --output benchmarks/results/search.json
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+os.environ.setdefault("OPENROUTER_API_KEY", "bench")
+
+# Zipf-like vocabulary: a few very common words and a long tail of rare ones
+COMMON_WORDS = ["the", "a", "to", "and", "is", "how", "do", "i", "in", "of", "for", "with", "it", "this", "what"]
+TOPIC_WORDS = [
+    "python", "async", "database", "index", "query", "docker", "kubernetes", "ingress", "cache", "latency",
+    "react", "component", "render", "state", "hook", "rust", "borrow", "lifetime", "trait", "compile",
+    "image", "prompt", "model", "token", "stream", "socket", "thread", "lock", "queue", "worker",
+    "deploy", "server", "request", "response", "header", "cookie", "session", "migration", "schema", "table"
+]
+RARE_WORDS = [f"term{i:05d}" for i in range(20000)]
+
+QUERIES = {
+    "common term": "the",
+    "topic term": "kubernetes",
+    "two terms": "async database",
+    "three terms": "docker ingress latency",
+    "prefix": "kube*",
+    "rare term": "term00042",
+    "no match": "zzzzunknown",
+}
+
+def message_text(rng: random.Random) -> str:
+    words = rng.choices(COMMON_WORDS, k=rng.randint(6, 20))
+    words += rng.choices(TOPIC_WORDS, k=rng.randint(2, 8))
+    if rng.random() < 0.3:
+        words.append(rng.choice(RARE_WORDS))
+    rng.shuffle(words)
+    return " ".join(words)
+
+def build_database(engine, messages: int, users: int, messages_per_chat: int, seed: int = 1) -> Dict[str, float]:
+    from app.database import Base, init_db
+    from app.models import user, chat, generation, usage  # noqa: F401 - register tables
+
+    # Plain tables first; the search index is built after the bulk load
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(seed)
+    started = datetime(2025, 1, 1)
+    chats = max(messages // messages_per_chat, 1)
+
+    load_started = time.perf_counter()
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        cursor.executemany(
+            "INSERT INTO users (id, email, username, hashed_password, is_active, is_superuser, total_generations, total_tokens)"
+            " VALUES (?, ?, ?, 'x', 1, 0, 0, 0)",
+            [(i, f"user{i}@example.com", f"user{i}") for i in range(1, users + 1)]
+        )
+        cursor.executemany(
+            "INSERT INTO chats (id, user_id, title, model_id, model_name, model_type, created_at) VALUES (?, ?, ?, 'm', 'M', 'text', ?)",
+            [(i, rng.randint(1, users), " ".join(rng.choices(TOPIC_WORDS, k=3)), started) for i in range(1, chats + 1)]
+        )
+        batch: List[tuple] = []
+        for i in range(1, messages + 1):
+            batch.append((i, (i - 1) // messages_per_chat % chats + 1, "user" if i % 2 else "assistant",
+                          message_text(rng), started + timedelta(seconds=i)))
+            if len(batch) == 10000:
+                cursor.executemany("INSERT INTO messages (id, chat_id, role, content, created_at, tokens) VALUES (?, ?, ?, ?, ?, 0)", batch)
+                batch = []
+        if batch:
+            cursor.executemany("INSERT INTO messages (id, chat_id, role, content, created_at, tokens) VALUES (?, ?, ?, ?, ?, 0)", batch)
+        raw.commit()
+    finally:
+        raw.close()
+    load_seconds = time.perf_counter() - load_started
+
+    index_started = time.perf_counter()
+    init_db(engine)
+    return {"load_s": load_seconds, "index_s": time.perf_counter() - index_started}
+
+def busiest_user(engine) -> int:
+    with engine.connect() as conn:
+        return conn.exec_driver_sql(
+            "SELECT chats.user_id FROM messages JOIN chats ON chats.id = messages.chat_id"
+            " GROUP BY chats.user_id ORDER BY count(*) DESC LIMIT 1"
+        ).scalar()
+
+def time_queries(session_factory, user_id: int, repeat: int, limit: int) -> Dict[str, Dict[str, Any]]:
+    from app.services.search import search_messages
+
+    results = {}
+    db = session_factory()
+    try:
+        for name, query in QUERIES.items():
+            for page in (0, 5):
+                timings = []
+                hits = 0
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    response = search_messages(db, user_id, query, limit=limit, offset=page * limit)
+                    timings.append(time.perf_counter() - started)
+                    hits = len(response["results"])
+                timings.sort()
+                label = f"{name} (page {page + 1})"
+                results[label] = {
+                    "query": query,
+                    "hits": hits,
+                    "p50_ms": statistics.median(timings) * 1000,
+                    "p95_ms": timings[min(int(len(timings) * 0.95), len(timings) - 1)] * 1000,
+                    "max_ms": timings[-1] * 1000
+                }
+                print(f"{label:<28} {results[label]['p50_ms']:>9.2f} ms p50 {results[label]['p95_ms']:>9.2f} ms p95  ({hits} hits)", flush=True)
+    finally:
+        db.close()
+    return results
+
+def time_inserts(engine, count: int) -> Dict[str, float]:
+    """
+    Per-message insert cost with the FTS trigger in place (rolled back)
+    """
+    rng = random.Random(99)
+    with engine.connect() as conn:
+        transaction = conn.begin()
+        chat_id = conn.exec_driver_sql("SELECT max(id) FROM chats").scalar()
+        started = time.perf_counter()
+        for _ in range(count):
+            conn.exec_driver_sql(
+                "INSERT INTO messages (chat_id, role, content, tokens) VALUES (?, 'user', ?, 0)",
+                (chat_id, message_text(rng))
+            )
+        elapsed = time.perf_counter() - started
+        transaction.rollback()
+    return {"inserts": count, "per_insert_us": elapsed / count * 1e6}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--messages-per-chat", type=int, default=40)
+    parser.add_argument("--db", help="SQLite file to build (default: a temporary file)")
+    parser.add_argument("--reuse", action="store_true", help="Reuse --db if it already exists")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--output", help="Write results JSON here")
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(tempfile.mkdtemp(prefix="search-bench-"), "search.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    build = {}
+    if not (args.reuse and os.path.exists(path)):
+        if os.path.exists(path):
+            os.remove(path)
+        print(f"Building {args.messages:,} messages in {path}", flush=True)
+        build = build_database(engine, args.messages, args.users, args.messages_per_chat)
+        print(f"Loaded in {build['load_s']:.1f}s, indexed in {build['index_s']:.1f}s", flush=True)
+
+    user_id = busiest_user(engine)
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": sys.version.split()[0],
+            "messages": args.messages,
+            "users": args.users,
+            "user_id": user_id,
+            "db_bytes": os.path.getsize(path),
+            **build
+        },
+        "queries": time_queries(sessionmaker(bind=engine), user_id, args.repeat, args.limit),
+        "insert": time_inserts(engine, 1000)
+    }
+    print(f"Insert with index trigger: {report['insert']['per_insert_us']:.1f} us/message")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Per-request CPU of the large read endpoints, before and after skipping
+response_model validation.
+
+Seeds a temporary SQLite database with one chat of each --sizes message
+count, then requests every endpoint through the ASGI app and records the
+process CPU time per request. "validated" routes are mounted by this script
+and reproduce the previous implementation (ORM objects validated into the
+response_model); "direct" are the app's own routes, which serialize rows
+with orjson. Both go through the same auth and middleware stack.
+
+    python -m benchmarks.serialization_bench --sizes 1000 10000 --output benchmarks/results/serialization.json
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+os.environ.setdefault("OPENROUTER_API_KEY", "bench")
+
+def seed(engine, sizes: List[int]) -> Dict[int, int]:
+    """
+    One user, one chat per size; returns size -> chat id
+    """
+    from benchmarks.micro import markdown_reply
+    from app.services.auth import auth_service
+
+    rng = random.Random(3)
+    started = datetime(2025, 1, 1)
+    replies = [markdown_reply(rng.randint(200, 3000), seed=i) for i in range(200)]
+    chat_ids = {}
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        cursor.execute(
+            "INSERT INTO users (id, email, username, hashed_password, is_active, is_superuser, total_generations, total_tokens)"
+            " VALUES (1, 'bench@example.com', 'bench', ?, 1, 0, 0, 0)",
+            (auth_service.get_password_hash("bench"),)
+        )
+        message_id = 0
+        for chat_id, size in enumerate(sizes, start=1):
+            chat_ids[size] = chat_id
+            cursor.execute(
+                "INSERT INTO chats (id, user_id, title, model_id, model_name, model_type, created_at, updated_at)"
+                " VALUES (?, 1, ?, 'meta-llama/llama-3.3-70b-instruct:free', 'Meta Llama 3.3', 'text', ?, ?)",
+                (chat_id, f"Chat with {size} messages", started, started + timedelta(days=chat_id))
+            )
+            rows = []
+            for i in range(size):
+                message_id += 1
+                assistant = i % 2 == 1
+                rows.append((
+                    message_id, chat_id, "assistant" if assistant else "user",
+                    replies[i % len(replies)] if assistant else "How do I make this faster?",
+                    json.dumps([{"language": "python", "code": "print('hi')", "length": 11}]) if assistant else None,
+                    json.dumps({"steps": ["consider the input", "choose an algorithm"]}) if assistant else None,
+                    started + timedelta(seconds=i), rng.randint(10, 800)
+                ))
+            cursor.executemany(
+                "INSERT INTO messages (id, chat_id, role, content, code_blocks, reasoning_details, created_at, tokens)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+        raw.commit()
+    finally:
+        raw.close()
+    return chat_ids
+
+def mount_validated_routes(app):
+    """
+    The previous implementations: ORM rows validated through response_model
+    """
+    from fastapi import APIRouter, Depends
+    from sqlalchemy.orm import Session
+    from app.database import get_db
+    from app.dependencies.auth import get_current_user
+    from app.models.chat import Chat, Message
+    from app.models.user import User
+    from app.schemas.chat import Chat as ChatSchema, Message as MessageSchema
+
+    router = APIRouter(prefix="/bench/validated")
+
+    @router.get("/chats", response_model=List[ChatSchema])
+    async def chats(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+        return db.query(Chat).filter(Chat.user_id == current_user.id).order_by(Chat.updated_at.desc()).all()
+
+    @router.get("/chats/{chat_id}/messages", response_model=List[MessageSchema])
+    async def messages(chat_id: int, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+        db.query(Chat).filter(Chat.id == chat_id, Chat.user_id == current_user.id).first()
+        return db.query(Message).filter(Message.chat_id == chat_id).order_by(Message.created_at).all()
+
+    app.include_router(router)
+
+def measure(client, path: str, headers: Dict[str, str], repeat: int) -> Dict[str, Any]:
+    client.get(path, headers=headers)  # warm up caches and code paths
+    cpu, wall = [], []
+    size = 0
+    for _ in range(repeat):
+        cpu_started, wall_started = time.process_time(), time.perf_counter()
+        response = client.get(path, headers=headers)
+        cpu.append(time.process_time() - cpu_started)
+        wall.append(time.perf_counter() - wall_started)
+        response.raise_for_status()
+        size = len(response.content)
+    return {
+        "cpu_ms": statistics.median(cpu) * 1000,
+        "wall_ms": statistics.median(wall) * 1000,
+        "bytes": size
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--output", help="Write results JSON here")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="serialization-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["UPLOAD_DIR"] = os.path.join(workdir, "uploads")
+    os.environ["PROFILE_DIR"] = os.path.join(workdir, "profiles")
+
+    from fastapi.testclient import TestClient
+    from app.database import engine, init_db
+    from app.main import app
+    from app.services.auth import auth_service
+
+    init_db()
+    chat_ids = seed(engine, args.sizes)
+    mount_validated_routes(app)
+    headers = {"Authorization": f"Bearer {auth_service.create_access_token({'sub': 'bench'})}"}
+
+    results: Dict[str, Dict[str, Any]] = {}
+    with TestClient(app) as client:
+        for size, chat_id in chat_ids.items():
+            results[f"chat_messages[{size}]"] = {
+                "validated": measure(client, f"/bench/validated/chats/{chat_id}/messages", headers, args.repeat),
+                "direct": measure(client, f"/api/chats/{chat_id}/messages", headers, args.repeat)
+            }
+        # The chat list carries every chat with all of its messages
+        results[f"user_chats[{sum(chat_ids)} messages]"] = {
+            "validated": measure(client, "/bench/validated/chats", headers, args.repeat),
+            "direct": measure(client, "/api/chats/", headers, args.repeat)
+        }
+
+    print(f"{'endpoint':<24} {'validated cpu':>14} {'direct cpu':>12} {'speedup':>8} {'bytes':>12}")
+    for name, result in results.items():
+        before, after = result["validated"], result["direct"]
+        print(f"{name:<24} {before['cpu_ms']:>11.1f} ms {after['cpu_ms']:>9.1f} ms "
+              f"{before['cpu_ms'] / max(after['cpu_ms'], 1e-9):>7.1f}x {after['bytes']:>12,}")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump({
+                "meta": {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": sys.version.split()[0], "repeat": args.repeat},
+                "results": results
+            }, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Cold-start benchmark: how long a fresh interpreter takes to import the app.
+
+Each run imports app.main in a new process (python -X importtime), so
+module caches don't hide regressions. Reports the median import time, the
+slowest modules by cumulative import time, and the time until /health
+answers under uvicorn. With --baseline the run fails (exit code 1) when the
+median import is slower than the baseline by more than --threshold.
+
+    python -m benchmarks.startup --save-baseline benchmarks/results/startup.json
+    python -m benchmarks.startup --baseline benchmarks/results/startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from benchmarks.loadtest import REPO_ROOT, free_port, wait_ready
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import app.main; print(time.perf_counter() - t)"
+
+def bench_env(workdir: str) -> Dict[str, str]:
+    return {
+        **os.environ,
+        "PYTHONPATH": REPO_ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""),
+        "OPENROUTER_API_KEY": "bench",
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        "UPLOAD_DIR": os.path.join(workdir, "uploads"),
+        "PROFILE_DIR": os.path.join(workdir, "profiles"),
+    }
+
+def parse_importtime(stderr: str) -> Dict[str, int]:
+    """
+    Module -> cumulative microseconds from -X importtime output
+    """
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        # "import time:   self [us] | cumulative | imported package"
+        _, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        modules[name.strip()] = int(cumulative_us)
+    return modules
+
+def measure_imports(env: Dict[str, str], runs: int) -> Dict[str, Any]:
+    timings: List[float] = []
+    cumulative: Dict[str, List[int]] = {}
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", IMPORT_SNIPPET],
+            cwd=REPO_ROOT, env=env, capture_output=True, text=True, check=True
+        )
+        timings.append(float(result.stdout.strip().splitlines()[-1]))
+        for name, micros in parse_importtime(result.stderr).items():
+            cumulative.setdefault(name, []).append(micros)
+
+    slowest = sorted(
+        ((name, statistics.median(values) / 1000) for name, values in cumulative.items()),
+        key=lambda item: item[1], reverse=True
+    )
+    return {
+        "import_median_s": statistics.median(timings),
+        "import_min_s": min(timings),
+        "runs": runs,
+        "slowest_modules_ms": dict(slowest[:15])
+    }
+
+def measure_ready(env: Dict[str, str], workdir: str) -> float:
+    """
+    Seconds from spawning uvicorn until /health answers (migrations done beforehand)
+    """
+    subprocess.run([sys.executable, "-m", "app.cli", "migrate"], cwd=REPO_ROOT, env=env, capture_output=True, check=True)
+    port = free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        wait_ready(f"http://127.0.0.1:{port}/health", process)
+        return time.perf_counter() - started
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--output", help="Write results JSON here")
+    parser.add_argument("--baseline", help="Compare against this results JSON and fail on regressions")
+    parser.add_argument("--save-baseline", help="Write results as the new baseline to this path")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed slowdown as a fraction (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="startup-bench-")
+    env = bench_env(workdir)
+    results = measure_imports(env, args.runs)
+    results["ready_s"] = measure_ready(env, workdir)
+
+    print(f"import app.main   {results['import_median_s'] * 1000:8.1f} ms median ({results['import_min_s'] * 1000:.1f} ms min)")
+    print(f"ready (/health)   {results['ready_s'] * 1000:8.1f} ms")
+    print("slowest imports (cumulative):")
+    for name, millis in results["slowest_modules_ms"].items():
+        print(f"  {millis:8.1f} ms  {name}")
+
+    report = {"meta": {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": sys.version.split()[0]}, "results": results}
+    for path in filter(None, (args.output, args.save_baseline)):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            previous = json.load(f)["results"]["import_median_s"]
+        ratio = results["import_median_s"] / previous
+        if ratio > 1 + args.threshold:
+            print(f"\nImport time regressed: {previous * 1000:.1f} ms -> {results['import_median_s'] * 1000:.1f} ms ({(ratio - 1) * 100:+.1f}%)")
+            sys.exit(1)
+        print(f"\nNo import regression beyond {args.threshold:.0%}")
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,89 @@
+import argparse
+import importlib.util
+import os
 import uvicorn
 from app.config import settings
 
+def has_module(name: str) -> bool:
+    return importlib.util.find_spec(name) is not None
+
+def worker_count(requested: int) -> int:
+    if requested > 0:
+        return requested
+    # Respect CPU affinity / container limits where the platform exposes them
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+def run_gunicorn(host: str, port: int, workers: int, loop: str, http: str):
+    """
+    Gunicorn master with uvicorn workers. The app is imported once in the
+    master (preload_app) and shared copy-on-write by the forked workers.
+    """
+    from gunicorn.app.base import BaseApplication
+    try:
+        from uvicorn_worker import UvicornWorker
+    except ImportError:
+        from uvicorn.workers import UvicornWorker
+    
+    class Worker(UvicornWorker):
+        CONFIG_KWARGS = {**UvicornWorker.CONFIG_KWARGS, "loop": loop, "http": http}
+    
+    class Server(BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", f"{host}:{port}")
+            self.cfg.set("workers", workers)
+            self.cfg.set("worker_class", Worker)
+            self.cfg.set("preload_app", True)
+            self.cfg.set("graceful_timeout", 30)
+            # Long upstream calls (image/audio generation) must not be killed
+            self.cfg.set("timeout", int(settings.OPENROUTER_TIMEOUT) + 30)
+        
+        def load(self):
+            from app.main import app
+            return app
+    
+    Server().run()
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the CRUSH AI API server")
+    parser.add_argument("--prod", action="store_true", help="Production mode: multiple workers, no reload")
+    parser.add_argument("--host", default=settings.HOST)
+    parser.add_argument("--port", type=int, default=settings.PORT)
+    parser.add_argument("--workers", type=int, default=settings.WEB_WORKERS, help="0 = one per CPU core")
+    parser.add_argument("--skip-migrate", action="store_true", help="Don't create missing tables before starting")
+    args = parser.parse_args()
+    
+    if not args.skip_migrate:
+        # Once, before any worker starts, instead of in every worker's import
+        from app.database import engine, init_db
+        init_db()
+        # Forked workers must not inherit the migration's pooled connection
+        engine.dispose()
+    
+    if not args.prod:
+        uvicorn.run("app.main:app", host=args.host, port=args.port, reload=True, log_level="info")
+        return
+    
+    workers = worker_count(args.workers)
+    loop = "uvloop" if has_module("uvloop") else "asyncio"
+    http = "httptools" if has_module("httptools") else "h11"
+    print(f"Starting {workers} worker(s), loop={loop}, http={http}")
+    
+    if has_module("gunicorn"):
+        run_gunicorn(args.host, args.port, workers, loop, http)
+    else:
+        # Without gunicorn every worker imports the app itself (no preload)
+        uvicorn.run(
+            "app.main:app",
+            host=args.host,
+            port=args.port,
+            workers=workers,
+            loop=loop,
+            http=http,
+            log_level="info",
+            proxy_headers=True
+        )
+
 if __name__ == "__main__":
-    uvicorn.run(
-        "app.main:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True,
-        log_level="info"
-    )
\ No newline at end of file
+    main()
\ No newline at end of file
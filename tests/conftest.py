@@ -0,0 +1,4 @@
+import os
+
+# Settings require an API key; tests never reach the real upstream
+os.environ.setdefault("OPENROUTER_API_KEY", "test")
\ No newline at end of file
@@ -0,0 +1,94 @@
+import asyncio
+import httpx
+import pytest
+from benchmarks.fake_openrouter import create_app
+from app.services import model_catalog as catalog_module
+from app.services.model_catalog import ModelCatalog
+from app.services.openrouter import openrouter_service
+from app.utils.model_mappings import MODELS
+
+FAKE_BASE_URL = "http://fake-openrouter"
+
+@pytest.fixture
+def fake_app(monkeypatch):
+    app = create_app()
+    monkeypatch.setattr(openrouter_service, "base_url", FAKE_BASE_URL)
+    return app
+
+@pytest.fixture
+def catalog(tmp_path):
+    return ModelCatalog(path=str(tmp_path / "catalog.json"), refresh_interval=900, retry_interval=30)
+
+def refresh(catalog: ModelCatalog, app) -> str:
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app)) as client:
+            return await catalog.refresh(client)
+    return asyncio.run(run())
+
+def test_first_fetch_swaps_in_upstream_snapshot(catalog, fake_app):
+    assert catalog.snapshot.source == "builtin"
+    dropped = fake_app.state.models.pop(0)
+
+    assert refresh(catalog, fake_app) == "updated"
+    snapshot = catalog.snapshot
+    assert snapshot.source == "upstream"
+    assert snapshot.etag
+    assert catalog.get(dropped["id"]) is None
+    assert len(snapshot.models) == len(MODELS) - 1
+
+def test_unchanged_listing_is_revalidated_with_etag(catalog, fake_app):
+    assert refresh(catalog, fake_app) == "unchanged"
+    etag = catalog.snapshot.etag
+
+    assert refresh(catalog, fake_app) == "not_modified"
+    assert catalog.snapshot.etag == etag
+    assert catalog.snapshot.source == "upstream"
+
+@pytest.mark.parametrize("listing", [[], [{"id": "someone/unknown-model", "name": "Unknown"}]])
+def test_empty_or_unrelated_listing_is_rejected(catalog, fake_app, listing):
+    assert refresh(catalog, fake_app) == "unchanged"
+    before = catalog.snapshot
+    fake_app.state.models = listing
+
+    with pytest.raises(ValueError):
+        refresh(catalog, fake_app)
+    assert catalog.snapshot is before
+
+def test_backoff_grows_after_failures(catalog, fake_app, monkeypatch):
+    fake_app.state.models = []
+    monkeypatch.setattr(catalog_module.random, "uniform", lambda low, high: high)
+    monkeypatch.setattr(openrouter_service, "_client", httpx.AsyncClient(transport=httpx.ASGITransport(fake_app)))
+    delays = []
+
+    class Stop(Exception):
+        pass
+
+    async def sleep(delay):
+        delays.append(delay)
+        if len(delays) > 7:
+            raise Stop
+
+    monkeypatch.setattr(catalog_module.asyncio, "sleep", sleep)
+    with pytest.raises(Stop):
+        asyncio.run(catalog._run())
+
+    # The first fetch is due at once; retries double and are capped at the refresh interval
+    assert delays == [0, 30, 60, 120, 240, 480, 900, 900]
+    assert catalog.failures == 7
+
+    fake_app.state.models = create_app().state.models
+    catalog.failures = 0
+    assert catalog._next_delay() == 900
+
+def test_snapshot_round_trips_through_catalog_path(catalog, fake_app):
+    fake_app.state.models.pop(0)
+    assert refresh(catalog, fake_app) == "updated"
+    saved = catalog.snapshot
+
+    restored = ModelCatalog(path=catalog.path)
+    assert restored.snapshot.source == "disk"
+    assert restored.snapshot.version == saved.version
+    assert restored.snapshot.etag == saved.etag
+    assert restored.snapshot.fetched_at == saved.fetched_at
+    # The saved ETag is sent on the next fetch
+    assert refresh(restored, fake_app) == "not_modified"
\ No newline at end of file